@@ -4,12 +4,13 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from src.app import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from src.app import DATABASE_URL, DB_DIRECT_URL
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url", f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+# Migrations connect to PostgreSQL itself, not to a PgBouncer
+config.set_main_option("sqlalchemy.url", DB_DIRECT_URL or DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
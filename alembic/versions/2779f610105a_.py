@@ -0,0 +1,26 @@
+"""add index on cart product_id
+
+Revision ID: 2779f610105a
+Revises: c645ebe0cf16
+Create Date: 2026-10-19 10:41:05.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2779f610105a'
+down_revision: Union[str, None] = 'c645ebe0cf16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_cart_product_id', 'cart', ['product_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cart_product_id', table_name='cart')
@@ -0,0 +1,40 @@
+"""add search indexes on UserModel
+
+Revision ID: 3a8f2e9d6c14
+Revises: 9e3b7c5a1d60
+Create Date: 2026-10-19 13:36:09.412870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8f2e9d6c14'
+down_revision: Union[str, None] = '9e3b7c5a1d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_usermodel_search_trgm', 'UserModel', ['username', 'email_address', 'name'],
+        postgresql_using='gin',
+        postgresql_ops={
+            'username': 'gin_trgm_ops',
+            'email_address': 'gin_trgm_ops',
+            'name': 'gin_trgm_ops',
+        },
+    )
+    op.create_index(
+        'ix_usermodel_email_address_lower', 'UserModel',
+        [sa.text('lower(email_address) text_pattern_ops')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usermodel_email_address_lower', table_name='UserModel')
+    op.drop_index('ix_usermodel_search_trgm', table_name='UserModel')
@@ -0,0 +1,29 @@
+"""add partial index on unread messages
+
+Revision ID: 5d0c8a1e7f42
+Revises: b41f6d2c93e8
+Create Date: 2026-10-19 12:03:17.558034
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0c8a1e7f42'
+down_revision: Union[str, None] = 'b41f6d2c93e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_message_unread', 'message', ['id'],
+        postgresql_where=sa.text('read IS false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_message_unread', table_name='message')
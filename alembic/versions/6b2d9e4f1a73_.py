@@ -0,0 +1,26 @@
+"""add released_on to price_quarantine
+
+Revision ID: 6b2d9e4f1a73
+Revises: a4e7c2b9d815
+Create Date: 2026-10-20 09:41:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d9e4f1a73'
+down_revision: Union[str, None] = 'a4e7c2b9d815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('price_quarantine', sa.Column('released_on', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('price_quarantine', 'released_on')
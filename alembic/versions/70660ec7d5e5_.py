@@ -0,0 +1,44 @@
+"""add price_quarantine table
+
+Revision ID: 70660ec7d5e5
+Revises: 77f9ed053065
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '70660ec7d5e5'
+down_revision: Union[str, None] = '77f9ed053065'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'price_quarantine',
+        sa.Column('id', sa.Integer(), nullable=False, primary_key=True),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('product.id'), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('price_currency', sa.String(), nullable=False, server_default="USD"),
+        sa.Column('median_price', sa.Float(), nullable=False),
+        sa.Column('deviation', sa.Float(), nullable=False),
+        sa.Column('observed_on', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_price_quarantine_product_id', 'price_quarantine', ['product_id'])
+    # The anomaly check reads the most recent history entries of each product
+    op.create_index(
+        'ix_price_history_product_id_change_date',
+        'price_history',
+        ['product_id', sa.text('change_date DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_price_history_product_id_change_date', table_name='price_history')
+    op.drop_index('ix_price_quarantine_product_id', table_name='price_quarantine')
+    op.drop_table('price_quarantine')
@@ -0,0 +1,53 @@
+"""cascade product deletes to dependent tables
+
+Revision ID: 9e3b7c5a1d60
+Revises: 5d0c8a1e7f42
+Create Date: 2026-10-19 12:48:31.907215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b7c5a1d60'
+down_revision: Union[str, None] = '5d0c8a1e7f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('price_history', 'cart', 'price_quarantine')
+
+
+def drop_product_foreign_keys(table) -> None:
+    # The initial migration declared the price_history foreign key twice and the spider
+    # may have created the table on its own, so the constraint names aren't known
+    op.execute(sa.text(f"""
+        DO $$
+        DECLARE constraint_name text;
+        BEGIN
+            FOR constraint_name IN
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = '{table}'::regclass AND contype = 'f'
+                  AND confrelid = 'product'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', constraint_name);
+            END LOOP;
+        END $$;
+    """))
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        drop_product_foreign_keys(table)
+        op.create_foreign_key(
+            f'{table}_product_id_fkey', table, 'product',
+            ['product_id'], ['id'], ondelete='CASCADE',
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_constraint(f'{table}_product_id_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_product_id_fkey', table, 'product', ['product_id'], ['id'])
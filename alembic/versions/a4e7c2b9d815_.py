@@ -0,0 +1,48 @@
+"""add bulk_job table
+
+Revision ID: a4e7c2b9d815
+Revises: f3c9a0d5e217
+Create Date: 2026-10-19 22:05:37.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e7c2b9d815'
+down_revision: Union[str, None] = 'f3c9a0d5e217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'bulk_job',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('items', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('done', sa.Integer(), nullable=False),
+        sa.Column('result', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('host', sa.String(length=255), nullable=True),
+        sa.Column('pid', sa.Integer(), nullable=True),
+        sa.Column('created_on', sa.DateTime(), nullable=False),
+        sa.Column('started_on', sa.DateTime(), nullable=True),
+        sa.Column('finished_on', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_bulk_job_pending', 'bulk_job', ['created_on'],
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bulk_job_pending', table_name='bulk_job',
+                  postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('bulk_job')
@@ -0,0 +1,32 @@
+"""add alert rule columns to cart
+
+Revision ID: b41f6d2c93e8
+Revises: 2779f610105a
+Create Date: 2026-10-19 11:27:52.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f6d2c93e8'
+down_revision: Union[str, None] = '2779f610105a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing cart items keep the previous behaviour of alerting on any price drop
+    op.add_column('cart', sa.Column('alert_type', sa.String(), nullable=False,
+                                    server_default='any_drop'))
+    op.add_column('cart', sa.Column('alert_target_price', sa.Float(), nullable=True))
+    op.add_column('cart', sa.Column('alert_percent_drop', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('cart', 'alert_percent_drop')
+    op.drop_column('cart', 'alert_target_price')
+    op.drop_column('cart', 'alert_type')
@@ -0,0 +1,38 @@
+"""add unique constraint on cart user_id and product_id
+
+Revision ID: c645ebe0cf16
+Revises: 70660ec7d5e5
+Create Date: 2026-10-19 10:02:17.530911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c645ebe0cf16'
+down_revision: Union[str, None] = '70660ec7d5e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drop the duplicates stored by concurrent requests, keeping the oldest row
+    op.execute(
+        """
+        DELETE FROM cart
+        USING cart AS duplicate
+        WHERE cart.user_id = duplicate.user_id
+          AND cart.product_id = duplicate.product_id
+          AND cart.id > duplicate.id;
+        """
+    )
+    op.create_unique_constraint(
+        'uq_cart_user_id_product_id', 'cart', ['user_id', 'product_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_cart_user_id_product_id', 'cart', type_='unique')
@@ -0,0 +1,54 @@
+"""add search_query and search_query_rollup tables
+
+Revision ID: c7d4e1a9b350
+Revises: 3a8f2e9d6c14
+Create Date: 2026-10-19 15:02:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d4e1a9b350'
+down_revision: Union[str, None] = '3a8f2e9d6c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'search_query',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('search', sa.String(length=200), nullable=False),
+        sa.Column('filters', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('latency_ms', sa.Float(), nullable=False),
+        sa.Column('result_count', sa.Integer(), nullable=False),
+        sa.Column('authenticated', sa.Boolean(), nullable=False),
+        sa.Column('searched_on', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_search_query_searched_on'), 'search_query', ['searched_on'])
+    op.create_table(
+        'search_query_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('search', sa.String(length=200), nullable=True),
+        sa.Column('searches', sa.Integer(), nullable=False),
+        sa.Column('zero_results', sa.Integer(), nullable=False),
+        sa.Column('p50_ms', sa.Float(), nullable=False),
+        sa.Column('p95_ms', sa.Float(), nullable=False),
+        sa.Column('p99_ms', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_search_query_rollup_day'), 'search_query_rollup', ['day'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_search_query_rollup_day'), table_name='search_query_rollup')
+    op.drop_table('search_query_rollup')
+    op.drop_index(op.f('ix_search_query_searched_on'), table_name='search_query')
+    op.drop_table('search_query')
@@ -0,0 +1,51 @@
+"""add crawl_run table
+
+Revision ID: e5b28c4f7a91
+Revises: c7d4e1a9b350
+Create Date: 2026-10-19 17:41:09.532716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b28c4f7a91'
+down_revision: Union[str, None] = 'c7d4e1a9b350'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'crawl_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('method', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('started_on', sa.DateTime(), nullable=False),
+        sa.Column('finished_on', sa.DateTime(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=False),
+        sa.Column('fetched', sa.Integer(), nullable=False),
+        sa.Column('download_failures', sa.Integer(), nullable=False),
+        sa.Column('parsed', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False),
+        sa.Column('created', sa.Integer(), nullable=False),
+        sa.Column('changed', sa.Integer(), nullable=False),
+        sa.Column('unchanged', sa.Integer(), nullable=False),
+        sa.Column('quarantined', sa.Integer(), nullable=False),
+        sa.Column('deactivated', sa.Integer(), nullable=False),
+        sa.Column('download_ms', sa.Float(), nullable=False),
+        sa.Column('parse_ms', sa.Float(), nullable=False),
+        sa.Column('db_ms', sa.Float(), nullable=False),
+        sa.Column('domains', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_crawl_run_started_on'), 'crawl_run', ['started_on'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_crawl_run_started_on'), table_name='crawl_run')
+    op.drop_table('crawl_run')
@@ -0,0 +1,43 @@
+"""add job_run table
+
+Revision ID: f3c9a0d5e217
+Revises: e5b28c4f7a91
+Create Date: 2026-10-19 19:12:53.204817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c9a0d5e217'
+down_revision: Union[str, None] = 'e5b28c4f7a91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('host', sa.String(length=255), nullable=False),
+        sa.Column('pid', sa.Integer(), nullable=False),
+        sa.Column('started_on', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('finished_on', sa.DateTime(), nullable=True),
+        sa.Column('duration_ms', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_run_name_started_on', 'job_run',
+                    ['name', sa.text('started_on DESC')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_run_name_started_on', table_name='job_run')
+    op.drop_table('job_run')
@@ -0,0 +1,447 @@
+"""
+Generates a synthetic product catalog with price histories and bulk loads it with COPY.
+~~~~~~~~~~~~~~~~~~~~~
+
+The catalog imitates the scraped data closely enough for benchmarks of the search,
+the pagination and the price analytics:
+- Titles are built from a vocabulary per category: brand, adjective, product noun,
+  model number and variant, e.g. "Globex Pro Smartphone X240 128GB".
+- Brands are drawn with a skewed distribution per category, so a few brands dominate.
+- Popularity follows a Zipf distribution: the number of ratings of a product and the
+  chance that a user tracks it fall with its popularity rank.
+- Ratings cluster around 4.2 stars, products with few ratings scatter more.
+- Every product has a price series over several years: small changes, temporary sales
+  and permanent markdowns at random intervals. The current price is the last point.
+
+Everything is derived from the seed. Every product has its own random generator seeded
+with the seed and its number, so the products and their histories are reproduced exactly
+by two separate passes, and the same arguments always produce the same catalog.
+
+The rows are streamed to PostgreSQL with COPY, nothing is held in memory but the
+popularity ranks. Generated rows are recognisable by their `bench.example` URLs and
+email addresses.
+
+Example usage:
+    python benchmarks/datagen.py --products 2000000 --users 10000 --years 3 --seed 7
+"""
+
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import psycopg2
+
+BENCH_DOMAIN = "bench.example"
+
+# Vocabulary and price range (lowest, highest typical price) of every category.
+CATEGORIES = {
+    "Phones": {
+        "brands": ["Globex", "Initech", "Hooli", "Stark", "Oscorp", "Acme"],
+        "nouns": ["smartphone", "phone", "flip phone", "rugged phone"],
+        "adjectives": ["pro", "ultra", "lite", "max", "mini", "plus"],
+        "variants": ["64GB", "128GB", "256GB", "512GB"],
+        "price": (80, 1500),
+    },
+    "Laptops": {
+        "brands": ["Initech", "Hooli", "Cyberdyne", "Acme", "Aperture"],
+        "nouns": ["laptop", "notebook", "ultrabook", "chromebook"],
+        "adjectives": ["gaming", "thin", "pro", "business", "convertible", "ultra"],
+        "variants": ["8GB", "16GB", "32GB", "512GB SSD", "1TB SSD"],
+        "price": (250, 3500),
+    },
+    "Headphones": {
+        "brands": ["Wonka", "Soylent", "Vandelay", "Acme", "Monarch"],
+        "nouns": ["headphones", "earbuds", "headset", "earphones"],
+        "adjectives": ["wireless", "noise cancelling", "sport", "studio", "bluetooth"],
+        "variants": ["black", "white", "blue", "red"],
+        "price": (15, 550),
+    },
+    "Monitors": {
+        "brands": ["Tyrell", "Initech", "Umbrella", "Acme"],
+        "nouns": ["monitor", "display", "screen"],
+        "adjectives": ["curved", "gaming", "4K", "ultrawide", "portable"],
+        "variants": ["24 inch", "27 inch", "32 inch", "34 inch"],
+        "price": (90, 1800),
+    },
+    "Cameras": {
+        "brands": ["Aperture", "Tyrell", "Wayne", "Monarch"],
+        "nouns": ["camera", "action camera", "mirrorless camera", "webcam"],
+        "adjectives": ["digital", "waterproof", "compact", "full frame", "4K"],
+        "variants": ["body only", "kit", "bundle"],
+        "price": (40, 4000),
+    },
+    "Watches": {
+        "brands": ["Stark", "Wayne", "Hooli", "Globex"],
+        "nouns": ["smartwatch", "fitness tracker", "watch"],
+        "adjectives": ["smart", "sport", "classic", "solar", "GPS"],
+        "variants": ["40mm", "44mm", "46mm"],
+        "price": (30, 900),
+    },
+    "Keyboards": {
+        "brands": ["Vandelay", "Cyberdyne", "Acme", "Soylent"],
+        "nouns": ["keyboard", "keypad", "keyboard and mouse set"],
+        "adjectives": ["mechanical", "wireless", "gaming", "ergonomic", "silent"],
+        "variants": ["US layout", "UK layout", "compact", "full size"],
+        "price": (15, 300),
+    },
+    "Speakers": {
+        "brands": ["Wonka", "Monarch", "Umbrella", "Globex"],
+        "nouns": ["speaker", "soundbar", "smart speaker", "subwoofer"],
+        "adjectives": ["portable", "waterproof", "bluetooth", "wireless", "party"],
+        "variants": ["black", "grey", "blue"],
+        "price": (20, 1200),
+    },
+}
+
+# Words that occur in the generated titles, used by the benchmarks as search terms.
+SEARCH_TERMS = sorted({
+    word.lower()
+    for category in CATEGORIES.values()
+    for phrase in category["brands"] + category["nouns"] + category["adjectives"]
+    for word in phrase.split()
+    if len(word) > 2 and word != "and"
+})
+
+# Largest number of ratings of a product, reached by the most popular one.
+MAX_RATINGS = 50000
+
+_CATEGORY_NAMES = list(CATEGORIES)
+
+
+def zipf_weights(count, exponent) -> list:
+    """
+    Returns the cumulative Zipf weights of the ranks 1 to count.
+
+    Args:
+        count (int): The number of ranks.
+        exponent (float): The exponent of the distribution, larger is more skewed.
+
+    Returns:
+        list: The cumulative weights, for `bisect` sampling.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def sample_zipf(rng, cumulative) -> int:
+    """
+    Draws a 0-based rank from cumulative Zipf weights.
+
+    Args:
+        rng (Random): The random generator.
+        cumulative (list): The cumulative weights of `zipf_weights`.
+
+    Returns:
+        int: The rank, 0 is the most popular.
+    """
+    return min(bisect.bisect_left(cumulative, rng.random() * cumulative[-1]), len(cumulative) - 1)
+
+
+def _skewed_choice(rng, options):
+    """
+    Picks an option, the earlier ones more often.
+    """
+    return options[min(int(rng.expovariate(1.5)), len(options) - 1)]
+
+
+def price_series(rng, base_price, start, end) -> list:
+    """
+    Generates the price changes of a product between two dates.
+
+    The price starts above the base price and changes at random intervals:
+    small adjustments, sales that are reverted after a few weeks, and markdowns.
+
+    Args:
+        rng (Random): The random generator of the product.
+        base_price (float): The typical price of the product.
+        start (date): The date of the first price.
+        end (date): The last possible date of a change.
+
+    Returns:
+        list: (date, price) tuples in chronological order, at least one.
+    """
+    price = base_price * rng.uniform(1.0, 1.3)
+    regular = price
+    day = start
+    series = [(day, round(price, 2))]
+    sale_ends = None
+    while True:
+        day += timedelta(days=max(1, int(rng.expovariate(1 / 30))))
+        if sale_ends is not None and sale_ends <= day:
+            day, price, sale_ends = sale_ends, regular, None
+        elif sale_ends is not None:
+            continue
+        else:
+            kind = rng.random()
+            if kind < 0.6:
+                regular = price = price * rng.uniform(0.95, 1.05)
+            elif kind < 0.85:
+                price = regular * rng.uniform(0.65, 0.9)
+                sale_ends = day + timedelta(days=rng.randint(7, 21))
+            else:
+                regular = price = price * rng.uniform(0.9, 0.97)
+        if day > end:
+            break
+        series.append((day, round(max(price, 1.0), 2)))
+    return series
+
+
+def product(seed, number, rank, years, today) -> dict:
+    """
+    Generates a product, the same arguments always give the same product.
+
+    Args:
+        seed (int): The seed of the catalog.
+        number (int): The number of the product in the catalog.
+        rank (int): The popularity rank of the product, 0 is the most popular.
+        years (int): The number of years of the price series.
+        today (date): The date of the last possible price change.
+
+    Returns:
+        dict: The attributes of the product and its price series.
+    """
+    rng = random.Random(seed * 1000003 + number)
+    category = _CATEGORY_NAMES[min(int(rng.expovariate(0.35)), len(_CATEGORY_NAMES) - 1)]
+    vocabulary = CATEGORIES[category]
+    brand = _skewed_choice(rng, vocabulary["brands"])
+    title = (
+        f"{brand} {rng.choice(vocabulary['adjectives']).title()} "
+        f"{rng.choice(vocabulary['nouns']).title()} "
+        f"{rng.choice('AXSZGK')}{rng.randint(1, 99) * 10} {rng.choice(vocabulary['variants'])}"
+    )
+    low, high = vocabulary["price"]
+    base_price = math.exp(rng.uniform(math.log(low), math.log(high)))
+
+    ratings = int(MAX_RATINGS / (rank + 1) ** 0.8 * rng.uniform(0.5, 1.5))
+    spread = 0.3 + 1.5 / math.sqrt(ratings + 1)
+    rating = round(min(5.0, max(1.0, rng.gauss(4.2, spread))), 1) if ratings else None
+
+    series = price_series(rng, base_price, today - timedelta(days=365 * years), today)
+    return {
+        "title": title,
+        "category": category,
+        "brand": brand,
+        "price": series[-1][1],
+        "amount_of_ratings": ratings,
+        "rating": rating,
+        "availability": "In stock" if rng.random() < 0.92 else "Out of stock",
+        "series": series,
+    }
+
+
+def _copy_value(value) -> str:
+    """
+    Formats a value for the text format of COPY.
+    """
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class RowStream:
+    """
+    A file-like object reading generated rows in the text format of COPY.
+
+    Args:
+        rows (iterable): The rows, tuples of values.
+    """
+
+    def __init__(self, rows) -> None:
+        self._lines = ("\t".join(map(_copy_value, row)) + "\n" for row in rows)
+        self._buffer = ""
+
+    def read(self, size=-1) -> str:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = "".join(chunks)
+        if size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _copy(cursor, table, columns, rows) -> int:
+    """
+    Loads the rows into the table with COPY.
+
+    Returns:
+        int: The number of loaded rows.
+    """
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", RowStream(rows), size=65536)
+    return cursor.rowcount
+
+
+def generate(conn, products=100000, users=1000, carts_per_user=10, years=3, seed=42,
+             zipf_exponent=1.1) -> dict:
+    """
+    Generates the catalog and loads it into the database with COPY.
+
+    The products and users get IDs following the existing ones, and the ID sequences
+    are moved past them.
+
+    Args:
+        conn (connection): The database connection.
+        products (int, optional): The number of products. Defaults to 100000.
+        users (int, optional): The number of users. Defaults to 1000.
+        carts_per_user (int, optional): The average number of tracked products per user.
+        Defaults to 10.
+        years (int, optional): The number of years of the price series. Defaults to 3.
+        seed (int, optional): The seed of the catalog. Defaults to 42.
+        zipf_exponent (float, optional): The skew of the popularity. Defaults to 1.1.
+
+    Returns:
+        dict: The number of loaded rows of every table.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    ranks = list(range(products))
+    rng.shuffle(ranks)
+    loaded = {}
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM product")
+        first_product = cursor.fetchone()[0] + 1
+        cursor.execute('SELECT coalesce(max(id), 0) FROM "UserModel"')
+        first_user = cursor.fetchone()[0] + 1
+
+        def product_rows():
+            for number in range(products):
+                item = product(seed, number, ranks[number], years, today)
+                yield (first_product + number, f"https://{BENCH_DOMAIN}/p/{number}",
+                       item["title"], item["price"], "USD", item["category"], item["brand"],
+                       item["amount_of_ratings"], item["rating"], item["availability"])
+
+        loaded["products"] = _copy(
+            cursor, "product",
+            ["id", "url", "title", "price", "price_currency", "item_class", "producer",
+             "amount_of_ratings", "rating", "availability"],
+            product_rows(),
+        )
+
+        def history_rows():
+            for number in range(products):
+                for day, price in product(seed, number, ranks[number], years, today)["series"]:
+                    yield first_product + number, price, "USD", day
+
+        loaded["price_history"] = _copy(
+            cursor, "price_history", ["product_id", "price", "price_currency", "change_date"],
+            history_rows(),
+        )
+
+        loaded["users"] = _copy(
+            cursor, '"UserModel"',
+            ["id", "username", "email_address", "created_on", "role", "confirmed_on"],
+            ((first_user + number, f"bench{number}", f"bench{number}@{BENCH_DOMAIN}",
+              today, "user", today) for number in range(users)),
+        )
+
+        # Popular products are tracked by more users
+        by_rank = [0] * products
+        for number, rank in enumerate(ranks):
+            by_rank[rank] = number
+        cumulative = zipf_weights(products, zipf_exponent)
+
+        def cart_rows():
+            for number in range(users):
+                tracked = set()
+                for _ in range(min(products, int(rng.expovariate(1 / carts_per_user)) + 1)):
+                    tracked.add(by_rank[sample_zipf(rng, cumulative)])
+                for product_number in sorted(tracked):
+                    yield first_user + number, first_product + product_number
+
+        loaded["carts"] = _copy(cursor, "cart", ["user_id", "product_id"], cart_rows())
+
+        for table in ("product", '"UserModel"'):
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), max(id)) FROM {table}", (table,))
+    conn.commit()
+    return loaded
+
+
+def reset(conn) -> None:
+    """
+    Deletes the generated users and products with their carts and price histories.
+
+    Args:
+        conn (connection): The database connection.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM cart WHERE user_id IN '
+            '(SELECT id FROM "UserModel" WHERE email_address LIKE %s)',
+            (f"%@{BENCH_DOMAIN}",),
+        )
+        cursor.execute('DELETE FROM "UserModel" WHERE email_address LIKE %s',
+                       (f"%@{BENCH_DOMAIN}",))
+        cursor.execute("DELETE FROM product WHERE url LIKE %s", (f"https://{BENCH_DOMAIN}/%",))
+    conn.commit()
+
+
+def analyze(conn) -> None:
+    """
+    Updates the planner statistics of the loaded tables.
+
+    Args:
+        conn (connection): The database connection.
+    """
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        for table in ('"UserModel"', "product", "price_history", "cart"):
+            cursor.execute(f"ANALYZE {table}")
+    conn.autocommit = False
+
+
+def dsn_from_env() -> str:
+    """
+    Returns the connection string of DATABASE_URL, or built from the DB_* environment
+    variables if it isn't set.
+
+    Returns:
+        str: The connection string.
+    """
+    if os.environ.get("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    return (
+        f"host={os.environ.get('DB_HOST', 'localhost')} port={os.environ.get('DB_PORT', 5432)} "
+        f"dbname={os.environ.get('DB_NAME')} user={os.environ.get('DB_USER')} "
+        f"password={os.environ.get('DB_PASSWORD')}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dsn", default=None, help="Defaults to DATABASE_URL or the DB_* environment variables")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--carts-per-user", type=int, default=10)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Skew of the popularity")
+    parser.add_argument("--keep", action="store_true", help="Keep previously generated rows")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn or dsn_from_env())
+    started = time.perf_counter()
+    if not args.keep:
+        reset(conn)
+    loaded = generate(conn, args.products, args.users, args.carts_per_user, args.years,
+                      args.seed, args.zipf)
+    analyze(conn)
+    conn.close()
+    print(f"Loaded {loaded} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures the email delivery throughput of `app.utils.email` against a local SMTP sink.
+~~~~~~~~~~~~~~~~~~~~~
+
+The sink is a minimal SMTP server running in this process that accepts and discards
+every message, so the numbers show the cost of rendering, queueing and the SMTP
+round trips rather than the speed of a real mail server. An optional delay per
+command simulates the network latency of a remote server.
+
+Example usage:
+    python benchmarks/email_throughput.py --messages 2000 --pool-size 4 --latency 0.002
+"""
+
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP to accept and discard messages.
+    """
+
+    latency = 0.0
+
+    def reply(self, line) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command == "DATA":
+                self.reply("354 end with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1
+                self.reply("250 accepted")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                # MAIL, RCPT, RSET and NOOP
+                self.reply("250 ok")
+
+
+class Sink(socketserver.ThreadingTCPServer):
+    """
+    The local SMTP sink, counts the accepted messages.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    messages = 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the sink waits before every reply.")
+    args = parser.parse_args()
+
+    SinkHandler.latency = args.latency
+    sink = Sink(("127.0.0.1", 0), SinkHandler)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+    os.environ.update({
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(sink.server_address[1]),
+        "MAIL_USE_TLS": "false",
+        "MAIL_USERNAME": "",
+        "MAIL_POOL_SIZE": str(args.pool_size),
+        "MAIL_BATCH_SIZE": str(args.batch_size),
+    })
+
+    from app.utils.email import send_email, flush_emails, shutdown_emails
+
+    started = time.perf_counter()
+    for number in range(args.messages):
+        send_email(f"user{number}@example.com", f"Message {number}", "Benchmark", "Benchmark")
+    queued = time.perf_counter() - started
+    flush_emails()
+    elapsed = time.perf_counter() - started
+    shutdown_emails()
+    sink.shutdown()
+
+    print(f"messages:     {args.messages} ({sink.messages} accepted by the sink)")
+    print(f"queued in:    {queued:.3f}s")
+    print(f"delivered in: {elapsed:.3f}s")
+    print(f"throughput:   {args.messages / elapsed:.1f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
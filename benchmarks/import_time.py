@@ -0,0 +1,182 @@
+"""
+Measures the start up of a web worker and compares it with a stored baseline.
+~~~~~~~~~~~~~~~~~~~~~
+
+Imports the application, as a gunicorn worker does, in fresh interpreters started with
+`python -X importtime` and reports:
+- the import time of the application, the median of the runs,
+- the peak resident memory (RSS) of the process after the import,
+- the number of imported modules,
+- the import time of every top level package, to see where the start up time goes,
+- the heavy crawl and analytics dependencies (`HEAVY_MODULES`) that were imported.
+
+`--module app.scheduler` measures the scheduler process instead of a web worker.
+If a baseline is given, the script exits with status 1 when the import time or the memory
+grew by more than the tolerance, or a heavy dependency is imported that wasn't before.
+
+Example usage:
+    python benchmarks/import_time.py --runs 7 --save-baseline import_baseline.json
+    python benchmarks/import_time.py --baseline import_baseline.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Dependencies only the crawling and analytics processes need.
+HEAVY_MODULES = ("scrapy", "twisted", "google.analytics", "grpc", "authlib")
+
+# Imports the module and prints the memory and the imported modules of the process.
+CHILD = """
+import json, resource, sys
+import {module}
+print(json.dumps({{
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module) -> dict:
+    """
+    Imports the module in a fresh interpreter and parses its import time report.
+
+    Args:
+        module (str): The module to import, e.g. 'app.__main__'.
+
+    Returns:
+        dict: The import time of the module and of every imported module in microseconds
+        (self, cumulative, nesting level), the peak RSS and the imported modules.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module)],
+        env=env, capture_output=True, text=True, check=False,
+    )
+    if process.returncode:
+        raise SystemExit(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+    imports = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            imports[name] = (int(own), int(cumulative), len(indent) // 2)
+    child = json.loads(process.stdout.strip().splitlines()[-1])
+    return {
+        "total_us": imports[module][1],
+        "imports": imports,
+        "maxrss_kb": child["maxrss_kb"],
+        "modules": child["modules"],
+    }
+
+
+def summarize(runs, top) -> dict:
+    """
+    Returns the medians of the runs and the slowest top level packages.
+
+    Args:
+        runs (list): The results of `measure`.
+        top (int): The number of packages reported.
+
+    Returns:
+        dict: The summary.
+    """
+    packages = {}
+    for run in runs:
+        totals = {}
+        for name, (own, _, _) in run["imports"].items():
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0) + own
+        for package, own in totals.items():
+            packages.setdefault(package, []).append(own)
+    slowest = sorted(
+        ((package, statistics.median(values)) for package, values in packages.items()),
+        key=lambda item: item[1], reverse=True,
+    )
+    modules = runs[-1]["modules"]
+    return {
+        "import_ms": round(statistics.median(run["total_us"] for run in runs) / 1000, 1),
+        "maxrss_mb": round(statistics.median(run["maxrss_kb"] for run in runs) / 1024, 1),
+        "modules": len(modules),
+        "heavy_modules": [
+            heavy for heavy in HEAVY_MODULES
+            if any(name == heavy or name.startswith(heavy + ".") for name in modules)
+        ],
+        "packages_ms": {package: round(own / 1000, 1) for package, own in slowest[:top]},
+    }
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    Compares the results with a baseline and prints the differences.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of the baseline run.
+        tolerance (float): The allowed relative change, e.g. 0.1 for 10%.
+
+    Returns:
+        list: The regressions, empty if there are none.
+    """
+    regressions = []
+    print(f"{'measure':<12}{'current':>10}{'baseline':>10}{'change':>9}")
+    for name in ("import_ms", "maxrss_mb", "modules"):
+        current, previous = results[name], baseline.get(name)
+        if not previous:
+            continue
+        change = current / previous - 1
+        print(f"{name:<12}{current:>10}{previous:>10}{change:>+9.1%}")
+        if change > tolerance:
+            regressions.append(f"{name}: {change:+.1%}")
+    for heavy in results["heavy_modules"]:
+        if heavy not in baseline.get("heavy_modules", []):
+            regressions.append(f"{heavy} is imported")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default="app.__main__", help="The module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of packages reported")
+    parser.add_argument("--output", default=None, help="File to write the results to")
+    parser.add_argument("--baseline", default=None, help="Results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", default=None, help="File to store the results as baseline")
+    args = parser.parse_args()
+
+    # The first run fills the bytecode caches and is not measured
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+
+    results = {
+        "config": {"module": args.module, "runs": args.runs, "python": sys.version.split()[0]},
+        **summarize(runs, args.top),
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
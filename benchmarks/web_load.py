@@ -0,0 +1,469 @@
+"""
+Load tests the web tier and compares the results with a stored baseline.
+~~~~~~~~~~~~~~~~~~~~~
+
+Loads the synthetic catalog of `datagen.py` into the database, starts the application under
+gunicorn with the production profile of `gunicorn.conf.py` and drives a weighted mix of requests
+against it from concurrent clients:
+- api_search: `/api/search` with one or two search terms, sometimes with price filters
+  or deeper pages, by logged in and anonymous users.
+- search_page: the `/search` page.
+- profile: the `/profile` page of a logged in user.
+- cart_add: tracking and untracking a product with `/cart/add`.
+
+The clients are logged in with session cookies signed with the application's SECRET_KEY.
+Throughput and the p50/p95/p99 latency of every endpoint are written as JSON.
+If a baseline is given, every endpoint is compared with it, and the script exits with
+status 1 when the p95 latency grew or the throughput fell by more than the tolerance.
+
+With `--sweep`, the same load runs against every given server profile, as
+WORKERSxTHREADS, and the throughput and latency of the profiles are compared.
+
+Example usage:
+    python benchmarks/web_load.py --products 100000 --users 1000 --workers 4 \\
+        --concurrency 32 --duration 60 --output results.json --save-baseline baseline.json
+    python benchmarks/web_load.py --no-seed --baseline baseline.json
+    python benchmarks/web_load.py --no-seed --sweep 1x8 2x4 4x2 --output profiles.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+import psycopg2
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import (  # noqa: E402
+    BENCH_DOMAIN, SEARCH_TERMS, analyze, dsn_from_env, generate, reset,
+)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+
+# Share of every endpoint in the request mix.
+DEFAULT_MIX = {"api_search": 60, "search_page": 10, "profile": 15, "cart_add": 15}
+
+
+def session_cookie(secret_key, user_id) -> str:
+    """
+    Returns a session cookie logging the client in as the user.
+
+    Args:
+        secret_key (str): The SECRET_KEY of the application.
+        user_id (int): The ID of the user.
+
+    Returns:
+        str: The value of the session cookie.
+    """
+    app = Flask(__name__)
+    app.secret_key = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    return serializer.dumps({"_user_id": str(user_id), "_fresh": True})
+
+
+class Catalog:
+    """
+    The seeded users and products the clients pick from.
+
+    Attributes:
+        user_ids (list): The IDs of the seeded users.
+        product_ids (list): The IDs of the seeded products.
+        cookies (dict): The session cookie of every user.
+    """
+
+    def __init__(self, conn, secret_key) -> None:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT id FROM "UserModel" WHERE email_address LIKE %s ORDER BY id',
+                           (f"%@{BENCH_DOMAIN}",))
+            self.user_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM product WHERE url LIKE %s ORDER BY id",
+                           (f"https://{BENCH_DOMAIN}/%",))
+            self.product_ids = [row[0] for row in cursor.fetchall()]
+        if not self.user_ids or not self.product_ids:
+            raise SystemExit("The database is not seeded, run without --no-seed")
+        self.cookies = {user_id: session_cookie(secret_key, user_id) for user_id in self.user_ids}
+
+
+def build_request(endpoint, catalog, rng) -> tuple:
+    """
+    Returns a request of the endpoint with random parameters.
+
+    Args:
+        endpoint (str): The name of the endpoint, a key of DEFAULT_MIX.
+        catalog (Catalog): The seeded users and products.
+        rng (Random): The random generator of the client.
+
+    Returns:
+        tuple: The method, path, body and headers of the request.
+    """
+    user_id = rng.choice(catalog.user_ids)
+    headers = {"Cookie": f"session={catalog.cookies[user_id]}"}
+    if endpoint == "api_search":
+        terms = rng.sample(SEARCH_TERMS, rng.choice((1, 1, 2)))
+        params = {"search": " ".join(terms)}
+        if rng.random() < 0.3:
+            params["min_price"] = rng.choice((10, 50, 100))
+            params["max_price"] = params["min_price"] + rng.choice((100, 500))
+        elif len(terms) == 1 and rng.random() < 0.3:
+            # Only broad searches have deeper pages, missing pages would be answered with 404
+            params["page"] = rng.randint(2, 5)
+        if rng.random() < 0.5:
+            headers = {}
+        return "GET", f"/api/search?{urlencode(params)}", None, headers
+    if endpoint == "search_page":
+        return "GET", "/search", None, {}
+    if endpoint == "profile":
+        return "GET", "/profile", None, headers
+    if endpoint == "cart_add":
+        body = json.dumps({"product_id": rng.choice(catalog.product_ids),
+                           "action": rng.choice(("track", "remove"))})
+        headers["Content-Type"] = "application/json"
+        return "POST", "/cart/add", body, headers
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+class Client(threading.Thread):
+    """
+    Sends requests of the mix over a keep-alive connection until the deadline.
+
+    Attributes:
+        latencies (dict): The latencies of the recorded requests of every endpoint, in seconds.
+        errors (dict): The number of failed requests of every endpoint.
+    """
+
+    def __init__(self, number, host, port, catalog, mix, seed_value, record_from, deadline) -> None:
+        super().__init__(name=f"client-{number}", daemon=True)
+        self.host = host
+        self.port = port
+        self.catalog = catalog
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.rng = random.Random(f"{seed_value}-{number}")
+        self.record_from = record_from
+        self.deadline = deadline
+        self.latencies = {endpoint: [] for endpoint in mix}
+        self.errors = {endpoint: 0 for endpoint in mix}
+
+    def run(self) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while True:
+            started = time.perf_counter()
+            if started >= self.deadline:
+                break
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            method, path, body, headers = build_request(endpoint, self.catalog, self.rng)
+            failed = False
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                failed = True
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            if started >= self.record_from:
+                self.latencies[endpoint].append(time.perf_counter() - started)
+                self.errors[endpoint] += failed
+        conn.close()
+
+
+def percentile(values, share) -> float:
+    """
+    Returns the nearest-rank percentile of sorted values.
+
+    Args:
+        values (list): The sorted values.
+        share (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The percentile, 0.0 without values.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+
+def summarize(latencies, errors, seconds) -> dict:
+    """
+    Returns the throughput and latency percentiles of an endpoint.
+
+    Args:
+        latencies (list): The latencies of the requests, in seconds.
+        errors (int): The number of failed requests.
+        seconds (float): The measured duration.
+
+    Returns:
+        dict: The summary.
+    """
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / seconds, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+    }
+
+
+def run_load(host, port, catalog, mix, concurrency, duration, warmup, seed_value) -> dict:
+    """
+    Drives the mix with concurrent clients and summarizes the measured requests.
+
+    Args:
+        host (str): The host of the server.
+        port (int): The port of the server.
+        catalog (Catalog): The seeded users and products.
+        mix (dict): The share of every endpoint.
+        concurrency (int): The number of concurrent clients.
+        duration (float): The measured seconds.
+        warmup (float): The seconds before the measurement, their requests are not recorded.
+        seed_value (int): The seed of the clients' random generators.
+
+    Returns:
+        dict: The summary of every endpoint and of all requests.
+    """
+    record_from = time.perf_counter() + warmup
+    deadline = record_from + duration
+    clients = [Client(number, host, port, catalog, mix, seed_value, record_from, deadline)
+               for number in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    endpoints = {}
+    for endpoint in mix:
+        latencies = [value for client in clients for value in client.latencies[endpoint]]
+        errors = sum(client.errors[endpoint] for client in clients)
+        endpoints[endpoint] = summarize(latencies, errors, duration)
+    total = summarize([value for client in clients for values in client.latencies.values()
+                       for value in values],
+                      sum(sum(client.errors.values()) for client in clients), duration)
+    return {"endpoints": endpoints, "total": total}
+
+
+def start_server(port, workers, threads) -> subprocess.Popen:
+    """
+    Starts the application under gunicorn with the profile of `gunicorn.conf.py`
+    and waits until it answers.
+
+    Args:
+        port (int): The port to bind to.
+        workers (int): The number of worker processes.
+        threads (int): The number of threads per worker.
+
+    Returns:
+        Popen: The gunicorn process.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT),
+               WEB_WORKERS=str(workers), WEB_THREADS=str(threads))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config=gunicorn.conf.py",
+         f"--bind=127.0.0.1:{port}", "--log-level=warning"],
+        cwd=os.path.abspath(ROOT), env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("gunicorn exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/robots.txt")
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("gunicorn did not answer within 60 seconds")
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    Compares the results with a baseline and prints the differences.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of the baseline run.
+        tolerance (float): The allowed relative change, e.g. 0.1 for 10%.
+
+    Returns:
+        list: The regressions, empty if there are none.
+    """
+    regressions = []
+    print(f"{'endpoint':<14}{'p95 ms':>10}{'baseline':>10}{'change':>9}"
+          f"{'rps':>10}{'baseline':>10}{'change':>9}")
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous or not previous["requests"] or not current["requests"]:
+            continue
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rps_change = (current["throughput_rps"] / previous["throughput_rps"] - 1
+                      if previous["throughput_rps"] else 0.0)
+        print(f"{endpoint:<14}{current['p95_ms']:>10.1f}{previous['p95_ms']:>10.1f}"
+              f"{p95_change:>+9.1%}{current['throughput_rps']:>10.1f}"
+              f"{previous['throughput_rps']:>10.1f}{rps_change:>+9.1%}")
+        if p95_change > tolerance:
+            regressions.append(f"{endpoint}: p95 latency {p95_change:+.1%}")
+        if rps_change < -tolerance:
+            regressions.append(f"{endpoint}: throughput {rps_change:+.1%}")
+    return regressions
+
+
+def parse_profile(value) -> tuple:
+    """
+    Parses a server profile given as WORKERSxTHREADS, e.g. '2x4'.
+
+    Args:
+        value (str): The profile.
+
+    Returns:
+        tuple: The number of workers and the number of threads.
+    """
+    try:
+        workers, threads = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not WORKERSxTHREADS") from None
+    return workers, threads
+
+
+def print_profiles(profiles) -> None:
+    """
+    Prints the throughput and latency of all requests of every profile.
+
+    Args:
+        profiles (list): The results of every profile.
+    """
+    print(f"{'workers':>8}{'threads':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>8}")
+    for profile in profiles:
+        total = profile["total"]
+        print(f"{profile['workers']:>8}{profile['threads']:>8}{total['throughput_rps']:>10.1f}"
+              f"{total['p50_ms']:>10.1f}{total['p95_ms']:>10.1f}{total['p99_ms']:>10.1f}"
+              f"{total['errors']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dsn", default=None, help="Defaults to DATABASE_URL or the DB_* environment variables")
+    parser.add_argument("--no-seed", action="store_true", help="Use the already seeded catalog")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--carts-per-user", type=int, default=10)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", default=None,
+                        help="host:port of a running server instead of starting gunicorn")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--sweep", type=parse_profile, nargs="+", default=None,
+                        metavar="WORKERSxTHREADS",
+                        help="Compare server profiles instead of running one, e.g. 1x8 2x4")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX,
+                        help='JSON object of endpoint weights, e.g. \'{"api_search": 1}\'')
+    parser.add_argument("--output", default=None, help="File to write the results to")
+    parser.add_argument("--baseline", default=None, help="Results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--save-baseline", default=None, help="File to store the results as baseline")
+    args = parser.parse_args()
+    if args.sweep and (args.url or args.baseline or args.save_baseline):
+        parser.error("--sweep starts its own servers and has no baseline")
+
+    secret_key = os.environ.get("SECRET_KEY")
+    if not secret_key:
+        raise SystemExit("SECRET_KEY has to be set to sign the session cookies")
+
+    conn = psycopg2.connect(args.dsn or dsn_from_env())
+    if not args.no_seed:
+        started = time.perf_counter()
+        reset(conn)
+        loaded = generate(conn, args.products, args.users, args.carts_per_user, args.years,
+                          args.seed)
+        analyze(conn)
+        print(f"Loaded {loaded} in {time.perf_counter() - started:.1f} s")
+    catalog = Catalog(conn, secret_key)
+    conn.close()
+
+    if args.sweep:
+        profiles = []
+        for workers, threads in args.sweep:
+            server = start_server(args.port, workers, threads)
+            try:
+                measured = run_load("127.0.0.1", args.port, catalog, args.mix, args.concurrency,
+                                    args.duration, args.warmup, args.seed)
+            finally:
+                server.terminate()
+                server.wait()
+            profiles.append({"workers": workers, "threads": threads, **measured})
+        results = {
+            "config": {
+                "products": len(catalog.product_ids), "users": len(catalog.user_ids),
+                "concurrency": args.concurrency, "duration": args.duration, "mix": args.mix,
+            },
+            "profiles": profiles,
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(json.dumps(results, indent=2))
+        print_profiles(profiles)
+        return
+
+    server = None
+    if args.url:
+        host, port = args.url.rsplit(":", 1)
+        port = int(port)
+    else:
+        host, port = "127.0.0.1", args.port
+        server = start_server(port, args.workers, args.threads)
+    try:
+        measured = run_load(host, port, catalog, args.mix, args.concurrency, args.duration,
+                            args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {
+        "config": {
+            "products": len(catalog.product_ids), "users": len(catalog.user_ids),
+            "workers": args.workers, "threads": args.threads,
+            "concurrency": args.concurrency, "duration": args.duration, "mix": args.mix,
+        },
+        **measured,
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+This file is the production profile of the gunicorn server, loaded from the working directory.
+~~~~~~~~~~~~~~~~~~~~~
+
+- The application is loaded once in the master process before the workers are forked
+  (`preload_app`). The workers share its memory copy-on-write and start without importing
+  anything. Nothing opens a database connection or starts a thread at import time.
+  The background threads, e.g. the search log writer, start on first use in every worker.
+  The objects loaded by the master are moved out of the garbage collector's reach
+  (`gc.freeze`), so collections in the workers don't touch, and copy, the shared pages.
+- Every worker serves WEB_THREADS requests at once with threads (`gthread`). Gevent
+  workers aren't used: psycopg2 would block their event loop.
+- A worker is replaced after `max_requests` requests, plus a random jitter so the workers
+  don't restart at the same time, which bounds the growth of its memory.
+- The database connection pool of every worker is sized from WEB_WORKERS, WEB_THREADS
+  and DB_POOL_BUDGET, see `pool_options` in `app/config.py` and `app.utils.database`.
+- The workers share their request measurements through METRICS_DIR, so '/metrics'
+  serves the sums of all workers, see `app.utils.metrics`. The directory is emptied
+  when the server starts, and the measurements of an exited worker are kept.
+
+Settings, from the environment:
+- PORT: The port to bind to. Defaults to 5000.
+- WEB_WORKERS: The number of worker processes. Defaults to 2.
+- WEB_THREADS: The number of threads of every worker. Defaults to 4.
+- WEB_MAX_REQUESTS: The number of requests after which a worker is replaced. Defaults to 1000.
+- WEB_MAX_REQUESTS_JITTER: The maximum number of requests added to it. Defaults to 100.
+- METRICS_DIR: The directory of the shared measurements.
+  Defaults to `fastsearch-metrics-<port>` in the temporary directory.
+
+Compare settings with `benchmarks/web_load.py --sweep`.
+
+Usage, from the repository root:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import gc
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+port = os.environ.get("PORT", 5000)
+os.environ.setdefault("METRICS_DIR",
+                      os.path.join(tempfile.gettempdir(), f"fastsearch-metrics-{port}"))
+
+from app import WEB_THREADS, WEB_WORKERS  # noqa: E402
+
+wsgi_app = "src.app.__main__:application"
+bind = f"0.0.0.0:{port}"
+
+workers = WEB_WORKERS
+threads = WEB_THREADS
+worker_class = "gthread"
+preload_app = True
+
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 100))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server) -> None:
+    """
+    Removes the measurements of a previous server from METRICS_DIR.
+    """
+    from app.utils.metrics import reset_metrics_dir
+
+    reset_metrics_dir()
+
+
+def when_ready(server) -> None:
+    """
+    Freezes the objects of the preloaded application before the first worker is forked.
+    """
+    gc.freeze()
+
+
+def post_fork(server, worker) -> None:
+    """
+    Drops the pooled connections inherited from the master, a connection must not be
+    shared between processes.
+    """
+    from app.utils.database import use_component
+
+    use_component("web")
+
+
+def worker_exit(server, worker) -> None:
+    """
+    Writes the last measurements of an exiting worker to METRICS_DIR.
+    """
+    from app.utils.metrics import write_metrics
+
+    write_metrics()
+
+
+def child_exit(server, worker) -> None:
+    """
+    Merges the measurements of an exited worker into the retired measurements.
+    """
+    from app.utils.metrics import retire_worker
+
+    retire_worker(worker.pid)
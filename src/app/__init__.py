@@ -21,4 +21,21 @@ DONATION_LINK = "https://www.buymeacoffee.com/abyssara"
 
 CURRENT_DOMAIN = os.environ.get("CURRENT_DOMAIN")
 
-SECRET_KEY = os.environ.get("SECRET_KEY")
\ No newline at end of file
+SECRET_KEY = os.environ.get("SECRET_KEY")
+
+DATABASE_URL = os.environ.get("DATABASE_URL") or (
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+DB_DIRECT_URL = os.environ.get("DB_DIRECT_URL")
+DB_TRANSACTION_POOLING = os.environ.get("DB_TRANSACTION_POOLING", "").lower() in ("1", "true")
+DB_COMPONENT = os.environ.get("DB_COMPONENT", "web")
+DB_SCHEDULER_CONNECTIONS = int(os.environ.get("DB_SCHEDULER_CONNECTIONS", 8))
+DB_SPIDER_CONNECTIONS = int(os.environ.get("DB_SPIDER_CONNECTIONS", 2))
+
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 2))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+DB_POOL_BUDGET = int(os.environ.get("DB_POOL_BUDGET", 40))
+
+DB_REPLICA_HOST = os.environ.get("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.environ.get("DB_REPLICA_PORT")
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 10))
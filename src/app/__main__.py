@@ -48,6 +48,10 @@ sys.path.append("src/")
 
 from app.config import application, db, login_manager  # noqa: F401
 from app.models import User  # noqa: F401
+from app.utils.analytics import init_analytics
+from app.utils.metrics import init_metrics
+from app.utils.querydetector import init_query_detector
+from app.utils.replica import init_replica, primary
 
 
 # Import routes
@@ -56,12 +60,27 @@ import app.routes
 
 application.register_blueprint(app.routes.blueprint)
 
+# Measure every request, the measurements are served at '/metrics'
+init_metrics(application)
+
+# Refresh the analytics reports of the admin dashboard in the background
+init_analytics(application)
+
+# Report N+1 and slow SQL statements in debug and testing mode
+init_query_detector(application)
+
+# Read the read-only routes from the read replica, if one is configured
+init_replica(application)
+
 
 @login_manager.user_loader
 def load_user(user_id):
     """
     Load a user from the database based on the user ID.
 
+    The user is always read from the primary, a user who just registered
+    may not be on the read replica yet.
+
     Args:
       user_id (int): The ID of the user to load.
 
@@ -69,7 +88,8 @@ def load_user(user_id):
       User or None: The loaded user object if found, None otherwise.
     """
     try:
-        return db.session.get(User, int(user_id))  # noqa: F405
+        with primary():
+            return db.session.get(User, int(user_id))  # noqa: F405
     except (AttributeError, ValueError):
         return None
 
@@ -10,8 +10,14 @@ Classes:
 - User: Represents a user in the application.
 - Product: Represents a product in the application.
 - PriceHistory: Represents the price history of a product.
+- PriceQuarantine: Represents a scraped price held back by the ingest anomaly check.
 - Cart: Represents a cart in the application.
 - Message: Represents a message in the application.
+- SearchQuery: Represents a search of the public search API.
+- SearchQueryRollup: Represents the daily statistics of a search string.
+- CrawlRun: Represents a run of the spider and its telemetry.
+- JobRun: Represents a run of a scheduled job.
+- BulkJob: Represents a long admin operation and its progress.
 
 The User class represents a user in the application. 
 It contains attributes such as username, email address, and password.
@@ -27,6 +33,10 @@ The PriceHistory class represents the price history of a product.
 It is associated with a specific product and
 contains information about the price changes over time.
 
+The PriceQuarantine class represents a scraped price that deviated too far
+from the product's recent price history to be applied during ingest.
+It is kept for review instead of being written to the price history.
+
 The Cart class represents a cart in the application.
 It contains attributes such as user ID and product ID.
 The class provides methods for managing items in the cart,
@@ -36,6 +46,22 @@ The Message class represents a message in the application.
 It contains attributes such as sender ID, recipient ID, and content.
 The class provides methods for sending and receiving messages.
 
+The SearchQuery class represents a search of the public search API,
+with its normalized search string, filters, latency and number of results.
+The searches are rolled up every night into SearchQueryRollup rows,
+which hold the number of searches and latency percentiles of every search string and day.
+
+The CrawlRun class represents a run of the spider, with its fetched, parsed, changed
+and deactivated products and the time spent downloading, parsing and writing them,
+in total and for every domain.
+
+The JobRun class represents a run of a job of the scheduler process,
+with the host and process that ran it, its status and its duration.
+
+The BulkJob class represents a long admin operation over a list of items,
+like a bulk edit of products, queued by the web workers and run by the scheduler process.
+It holds the parameters of the operation and its progress.
+
 Note: This module uses SQLAlchemy for database operations
 and Flask-Login for user authentication.
 """
@@ -48,12 +74,19 @@ from app import OWNER_EMAIL, OWNER_USERNAME, SERVER_STARTED_ON
 from app.models.user import User
 from app.models.product import Product
 from app.models.pricehistory import PriceHistory
+from app.models.pricequarantine import PriceQuarantine
 from app.models.cart import Cart
 from app.models.message import Message
+from app.models.searchquery import SearchQuery, SearchQueryRollup
+from app.models.crawlrun import CrawlRun
+from app.models.jobrun import JobRun
+from app.models.bulkjob import BulkJob
 
 Base = declarative_base()
 
-__all__ = ["UserModel", "Product", "PriceHistory", "Cart", "Message"]
+__all__ = ["UserModel", "Product", "PriceHistory", "PriceQuarantine", "Cart", "Message",
+           "SearchQuery", "SearchQueryRollup", "CrawlRun", "JobRun",
+           "BulkJob"]
 
 # def create_tables():
 #     """
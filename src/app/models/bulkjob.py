@@ -0,0 +1,218 @@
+"""
+This module contains the BulkJob class, which holds the state of the long admin operations.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import Index, String, Text, delete, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.config import db
+
+class BulkJob(db.Model):
+    """
+    Represents a long admin operation over a list of items, e.g. a bulk edit of products.
+
+    Attributes:
+        id (str): The unique identifier of the job.
+        name (str): The name of the operation, selects its handler, see `app.utils.jobs`.
+        items (list): The items to handle, e.g. product IDs.
+        params (dict): The parameters of the operation, e.g. the edited field and its value.
+        status (str): 'pending', 'running', 'done' or 'failed'.
+        total (int): The number of items.
+        done (int): The number of handled items.
+        result (int): The sum of the values returned by the chunks, e.g. affected rows.
+        error (str): The error message of a failed job.
+        host (str): The host name of the process that runs the job.
+        pid (int): The process ID of the process that runs the job.
+        created_on (datetime): The date and time the job was queued.
+        started_on (datetime): The date and time the job was last started.
+        finished_on (datetime): The date and time the job finished.
+
+    Methods:
+        create(name, items, params): Queues a job.
+        claim(): Marks the oldest queued job as running by this process.
+        progress(job_id, done, result): Records a handled chunk.
+        finish(job_id, status, error): Records the end of a job.
+        requeue(job_id): Queues a job again, it's resumed after its handled items.
+        requeue_running(): Queues the jobs left running by a stopped process again.
+        prune(days): Deletes the finished jobs older than the given number of days.
+    """
+
+    __tablename__ = "bulk_job"
+
+    id : Mapped[str] = mapped_column(String(length=32), primary_key=True,
+                                     default=lambda: uuid.uuid4().hex)
+    name : Mapped[str] = mapped_column(String(length=100), nullable=False)
+    items : Mapped[list] = mapped_column(JSONB, nullable=False)
+    params : Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    status : Mapped[str] = mapped_column(String(length=20), nullable=False, default="pending")
+    total : Mapped[int] = mapped_column(nullable=False)
+    done : Mapped[int] = mapped_column(nullable=False, default=0)
+    result : Mapped[int] = mapped_column(nullable=False, default=0)
+    error : Mapped[str] = mapped_column(Text, nullable=True)
+    host : Mapped[str] = mapped_column(String(length=255), nullable=True)
+    pid : Mapped[int] = mapped_column(nullable=True)
+    created_on : Mapped[datetime] = mapped_column(nullable=False, default=datetime.now)
+    started_on : Mapped[datetime] = mapped_column(nullable=True)
+    finished_on : Mapped[datetime] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        Index("ix_bulk_job_pending", created_on, postgresql_where=text("status = 'pending'")),
+    )
+
+    @staticmethod
+    def create(name, items, params=None) -> "BulkJob":
+        """
+        Queues a job.
+
+        Args:
+            name (str): The name of the operation.
+            items (list): The items to handle.
+            params (dict, optional): The parameters of the operation. Defaults to None.
+
+        Returns:
+            BulkJob: The queued job.
+        """
+        job = BulkJob(name=name, items=list(items), params=params or {}, total=len(items))
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def claim() -> "BulkJob | None":
+        """
+        Marks the oldest queued job as running by this process.
+
+        The job is locked while it is claimed, so concurrent processes claim different jobs.
+
+        Returns:
+            BulkJob: The claimed job, None if no job is queued.
+        """
+        job = db.session.scalar(
+            select(BulkJob)
+            .where(BulkJob.status == "pending")
+            .order_by(BulkJob.created_on)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if job is None:
+            db.session.rollback()
+            return None
+        job.status = "running"
+        job.host = socket.gethostname()
+        job.pid = os.getpid()
+        job.started_on = datetime.now()
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def progress(job_id, done, result) -> None:
+        """
+        Records a handled chunk of a job.
+
+        Args:
+            job_id (str): The ID of the job.
+            done (int): The number of handled items, including the chunk.
+            result (int): The value returned by the chunk.
+        """
+        db.session.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_id)
+            .values(done=done, result=BulkJob.result + result)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def finish(job_id, status, error=None) -> None:
+        """
+        Records the end of a job.
+
+        Args:
+            job_id (str): The ID of the job.
+            status (str): 'done' or 'failed'.
+            error (str, optional): The error message of a failed job. Defaults to None.
+        """
+        db.session.execute(
+            update(BulkJob)
+            .where(BulkJob.id == job_id)
+            .values(status=status, error=error, finished_on=datetime.now())
+        )
+        db.session.commit()
+
+    @staticmethod
+    def requeue(job_id) -> None:
+        """
+        Queues a job again, it's resumed after its handled items.
+
+        Args:
+            job_id (str): The ID of the job.
+        """
+        db.session.execute(
+            update(BulkJob).where(BulkJob.id == job_id).values(status="pending")
+        )
+        db.session.commit()
+
+    @staticmethod
+    def requeue_running() -> int:
+        """
+        Queues the jobs left running by a stopped process again.
+
+        Returns:
+            int: The number of queued jobs.
+        """
+        result = db.session.execute(
+            update(BulkJob).where(BulkJob.status == "running").values(status="pending")
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def prune(days) -> int:
+        """
+        Deletes the jobs that finished more than the given number of days ago.
+
+        Args:
+            days (int): The number of days the finished jobs are kept.
+
+        Returns:
+            int: The number of deleted jobs.
+        """
+        result = db.session.execute(
+            delete(BulkJob).where(BulkJob.finished_on < datetime.now() - timedelta(days=days))
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary of the job's progress.
+
+        Returns:
+            dict: A dictionary containing the job's progress.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "result": self.result,
+            "progress": round(self.done / self.total * 100, 1) if self.total else 100.0,
+            "error": self.error,
+            "created_on": self.created_on,
+            "finished_on": self.finished_on,
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the job.
+
+        Returns:
+            str: A string representation of the job.
+        """
+        return f"<BulkJob {self.id}:{self.name}:{self.status}>"
@@ -2,12 +2,26 @@
 This module contains the Cart model which represents a cart in the application.
 """
 
-from sqlalchemy import ForeignKey, Integer
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import (ForeignKey, Integer, Float, Numeric, String, UniqueConstraint,
+                        and_, cast, delete, func, literal, select, update)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 
 from app.config import db
 from .user import User
 from .product import Product
+from .pricehistory import PriceHistory
+
+# Number of cart items shown on a single page of the profile page.
+WATCHLIST_PER_PAGE = 24
+
+# Alert rules a user can set on a product in their cart.
+ALERT_ANY_DROP = "any_drop"
+ALERT_TARGET_PRICE = "target_price"
+ALERT_PERCENT_DROP = "percent_drop"
+ALERT_BACK_IN_STOCK = "back_in_stock"
+ALERT_TYPES = (ALERT_ANY_DROP, ALERT_TARGET_PRICE, ALERT_PERCENT_DROP, ALERT_BACK_IN_STOCK)
 
 class Cart(db.Model):
     """
@@ -17,22 +31,43 @@ class Cart(db.Model):
         id (int): The unique identifier for the cart.
         user_id (int): The ID of the user associated with the cart.
         product_id (int): The ID of the product in the cart.
+        alert_type (str): The alert rule of the item, one of `ALERT_TYPES`.
+        alert_target_price (float): The price the product has to reach
+        for a `target_price` alert.
+        alert_percent_drop (float): The percentage the price has to drop by
+        for a `percent_drop` alert.
         user (User): The user associated with the cart.
         product (Product): The product in the cart.
 
     Methods:
         __init__(user_id, product_id): Initializes a new instance of the Cart class.
         items(user_id): Retrieves all the items in the cart for the specified user.
-        add_to_cart(user_id, product_id): Adds a new item to the cart for the specified user.
-        remove_from_cart(user_id, product_id): Removes an item from the cart for the specified user.
+        watchlist(user_id, page, per_page): Retrieves a page of the cart with price changes.
+        append(user_id, product_id): Adds a new item to the cart for the specified user.
+        bulk_append(user_id, product_ids): Adds several items to the cart for the specified user.
+        in_cart(user_id, product_id): Checks if a product is in the cart for the specified user.
+        in_cart_ids(user_id, product_ids): Returns which of the products are in the cart.
+        remove(user_id, product_id): Removes an item from the cart for the specified user.
+        bulk_remove(user_id, product_ids): Removes several items from the cart
+        for the specified user.
+        set_alert(user_id, product_id, alert_type, target_price, percent_drop):
+        Sets the alert rule of an item in the cart for the specified user.
     """
 
     __tablename__ = "cart"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_cart_user_id_product_id"),
+        {'extend_existing': True},
+    )
 
     id : Mapped[int] = mapped_column(Integer(), primary_key=True)
     user_id = mapped_column(Integer(), ForeignKey("UserModel.id"), nullable=False)
-    product_id = mapped_column(Integer(), ForeignKey("product.id"), nullable=False)
+    product_id = mapped_column(Integer(), ForeignKey("product.id", ondelete="CASCADE"),
+                               nullable=False, index=True)
+    alert_type = mapped_column(String(), nullable=False, default=ALERT_ANY_DROP,
+                               server_default=ALERT_ANY_DROP)
+    alert_target_price = mapped_column(Float(), nullable=True)
+    alert_percent_drop = mapped_column(Float(), nullable=True)
     user: Mapped["User"] = relationship(backref="cart")
     product: Mapped["Product"] = relationship(backref="cart")
 
@@ -56,24 +91,95 @@ class Cart(db.Model):
             user_id (int): The ID of the user.
 
         Returns:
-            list: A list of Cart objects representing the items in the cart.
+            list: A list of Product objects representing the items in the cart.
+        """
+        return Product.query.join(Cart, Cart.product_id == Product.id).filter(
+            Cart.user_id == user_id).order_by(Cart.id.desc()).all()
+
+    @staticmethod
+    def watchlist(user_id, page=1, per_page=WATCHLIST_PER_PAGE) -> Pagination:
+        """
+        Retrieves a page of the items in the cart for the specified user
+        together with the price change of every product.
+
+        The products, their previous price from the price history and the price change
+        are loaded with a single joined query, so rendering the page takes
+        a constant number of queries regardless of the size of the cart.
+
+        Args:
+            user_id (int): The ID of the user.
+            page (int, optional): The page number. Defaults to 1.
+            per_page (int, optional): The number of items per page.
+            Defaults to WATCHLIST_PER_PAGE.
+
+        Returns:
+            Pagination: A page whose items are (Product, previous_price, price_change) rows.
+            The price change is the percentage the price dropped by since the previous
+            price history entry, 0 if the price never changed.
         """
-        return [i.product for i in Cart.query.filter_by(user_id=user_id).all()]
+        ranked_history = db.session.query(
+            PriceHistory.product_id,
+            PriceHistory.price,
+            func.row_number().over(
+                partition_by=PriceHistory.product_id,
+                order_by=(PriceHistory.change_date.desc(), PriceHistory.price_history_id.desc()),
+            ).label("position"),
+        ).join(Cart, Cart.product_id == PriceHistory.product_id).filter(
+            Cart.user_id == user_id).subquery()
+
+        previous_price = ranked_history.c.price
+        price_change = func.coalesce(
+            cast(func.round(cast(
+                (previous_price / func.nullif(Product.price, 0) - 1) * 100, Numeric), 2), Float),
+            0.0,
+        )
+
+        return db.session.query(
+            Product,
+            previous_price.label("previous_price"),
+            price_change.label("price_change"),
+        ).join(Cart, Cart.product_id == Product.id).outerjoin(
+            ranked_history,
+            and_(ranked_history.c.product_id == Product.id, ranked_history.c.position == 2),
+        ).filter(Cart.user_id == user_id).order_by(Cart.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False)
 
     @staticmethod
     def append(user_id, product_id) -> None:
         """
         Adds a new item to the cart for the specified user.
 
+        Adding a product that is already in the cart does nothing.
+
         Args:
             user_id (int): The ID of the user.
             product_id (int): The ID of the product to add to the cart.
         """
-        if Cart.in_cart(user_id, product_id):
-            return
-        cart = Cart(user_id, product_id)
-        db.session.add(cart)
+        Cart.bulk_append(user_id, [product_id])
+
+    @staticmethod
+    def bulk_append(user_id, product_ids) -> int:
+        """
+        Adds several items to the cart for the specified user with a single statement.
+
+        The products are inserted with `ON CONFLICT DO NOTHING` against the unique
+        (user_id, product_id) constraint, so concurrent requests can't store duplicates.
+        IDs of products that don't exist are ignored.
+
+        Args:
+            user_id (int): The ID of the user.
+            product_ids (list): The IDs of the products to add to the cart.
+
+        Returns:
+            int: The number of products that were added to the cart.
+        """
+        statement = insert(Cart).from_select(
+            ["user_id", "product_id"],
+            select(literal(user_id, Integer), Product.id).where(Product.id.in_(product_ids)),
+        ).on_conflict_do_nothing(index_elements=["user_id", "product_id"])
+        result = db.session.execute(statement)
         db.session.commit()
+        return result.rowcount
 
     @staticmethod
     def in_cart(user_id, product_id) -> bool:
@@ -89,6 +195,25 @@ class Cart(db.Model):
         """
         return Cart.query.filter_by(user_id=user_id, product_id=product_id).first() is not None
 
+    @staticmethod
+    def in_cart_ids(user_id, product_ids) -> set:
+        """
+        Returns which of the products are in the cart of the specified user, with a single query.
+
+        Args:
+            user_id (int): The ID of the user.
+            product_ids (list): The IDs of the products to check.
+
+        Returns:
+            set: The IDs of the products that are in the cart.
+        """
+        if not product_ids:
+            return set()
+        return set(db.session.scalars(
+            select(Cart.product_id).where(Cart.user_id == user_id,
+                                          Cart.product_id.in_(product_ids))
+        ))
+
     @staticmethod
     def remove(user_id, product_id) -> None:
         """
@@ -98,9 +223,51 @@ class Cart(db.Model):
             user_id (int): The ID of the user.
             product_id (int): The ID of the product to remove from the cart.
         """
-        cart = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
-        db.session.delete(cart)
+        Cart.bulk_remove(user_id, [product_id])
+
+    @staticmethod
+    def bulk_remove(user_id, product_ids) -> int:
+        """
+        Removes several items from the cart for the specified user with a single statement.
+
+        Args:
+            user_id (int): The ID of the user.
+            product_ids (list): The IDs of the products to remove from the cart.
+
+        Returns:
+            int: The number of products that were removed from the cart.
+        """
+        result = db.session.execute(
+            delete(Cart).where(Cart.user_id == user_id, Cart.product_id.in_(product_ids))
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def set_alert(user_id, product_id, alert_type,
+                  target_price=None, percent_drop=None) -> bool:
+        """
+        Sets the alert rule of an item in the cart for the specified user.
+
+        Args:
+            user_id (int): The ID of the user.
+            product_id (int): The ID of the product in the cart.
+            alert_type (str): The alert rule, one of `ALERT_TYPES`.
+            target_price (float, optional): The price threshold of a `target_price` alert.
+            percent_drop (float, optional): The percentage threshold of a `percent_drop` alert.
+
+        Returns:
+            bool: True if the product is in the cart and the rule was set, False otherwise.
+        """
+        result = db.session.execute(
+            update(Cart).where(Cart.user_id == user_id, Cart.product_id == product_id).values(
+                alert_type=alert_type,
+                alert_target_price=target_price if alert_type == ALERT_TARGET_PRICE else None,
+                alert_percent_drop=percent_drop if alert_type == ALERT_PERCENT_DROP else None,
+            )
+        )
         db.session.commit()
+        return result.rowcount > 0
 
     @staticmethod
     def clear(user_id) -> None:
@@ -0,0 +1,136 @@
+"""
+This module contains the CrawlRun class, which stores the telemetry of a run of the spider.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import String, delete, desc
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.config import db
+
+class CrawlRun(db.Model):
+    """
+    Represents a run of the spider, e.g. the nightly update of the records.
+
+    The counters and timers are the totals of the run,
+    `domains` holds the same counters and timers for every domain,
+    together with the median, 95th percentile and maximum download latency.
+
+    Attributes:
+        id (int): The unique identifier of the run.
+        method (str): The scraping method, 'list' for the update of the records.
+        status (str): The reason the spider closed, e.g. 'finished' or 'shutdown'.
+        started_on (datetime): The date and time the run started.
+        finished_on (datetime): The date and time the run finished.
+        duration_ms (float): The duration of the run, in milliseconds.
+        fetched (int): The number of downloaded pages.
+        download_failures (int): The number of pages that could not be downloaded.
+        parsed (int): The number of parsed items.
+        skipped (int): The number of pages of domains without a parser.
+        created (int): The number of new products.
+        changed (int): The number of products whose price, rating or availability changed.
+        unchanged (int): The number of products that didn't change.
+        quarantined (int): The number of prices held back by the anomaly check.
+        deactivated (int): The number of products deactivated because their page
+        couldn't be parsed.
+        download_ms (float): The sum of the download latencies, in milliseconds.
+        parse_ms (float): The time spent parsing, in milliseconds.
+        db_ms (float): The time spent writing to the database, in milliseconds.
+        domains (dict): The counters and timers of every domain.
+
+    Methods:
+        recent(limit): Retrieves the most recent runs.
+        prune(days): Deletes the runs older than the given number of days.
+    """
+
+    __tablename__ = "crawl_run"
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    method : Mapped[str] = mapped_column(String(length=20), nullable=False)
+    status : Mapped[str] = mapped_column(String(length=50), nullable=False)
+    started_on : Mapped[datetime] = mapped_column(nullable=False, index=True)
+    finished_on : Mapped[datetime] = mapped_column(nullable=False)
+    duration_ms : Mapped[float] = mapped_column(nullable=False)
+    fetched : Mapped[int] = mapped_column(nullable=False, default=0)
+    download_failures : Mapped[int] = mapped_column(nullable=False, default=0)
+    parsed : Mapped[int] = mapped_column(nullable=False, default=0)
+    skipped : Mapped[int] = mapped_column(nullable=False, default=0)
+    created : Mapped[int] = mapped_column(nullable=False, default=0)
+    changed : Mapped[int] = mapped_column(nullable=False, default=0)
+    unchanged : Mapped[int] = mapped_column(nullable=False, default=0)
+    quarantined : Mapped[int] = mapped_column(nullable=False, default=0)
+    deactivated : Mapped[int] = mapped_column(nullable=False, default=0)
+    download_ms : Mapped[float] = mapped_column(nullable=False, default=0.0)
+    parse_ms : Mapped[float] = mapped_column(nullable=False, default=0.0)
+    db_ms : Mapped[float] = mapped_column(nullable=False, default=0.0)
+    domains : Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+
+    @staticmethod
+    def recent(limit=20) -> list:
+        """
+        Retrieves the most recent runs.
+
+        Args:
+            limit (int, optional): The number of runs. Defaults to 20.
+
+        Returns:
+            list: The runs, the most recent first.
+        """
+        return CrawlRun.query.order_by(desc(CrawlRun.started_on)).limit(limit).all()
+
+    @staticmethod
+    def prune(days) -> int:
+        """
+        Deletes the runs that started more than the given number of days ago.
+
+        Args:
+            days (int): The number of days the runs are kept.
+
+        Returns:
+            int: The number of deleted runs.
+        """
+        result = db.session.execute(
+            delete(CrawlRun).where(CrawlRun.started_on < datetime.now() - timedelta(days=days))
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary of the run's attributes.
+
+        Returns:
+            dict: A dictionary containing the run's attributes.
+        """
+        return {
+            "id": self.id,
+            "method": self.method,
+            "status": self.status,
+            "started_on": self.started_on,
+            "finished_on": self.finished_on,
+            "duration_ms": self.duration_ms,
+            "fetched": self.fetched,
+            "download_failures": self.download_failures,
+            "parsed": self.parsed,
+            "skipped": self.skipped,
+            "created": self.created,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "quarantined": self.quarantined,
+            "deactivated": self.deactivated,
+            "download_ms": self.download_ms,
+            "parse_ms": self.parse_ms,
+            "db_ms": self.db_ms,
+            "domains": self.domains,
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the run.
+
+        Returns:
+            str: A string representation of the run.
+        """
+        return f"<CrawlRun {self.id}:{self.method}:{self.status}>"
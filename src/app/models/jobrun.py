@@ -0,0 +1,168 @@
+"""
+This module contains the JobRun class, which records the runs of the scheduled jobs.
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import Index, String, Text, delete, desc, func, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.config import db
+
+class JobRun(db.Model):
+    """
+    Represents a run of a scheduled job, e.g. the nightly update of the records.
+
+    Attributes:
+        id (int): The unique identifier of the run.
+        name (str): The name of the job.
+        status (str): 'running', 'succeeded' or 'failed'.
+        host (str): The host name of the scheduler process that ran the job.
+        pid (int): The process ID of the scheduler process that ran the job.
+        started_on (datetime): The date and time the run started.
+        finished_on (datetime): The date and time the run finished, None while it runs.
+        duration_ms (float): The duration of the run, in milliseconds.
+        error (str): The error message of a failed run.
+        result (dict): The report returned by the job, e.g. of the search warming.
+
+    Methods:
+        start(name): Records the start of a run.
+        finish(run_id, status, duration_ms, error, result): Records the end of a run.
+        recent(name, limit): Retrieves the most recent runs.
+        latest(): Retrieves the latest run of every job.
+        prune(days): Deletes the runs older than the given number of days.
+    """
+
+    __tablename__ = "job_run"
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    name : Mapped[str] = mapped_column(String(length=100), nullable=False)
+    status : Mapped[str] = mapped_column(String(length=20), nullable=False, default="running")
+    host : Mapped[str] = mapped_column(String(length=255), nullable=False)
+    pid : Mapped[int] = mapped_column(nullable=False)
+    started_on : Mapped[datetime] = mapped_column(nullable=False, server_default=func.now())
+    finished_on : Mapped[datetime] = mapped_column(nullable=True)
+    duration_ms : Mapped[float] = mapped_column(nullable=True)
+    error : Mapped[str] = mapped_column(Text, nullable=True)
+    result : Mapped[dict] = mapped_column(JSONB, nullable=True)
+
+    __table_args__ = (
+        Index("ix_job_run_name_started_on", name, started_on.desc()),
+    )
+
+    @staticmethod
+    def start(name) -> int:
+        """
+        Records the start of a run of a job by this process.
+
+        Args:
+            name (str): The name of the job.
+
+        Returns:
+            int: The ID of the run.
+        """
+        run = JobRun(name=name, status="running", host=socket.gethostname(), pid=os.getpid(),
+                     started_on=datetime.now())
+        db.session.add(run)
+        db.session.commit()
+        return run.id
+
+    @staticmethod
+    def finish(run_id, status, duration_ms, error=None, result=None) -> None:
+        """
+        Records the end of a run.
+
+        Args:
+            run_id (int): The ID of the run.
+            status (str): 'succeeded' or 'failed'.
+            duration_ms (float): The duration of the run, in milliseconds.
+            error (str, optional): The error message of a failed run. Defaults to None.
+            result (dict, optional): The report returned by the job. Defaults to None.
+        """
+        run = db.session.get(JobRun, run_id)
+        run.status = status
+        run.finished_on = datetime.now()
+        run.duration_ms = round(duration_ms, 1)
+        run.error = error
+        run.result = result
+        db.session.commit()
+
+    @staticmethod
+    def recent(name=None, limit=50) -> list:
+        """
+        Retrieves the most recent runs.
+
+        Args:
+            name (str, optional): Only the runs of this job. Defaults to None, all jobs.
+            limit (int, optional): The number of runs. Defaults to 50.
+
+        Returns:
+            list: The runs, the most recent first.
+        """
+        query = JobRun.query
+        if name:
+            query = query.filter_by(name=name)
+        return query.order_by(desc(JobRun.started_on)).limit(limit).all()
+
+    @staticmethod
+    def latest() -> list:
+        """
+        Retrieves the latest run of every job.
+
+        Returns:
+            list: The runs, ordered by the name of the job.
+        """
+        return db.session.scalars(
+            select(JobRun)
+            .distinct(JobRun.name)
+            .order_by(JobRun.name, desc(JobRun.started_on))
+        ).all()
+
+    @staticmethod
+    def prune(days) -> int:
+        """
+        Deletes the runs that started more than the given number of days ago.
+
+        Args:
+            days (int): The number of days the runs are kept.
+
+        Returns:
+            int: The number of deleted runs.
+        """
+        result = db.session.execute(
+            delete(JobRun).where(JobRun.started_on < datetime.now() - timedelta(days=days))
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary of the run's attributes.
+
+        Returns:
+            dict: A dictionary containing the run's attributes.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "host": self.host,
+            "pid": self.pid,
+            "started_on": self.started_on,
+            "finished_on": self.finished_on,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "result": self.result,
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the run.
+
+        Returns:
+            str: A string representation of the run.
+        """
+        return f"<JobRun {self.id}:{self.name}:{self.status}>"
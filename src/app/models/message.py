@@ -2,10 +2,14 @@
 This module contains the Message class, which represents a message in the application.
 """
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index, delete, insert, update
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.config import db
+from .user import User
+
+# Number of messages returned by a single page of the inbox.
+INBOX_PER_PAGE = 50
 
 class Message(db.Model):
     """
@@ -17,9 +21,15 @@ class Message(db.Model):
         sender_id (int): The ID of the user who sent the message.
         recipient_id (int): The ID of the user who received the message.
         read (bool): Indicates whether the message has been read or not.
+
+    Methods:
+        bulk_send(text, sender_id, recipient_ids): Sends the same message to several users.
+        inbox(before_id, unread_only, limit): Retrieves a page of messages with their senders.
+        with_sender(message_id): Retrieves a message together with its sender.
+        bulk_mark_as_read(message_ids): Marks several messages as read.
+        bulk_delete(message_ids): Deletes several messages.
     """
 
-    __table_args__ = {'extend_existing': True}
     __tablename__ = 'message'
 
     id : Mapped[int] = mapped_column(primary_key=True)
@@ -28,6 +38,12 @@ class Message(db.Model):
     recipient_id: Mapped[int] = mapped_column(ForeignKey('UserModel.id'), nullable=False)
     read: Mapped[bool] = mapped_column(default=False)
 
+    __table_args__ = (
+        # Only the unread messages are indexed, so counting them stays cheap
+        Index("ix_message_unread", id, postgresql_where=read.is_(False)),
+        {'extend_existing': True},
+    )
+
     def __init__(self, text, sender_id, recipient_id):
         # Constructor implementation goes here
         """
@@ -43,6 +59,99 @@ class Message(db.Model):
         self.recipient_id = recipient_id
         self.read = False
 
+    @staticmethod
+    def bulk_send(text, sender_id, recipient_ids) -> None:
+        """
+        Sends the same message to several users with a single insert and a single commit.
+
+        Args:
+            text (str): The text content of the message.
+            sender_id (int): The ID of the sender user.
+            recipient_ids (list): The IDs of the recipient users.
+        """
+        if not recipient_ids:
+            return
+        db.session.execute(
+            insert(Message),
+            [
+                {"text": text, "sender_id": sender_id, "recipient_id": recipient_id, "read": False}
+                for recipient_id in recipient_ids
+            ],
+        )
+        db.session.commit()
+
+    @staticmethod
+    def inbox(before_id=None, unread_only=False, limit=INBOX_PER_PAGE) -> list:
+        """
+        Retrieves a page of messages, newest first, together with their senders.
+
+        The page is selected with keyset pagination on the primary key, so every page
+        is an index range scan no matter how deep it is. Unread messages are read
+        from the partial index of unread messages.
+
+        Args:
+            before_id (int, optional): Only messages with a lower ID are returned,
+            pass the ID of the last message of the previous page. Defaults to None.
+            unread_only (bool, optional): Return only unread messages. Defaults to False.
+            limit (int, optional): The number of messages. Defaults to INBOX_PER_PAGE.
+
+        Returns:
+            list: (Message, User) rows, the user is the sender of the message.
+        """
+        query = db.session.query(Message, User).join(User, User.id == Message.sender_id)
+        if before_id is not None:
+            query = query.filter(Message.id < before_id)
+        if unread_only:
+            query = query.filter(Message.read.is_(False))
+        return query.order_by(Message.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def with_sender(message_id) -> tuple:
+        """
+        Retrieves a message together with its sender with a single query.
+
+        Args:
+            message_id (int): The ID of the message.
+
+        Returns:
+            tuple: The (Message, User) row, None if the message doesn't exist.
+        """
+        return db.session.query(Message, User).join(
+            User, User.id == Message.sender_id).filter(Message.id == message_id).first()
+
+    @staticmethod
+    def bulk_mark_as_read(message_ids) -> int:
+        """
+        Marks several messages as read with a single statement.
+
+        Args:
+            message_ids (list): The IDs of the messages.
+
+        Returns:
+            int: The number of messages that were unread.
+        """
+        result = db.session.execute(
+            update(Message).where(Message.id.in_(message_ids), Message.read.is_(False))
+            .values(read=True)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def bulk_delete(message_ids) -> int:
+        """
+        Deletes several messages with a single statement.
+
+        Args:
+            message_ids (list): The IDs of the messages.
+
+        Returns:
+            int: The number of messages that were deleted.
+        """
+        result = db.session.execute(delete(Message).where(Message.id.in_(message_ids)))
+        db.session.commit()
+        return result.rowcount
+
     def mark_as_read(self):
         # Method implementation goes here
         """
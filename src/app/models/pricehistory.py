@@ -3,7 +3,7 @@ This module contains the PriceHistory class, which represents the price history
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy import ForeignKey, desc
+from sqlalchemy import ForeignKey, Index, desc, select
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.config import db
@@ -32,16 +32,21 @@ class PriceHistory(db.Model):
     """
 
     __tablename__ = "price_history"
-    __table_args__ = {'extend_existing': True}
 
     # Attributes
 
     price_history_id : Mapped[int] = mapped_column(primary_key=True)
-    product_id : Mapped[int] = mapped_column(ForeignKey("product.id"), nullable=False)
+    product_id : Mapped[int] = mapped_column(ForeignKey("product.id", ondelete="CASCADE"),
+                                             nullable=False)
     price : Mapped[float] = mapped_column(nullable=False)
     price_currency : Mapped[str] = mapped_column(default="USD")
     change_date : Mapped[datetime] = mapped_column(nullable=False, default=datetime.now().date())
 
+    __table_args__ = (
+        Index("ix_price_history_product_id_change_date", product_id, change_date.desc()),
+        {'extend_existing': True},
+    )
+
     # Methods
 
     def __init__(self, product_id, price, price_currency, date=datetime.now().date()) -> None:
@@ -77,6 +82,47 @@ class PriceHistory(db.Model):
         return PriceHistory.query.filter_by(product_id=product_id).order_by(
             PriceHistory.change_date).first().change_date.date()
 
+    @staticmethod
+    def _latest_price(product_id, before=None, offset=0):
+        """
+        Returns a scalar subquery of the latest price of the product.
+
+        Args:
+            product_id (int): The ID of the product.
+            before (date, optional): Only prices changed before this date are considered.
+            offset (int, optional): The number of newer prices to skip. Defaults to 0.
+
+        Returns:
+            ScalarSelect: The subquery, NULL if there is no such price.
+        """
+        query = select(PriceHistory.price).where(PriceHistory.product_id == product_id)
+        if before is not None:
+            query = query.where(PriceHistory.change_date < before)
+        return query.order_by(desc(PriceHistory.change_date)).offset(offset).limit(1)\
+            .scalar_subquery()
+
+    @staticmethod
+    def _compared_prices(product_id, days=None) -> tuple:
+        """
+        Returns the current price of the product and the price it is compared with,
+        read with a single query.
+
+        Args:
+            product_id (int): The ID of the product.
+            days (int, optional): Compare with the latest price older than this number of days.
+            Defaults to the previous price.
+
+        Returns:
+            tuple: The current and the compared price, None if they don't exist.
+        """
+        if days:
+            compared = PriceHistory._latest_price(
+                product_id, before=datetime.now().date() - timedelta(days=days))
+        else:
+            compared = PriceHistory._latest_price(product_id, offset=1)
+        return tuple(db.session.execute(
+            select(PriceHistory._latest_price(product_id), compared)).one())
+
     @staticmethod
     def if_price_change(product_id, days=None) -> bool:
         """
@@ -91,21 +137,10 @@ class PriceHistory(db.Model):
             bool: True if the price has changed, False otherwise.
 
         """
+        cur, last = PriceHistory._compared_prices(product_id, days)
         if not days:
-            return PriceHistory.query.filter_by(product_id=product_id).count() > 1
-        records = PriceHistory.query.filter_by(product_id=product_id).order_by(
-            desc(PriceHistory.change_date))
-
-        if records.count() < 2:
-            return False
-
-        cur = records.first().price
-
-        records = records.filter(
-            PriceHistory.change_date <
-            datetime.now().date() - timedelta(days=days))
-
-        return records.first().price != cur.first().price
+            return last is not None
+        return last is not None and cur != last
 
     @staticmethod
     def price_change(product_id, days=None) -> float:
@@ -120,34 +155,7 @@ class PriceHistory(db.Model):
             float: The price change percentage.
 
         """
-        records = PriceHistory.query.filter_by(product_id=product_id).order_by(
-            desc(PriceHistory.change_date))
-
-        if records.count() < 2:
-            return 0.0
-
-        if not days:
-            cur = records.first().price
-            last = records.offset(1).first().price
-
-            cur = float(cur.replace("$", "").replace(",", ""))
-            last = float(last.replace("$", "").replace(",", ""))
-
-            return round(last / cur - 1, 2) * 100
-
-        cur = records.first().price
-
-        records = records.filter(
-            PriceHistory.change_date <
-            datetime.now().date() - timedelta(days=days))
-
-        if not records.count():
+        cur, last = PriceHistory._compared_prices(product_id, days)
+        if cur is None or last is None or not cur:
             return 0.0
-        records = records.order_by(desc(PriceHistory.change_date))
-
-        last = records.first()
-
-        cur = float(cur.replace("$", "").replace(",", ""))
-        last = float(last.replace("$", "").replace(",", ""))
-
         return round(last / cur - 1, 2) * 100
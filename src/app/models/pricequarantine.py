@@ -0,0 +1,67 @@
+"""
+This module contains the PriceQuarantine class, which stores scraped prices that failed
+the anomaly check during ingest.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, func
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.config import db
+
+class PriceQuarantine(db.Model):
+    """
+    Represents a suspicious price observation that was held back instead of being applied.
+
+    Attributes:
+        id (int): The unique identifier for the quarantined observation.
+        product_id (int): The ID of the product the price was scraped for.
+        price (float): The scraped price.
+        price_currency (str): The currency of the scraped price.
+        median_price (float): The rolling median of the product's recent price history.
+        deviation (float): The median absolute deviation of the product's recent price history.
+        observed_on (datetime): The date and time when the price was scraped.
+        released_on (datetime): The date and time when later observations confirmed the price
+        and it was accepted, None while it is held back.
+    """
+
+    __tablename__ = "price_quarantine"
+    __table_args__ = {'extend_existing': True}
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    product_id : Mapped[int] = mapped_column(ForeignKey("product.id", ondelete="CASCADE"),
+                                             nullable=False, index=True)
+    price : Mapped[float] = mapped_column(nullable=False)
+    price_currency : Mapped[str] = mapped_column(default="USD")
+    median_price : Mapped[float] = mapped_column(nullable=False)
+    deviation : Mapped[float] = mapped_column(nullable=False)
+    observed_on : Mapped[datetime] = mapped_column(nullable=False, server_default=func.now())
+    released_on : Mapped[datetime] = mapped_column(nullable=True)
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary of the quarantined observation's attributes.
+
+        Returns:
+            dict: A dictionary containing the quarantined observation's attributes.
+        """
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "price": self.price,
+            "price_currency": self.price_currency,
+            "median_price": self.median_price,
+            "deviation": self.deviation,
+            "observed_on": self.observed_on,
+            "released_on": self.released_on,
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the quarantined observation.
+
+        Returns:
+            str: A string representation of the quarantined observation.
+        """
+        return f"<PriceQuarantine {self.id}:{self.product_id}>"
@@ -3,7 +3,7 @@ This module contains the Product model for the application.
 """
 
 import re
-from sqlalchemy import Index, Computed, func
+from sqlalchemy import Index, Computed, delete, func, insert, literal, select, update
 from flask_sqlalchemy.query import Query
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
@@ -11,6 +11,8 @@ from app.config import db
 from app.models.pricehistory import PriceHistory
 from app.models.ts_vector import TSVector
 
+# Fields that can be set for a selection of products at once.
+BULK_EDIT_FIELDS = ("price", "price_currency", "item_class", "producer", "availability")
 
 class Product(db.Model):
     """
@@ -42,6 +44,12 @@ class Product(db.Model):
         search(search, query): Performs a search operation on the given
         query based on the provided search string.
         get_filters(): Returns a dictionary of filters for querying products.
+        search_rank(search): Returns the rank of a product for the search string.
+        apply_filters(src, query): Applies the filters of the source to the query.
+        selected_ids(src): Returns the IDs of the products matching the filters of the source.
+        bulk_delete(product_ids): Deletes several products with their dependent rows.
+        bulk_deactivate(product_ids): Marks several products as out of stock.
+        bulk_edit(product_ids, field, value): Sets a field of several products.
         price_change(days=None): Returns the price change of the product
         in the last price history entry.
     """
@@ -182,6 +190,24 @@ class Product(db.Model):
         except Exception as e:
             raise func.__dir__()
     @staticmethod
+    def search_rank(search: str):
+        """
+        Returns the SQL expression ranking a product for the search string.
+
+        The rank follows the same rules as `search`: the trigram similarity of the title
+        for short search strings, the full-text rank of the title otherwise.
+
+        Args:
+            search (str): The search string.
+
+        Returns:
+            ColumnElement: The rank, higher is better.
+        """
+        if len(search) < 10 or len(search.split()) < 3:
+            return func.similarity(Product.title, search)
+        return func.ts_rank(Product.tsvector_title, func.plainto_tsquery(search))
+
+    @staticmethod
     def get_filters(src: dict) -> dict:
         """
         Returns a dictionary of filters based on the source.
@@ -233,6 +259,108 @@ class Product(db.Model):
             ],
         }
 
+    @staticmethod
+    def apply_filters(src: dict, query: Query = None) -> tuple[Query, dict]:
+        """
+        Applies the filters of `get_filters` that have a value in the source to the query.
+
+        Args:
+            src (dict): The source of the filter values, e.g. the request arguments.
+            query (Query, optional): The query to filter. Defaults to all products.
+
+        Returns:
+            tuple: The filtered query and a dictionary of the applied filter values.
+        """
+        query = Product.query if query is None else query
+        variables = {}
+        for key, (value, apply) in Product.get_filters(src).items():
+            if value:
+                query = apply(value, query)
+                variables[key] = value
+        return query, variables
+
+    @staticmethod
+    def selected_ids(src: dict) -> list[int]:
+        """
+        Returns the IDs of the products matching the filters of the source.
+
+        Args:
+            src (dict): The source of the filter values, e.g. the request arguments.
+
+        Returns:
+            list: The IDs of the matching products in ascending order.
+        """
+        query, _ = Product.apply_filters(src)
+        return [product_id for (product_id,) in
+                query.with_entities(Product.id).order_by(None).order_by(Product.id)]
+
+    @staticmethod
+    def bulk_delete(product_ids) -> int:
+        """
+        Deletes several products with a single statement.
+
+        The price history, cart items and quarantined prices of the products
+        are removed by the database through `ON DELETE CASCADE`.
+
+        Args:
+            product_ids (list): The IDs of the products.
+
+        Returns:
+            int: The number of deleted products.
+        """
+        result = db.session.execute(delete(Product).where(Product.id.in_(product_ids)))
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def bulk_deactivate(product_ids) -> int:
+        """
+        Marks several products as out of stock with a single statement.
+
+        Args:
+            product_ids (list): The IDs of the products.
+
+        Returns:
+            int: The number of products that were in stock.
+        """
+        return Product.bulk_edit(product_ids, "availability", "Out of stock")
+
+    @staticmethod
+    def bulk_edit(product_ids, field, value) -> int:
+        """
+        Sets a field of several products with a single statement.
+
+        When the price is set, the new price is recorded in the price history
+        of every product whose price changes, with one more statement.
+
+        Args:
+            product_ids (list): The IDs of the products.
+            field (str): The field to set, one of `BULK_EDIT_FIELDS`.
+            value: The new value of the field.
+
+        Returns:
+            int: The number of products whose field changed.
+        """
+        if field not in BULK_EDIT_FIELDS:
+            raise ValueError(f"Field {field} can't be edited in bulk")
+        column = getattr(Product, field)
+        changed = Product.id.in_(product_ids), column.is_distinct_from(value)
+
+        if field == "price":
+            db.session.execute(
+                insert(PriceHistory).from_select(
+                    ["product_id", "price", "price_currency", "change_date"],
+                    select(Product.id, literal(value), Product.price_currency,
+                           func.current_date()).where(*changed),
+                )
+            )
+        result = db.session.execute(
+            update(Product).where(*changed).values({field: value})
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
     def price_change(self, days=None) -> float:
         """
         Returns the price change of the product in the last price history entry.
@@ -244,11 +372,7 @@ class Product(db.Model):
             float: The price change percentage.
 
         """
-        if PriceHistory.if_price_change(self.id):
-            if days:
-                return PriceHistory.price_change(self.id, days)
-            return PriceHistory.price_change(self.id)
-        return 0.0
+        return PriceHistory.price_change(self.id, days)
 
     def __repr__(self) -> str:
         """
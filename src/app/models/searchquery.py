@@ -0,0 +1,283 @@
+"""
+This module contains the SearchQuery and SearchQueryRollup classes,
+which record the searches of the public search API and their daily statistics.
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, String, delete, desc, func, insert, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.config import db
+
+# Number of days the individual searches are kept after they were rolled up.
+LOG_RETENTION_DAYS = 30
+
+class SearchQuery(db.Model):
+    """
+    Represents a single search of the public search API.
+
+    Attributes:
+        id (int): The unique identifier of the search.
+        search (str): The normalized search string, empty if only filters were used.
+        filters (dict): The filters of the search other than the search string.
+        latency_ms (float): The time the search took to answer, in milliseconds.
+        result_count (int): The number of results, estimated for large result sets.
+        authenticated (bool): Whether the search was made by a logged in user.
+        searched_on (datetime): The date and time of the search.
+
+    Methods:
+        roll_up(day): Aggregates the searches of a day into SearchQueryRollup rows.
+        roll_up_pending(): Aggregates every finished day that wasn't rolled up yet.
+        popular(days, limit): Retrieves the most frequent combinations of search string and filters.
+    """
+
+    __tablename__ = "search_query"
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    search : Mapped[str] = mapped_column(String(length=200), nullable=False, default="")
+    filters : Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    latency_ms : Mapped[float] = mapped_column(nullable=False)
+    result_count : Mapped[int] = mapped_column(nullable=False)
+    authenticated : Mapped[bool] = mapped_column(nullable=False, default=False)
+    searched_on : Mapped[datetime] = mapped_column(nullable=False, server_default=func.now(),
+                                                   index=True)
+
+    @staticmethod
+    def roll_up(day) -> int:
+        """
+        Aggregates the searches of a day into SearchQueryRollup rows.
+
+        One row is written for every search string, and one row with a NULL search string
+        for all searches of the day. A day without searches writes no rows.
+        Existing rows of the day are replaced, so rolling up a day again is safe.
+
+        Args:
+            day (date): The day to roll up.
+
+        Returns:
+            int: The number of written rows.
+        """
+        start = datetime.combine(day, datetime.min.time())
+        latency = SearchQuery.latency_ms
+        statistics = (
+            select(
+                literal(day, Date),
+                SearchQuery.search,
+                func.count(),
+                func.count().filter(SearchQuery.result_count == 0),
+                func.percentile_cont(0.5).within_group(latency),
+                func.percentile_cont(0.95).within_group(latency),
+                func.percentile_cont(0.99).within_group(latency),
+            )
+            .where(SearchQuery.searched_on >= start,
+                   SearchQuery.searched_on < start + timedelta(days=1))
+            .group_by(func.grouping_sets(tuple_(SearchQuery.search), tuple_()))
+            # The empty grouping set yields a row even without searches
+            .having(func.count() > 0)
+        )
+        db.session.execute(delete(SearchQueryRollup).where(SearchQueryRollup.day == day))
+        result = db.session.execute(
+            insert(SearchQueryRollup).from_select(
+                ["day", "search", "searches", "zero_results", "p50_ms", "p95_ms", "p99_ms"],
+                statistics,
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def roll_up_pending() -> tuple:
+        """
+        Aggregates every finished day with searches that wasn't rolled up yet,
+        and deletes the searches older than `LOG_RETENTION_DAYS`.
+
+        A day that fails to roll up is rolled back and retried by the next call,
+        the other days and the cleanup aren't affected.
+
+        Returns:
+            tuple: The days that were rolled up and the days that failed.
+        """
+        today = datetime.combine(date.today(), datetime.min.time())
+        pending = db.session.scalars(
+            select(func.date(SearchQuery.searched_on).label("day"))
+            .where(SearchQuery.searched_on < today)
+            .except_(select(SearchQueryRollup.day))
+            .order_by("day")
+        ).all()
+        db.session.commit()
+
+        days, failed = [], []
+        for day in pending:
+            try:
+                SearchQuery.roll_up(day)
+                days.append(day)
+            except Exception:
+                db.session.rollback()
+                failed.append(day)
+
+        cutoff = today - timedelta(days=LOG_RETENTION_DAYS)
+        db.session.execute(delete(SearchQuery).where(SearchQuery.searched_on < cutoff))
+        db.session.commit()
+        return days, failed
+
+    @staticmethod
+    def popular(days=7, limit=50) -> list:
+        """
+        Retrieves the most frequent combinations of search string and filters.
+
+        Args:
+            days (int, optional): The number of past days to include. Defaults to 7.
+            limit (int, optional): The number of combinations. Defaults to 50.
+
+        Returns:
+            list: (search, filters, searches) rows, the most frequent first.
+        """
+        searches = func.count().label("searches")
+        return db.session.execute(
+            select(SearchQuery.search, SearchQuery.filters, searches)
+            .where(SearchQuery.searched_on >= datetime.now() - timedelta(days=days))
+            .group_by(SearchQuery.search, SearchQuery.filters)
+            .order_by(desc(searches), SearchQuery.search)
+            .limit(limit)
+        ).all()
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the search.
+
+        Returns:
+            str: A string representation of the search.
+        """
+        return f"<SearchQuery {self.id}:{self.search}>"
+
+
+class SearchQueryRollup(db.Model):
+    """
+    Represents the statistics of a search string on a day.
+
+    Attributes:
+        id (int): The unique identifier of the row.
+        day (date): The day of the searches.
+        search (str): The normalized search string, NULL for all searches of the day.
+        searches (int): The number of searches.
+        zero_results (int): The number of searches without results.
+        p50_ms (float): The median latency of the searches, in milliseconds.
+        p95_ms (float): The 95th percentile of the latency, in milliseconds.
+        p99_ms (float): The 99th percentile of the latency, in milliseconds.
+
+    Methods:
+        top_queries(days, limit): Retrieves the most frequent search strings.
+        zero_result_queries(days, limit): Retrieves the search strings that found nothing most often.
+        latency(days): Retrieves the daily number of searches and latency percentiles.
+    """
+
+    __tablename__ = "search_query_rollup"
+
+    id : Mapped[int] = mapped_column(primary_key=True)
+    day : Mapped[date] = mapped_column(nullable=False, index=True)
+    search : Mapped[str] = mapped_column(String(length=200), nullable=True)
+    searches : Mapped[int] = mapped_column(nullable=False)
+    zero_results : Mapped[int] = mapped_column(nullable=False)
+    p50_ms : Mapped[float] = mapped_column(nullable=False)
+    p95_ms : Mapped[float] = mapped_column(nullable=False)
+    p99_ms : Mapped[float] = mapped_column(nullable=False)
+
+    @staticmethod
+    def _queries(days) -> tuple:
+        """
+        Returns the summed searches and zero result searches of every search string.
+
+        Args:
+            days (int): The number of past days to include.
+
+        Returns:
+            tuple: The select statement and its searches and zero results columns.
+        """
+        searches = func.sum(SearchQueryRollup.searches).label("searches")
+        zero_results = func.sum(SearchQueryRollup.zero_results).label("zero_results")
+        statement = (
+            select(SearchQueryRollup.search, searches, zero_results)
+            .where(SearchQueryRollup.day >= date.today() - timedelta(days=days),
+                   SearchQueryRollup.search.is_not(None), SearchQueryRollup.search != "")
+            .group_by(SearchQueryRollup.search)
+        )
+        return statement, searches, zero_results
+
+    @staticmethod
+    def top_queries(days=7, limit=20) -> list:
+        """
+        Retrieves the most frequent search strings.
+
+        Args:
+            days (int, optional): The number of past days to include. Defaults to 7.
+            limit (int, optional): The number of search strings. Defaults to 20.
+
+        Returns:
+            list: (search, searches, zero results) rows, the most frequent first.
+        """
+        statement, searches, _ = SearchQueryRollup._queries(days)
+        return db.session.execute(
+            statement.order_by(desc(searches), SearchQueryRollup.search).limit(limit)
+        ).all()
+
+    @staticmethod
+    def zero_result_queries(days=7, limit=20) -> list:
+        """
+        Retrieves the search strings that most often returned no results.
+
+        Args:
+            days (int, optional): The number of past days to include. Defaults to 7.
+            limit (int, optional): The number of search strings. Defaults to 20.
+
+        Returns:
+            list: (search, searches, zero results) rows, the most frequent first.
+        """
+        statement, _, zero_results = SearchQueryRollup._queries(days)
+        return db.session.execute(
+            statement.having(zero_results > 0)
+            .order_by(desc(zero_results), SearchQueryRollup.search).limit(limit)
+        ).all()
+
+    @staticmethod
+    def latency(days=7) -> list:
+        """
+        Retrieves the daily number of searches and latency percentiles.
+
+        Args:
+            days (int, optional): The number of past days to include. Defaults to 7.
+
+        Returns:
+            list: The rollup rows of all searches of every day, oldest first.
+        """
+        return SearchQueryRollup.query.filter(
+            SearchQueryRollup.day >= date.today() - timedelta(days=days),
+            SearchQueryRollup.search.is_(None),
+        ).order_by(SearchQueryRollup.day).all()
+
+    def to_dict(self) -> dict:
+        """
+        Returns a dictionary of the row's attributes.
+
+        Returns:
+            dict: A dictionary containing the row's attributes.
+        """
+        return {
+            "day": self.day.isoformat(),
+            "search": self.search,
+            "searches": self.searches,
+            "zero_results": self.zero_results,
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "p99_ms": self.p99_ms,
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the row.
+
+        Returns:
+            str: A string representation of the row.
+        """
+        return f"<SearchQueryRollup {self.day}:{self.search}>"
@@ -30,3 +30,4 @@ class TSVector(TypeDecorator):
     """
 
     impl = TSVECTOR
+    cache_ok = True
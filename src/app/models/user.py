@@ -6,7 +6,8 @@ from datetime import datetime
 from typing import Self
 
 from flask_login import UserMixin
-from sqlalchemy import String
+from sqlalchemy import Index, String, case, func, literal
+from flask_sqlalchemy.query import Query
 from sqlalchemy.orm import mapped_column, Mapped
 from itsdangerous import SignatureExpired
 
@@ -43,6 +44,7 @@ class User(UserMixin, db.Model):
         verify_verification_token(token): Verifies a verification token for the user.
         get_reset_token(expires_sec): Generates a reset token for the user.
         verify_reset_token(token): Verifies a reset token for the user.
+        search(search): Returns the users matching the search string and their rank.
         __repr__(): Returns a string representation of the user.
 
     """
@@ -50,7 +52,6 @@ class User(UserMixin, db.Model):
     # Attributes
 
     __tablename__ = "UserModel"
-    __table_args__ = {'extend_existing': True}
 
     id : Mapped[int] = mapped_column(primary_key=True)
     username : Mapped[str] = mapped_column(String(length=30), unique=True,
@@ -63,6 +64,26 @@ class User(UserMixin, db.Model):
     confirmed_on : Mapped[datetime] = mapped_column(nullable=True)
     subscribed_till : Mapped[datetime] = mapped_column(nullable=True, default=None)
 
+    __table_args__ = (
+        # Serves the ILIKE '%term%' and similarity lookups of the admin user search
+        Index(
+            "ix_usermodel_search_trgm", username, email_address, name,
+            postgresql_using="gin",
+            postgresql_ops={
+                "username": "gin_trgm_ops",
+                "email_address": "gin_trgm_ops",
+                "name": "gin_trgm_ops",
+            },
+        ),
+        # Serves the prefix lookups of email addresses
+        Index(
+            "ix_usermodel_email_address_lower",
+            func.lower(email_address).label("email_address_lower"),
+            postgresql_ops={"email_address_lower": "text_pattern_ops"},
+        ),
+        {'extend_existing': True},
+    )
+
     # Methods
 
     def __init__(
@@ -167,6 +188,48 @@ class User(UserMixin, db.Model):
         """
         return bcrypt.check_password_hash(self.password_hash, attempted_password)
 
+    @staticmethod
+    def search(search: str) -> tuple[Query, object]:
+        """
+        Returns the users matching the search string and the rank of every user.
+
+        A search string containing '@' is treated as the beginning of an email address
+        and looked up by prefix, exact matches rank first. Any other string is matched
+        as a substring of the username, email address and name, using the trigram index,
+        and ranked by the best trigram similarity of these columns.
+
+        Args:
+            search (str): The search string, all users are returned when it is empty.
+
+        Returns:
+            tuple: The filtered query and the rank expression, None without a search.
+        """
+        search = search.strip()
+        if not search:
+            return User.query, None
+
+        if "@" in search:
+            email = func.lower(User.email_address)
+            prefix = search.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return (
+                User.query.filter(email.like(f"{prefix}%")),
+                case((email == search.lower(), 1.0), else_=literal(0.5)),
+            )
+
+        pattern = f"%{search}%"
+        return (
+            User.query.filter(
+                User.username.ilike(pattern)
+                | User.email_address.ilike(pattern)
+                | User.name.ilike(pattern)
+            ),
+            func.greatest(
+                func.coalesce(func.similarity(User.username, search), 0),
+                func.similarity(User.email_address, search),
+                func.coalesce(func.similarity(User.name, search), 0),
+            ),
+        )
+
     @staticmethod
     def username_exists(username) -> bool:
         """
@@ -4,9 +4,10 @@ This module imports the routes for the account section of the application.
 
 Routes:
 - GET `/profile`: Retrieve the user's profile and render the profile page.
+- GET `/api/profile/cart`: Get a page of the user's cart as JSON.
 """
 
-from flask import render_template, flash, Blueprint
+from flask import render_template, flash, Blueprint, request, jsonify
 from flask_login import current_user
 
 from app.models import Cart
@@ -27,10 +28,50 @@ def profile_get():
     """
     Retrieve the user's profile and render the profile page.
 
+    Query Parameters:
+    - page (int): The page of the cart to render.
+
     Returns:
         The rendered profile page with the user's cart items.
     """
-    cart = Cart.items(current_user.id)
+    page = request.args.get("page", 1, type=int)
+    cart = Cart.watchlist(current_user.id, page=page)
     if not current_user.is_confirmed():
         flash("Please confirm your email address to recieve notifications", "warning")
     return render_template("Account/profile.html", cart=cart)
+
+
+@blueprint.get("/api/profile/cart")
+@login_required
+def profile_cart_api():
+    """
+    Get a page of the user's cart.
+
+    This function is called using AJAX by the profile page.
+
+    Query Parameters:
+    - page (int): The page number to paginate the results.
+
+    Returns:
+    - JSON response with the products in the cart, their price changes
+    and pagination information.
+    """
+    page = request.args.get("page", 1, type=int)
+    cart = Cart.watchlist(current_user.id, page=page)
+    return jsonify(
+        {
+            "products": [
+                {
+                    **product.to_dict(),
+                    "domain": product.get_domain(),
+                    "image": product.get_image(),
+                    "previous_price": previous_price,
+                    "price_change": price_change,
+                }
+                for product, previous_price, price_change in cart.items
+            ],
+            "total_pages": cart.pages,
+            "current_page": cart.page,
+            "total_results": cart.total,
+        }
+    )
@@ -20,7 +20,7 @@ from flask_login import login_user, logout_user
 
 
 from app import CURRENT_DOMAIN
-from app.config import db, oauth
+from app.config import db, get_oauth
 from app.models import User
 from app.utils.forms import RegisterForm, LoginForm
 from app.utils.decorators import logout_required, login_required
@@ -145,7 +145,7 @@ def login_with_google():
     Returns:
         The redirect response to the Google login page.
     """
-    google = oauth.create_client("google")  # create the google oauth client
+    google = get_oauth().create_client("google")  # create the google oauth client
     redirect_uri = CURRENT_DOMAIN + '/authorize/google'
     return google.authorize_redirect(redirect_uri)
 
@@ -160,13 +160,13 @@ def authorize_google():
     Returns:
         redirects to the '/search' page.
     """
-    google = oauth.create_client("google")  # create the google oauth client
+    google = get_oauth().create_client("google")  # create the google oauth client
     token = (
         google.authorize_access_token()
     )  # Access token from google (needed to get user info)
     resp = google.get("userinfo")  # userinfo contains stuff u specificed in the scrope
     user_info = resp.json()
-    user = oauth.google.userinfo()  # uses openid endpoint to fetch user info
+    user = get_oauth().google.userinfo()  # uses openid endpoint to fetch user info
 
     user_to_add = User(
         email_address=user["email"],
@@ -205,7 +205,7 @@ def login_with_microsoft():
     Returns:
         The redirect response to the Microsoft login page.
     """
-    microsoft = oauth.create_client("microsoft")
+    microsoft = get_oauth().create_client("microsoft")
     redirect_uri = CURRENT_DOMAIN + '/authorize/microsoft'
     return microsoft.authorize_redirect(redirect_uri)
 
@@ -220,11 +220,11 @@ def authorize_microsoft():
     Returns:
         A redirect response to the "/search" page.
     """
-    microsoft = oauth.create_client("microsoft")
+    microsoft = get_oauth().create_client("microsoft")
     token = microsoft.authorize_access_token()
     resp = microsoft.get("userinfo")
     user_info = resp.json()
-    user = oauth.microsoft.userinfo()
+    user = get_oauth().microsoft.userinfo()
     user_to_add = User(
         email_address=user["mail"],
         name=user["givenName"],
@@ -26,10 +26,20 @@ Scraping:
     - The spider can be run by entering the URL of the
     product manually or by entering a search query to the search engine.
 
+Messages:
+- `/admin/messages/unread` route returns the cached number of unread messages.
+  The admin pages poll it, a cached count doesn't touch the database.
+
 Automatic Scraping:
 - The `update_records()` function is used to update the records
   in the database by scraping products from the web.
-- The `scheduler` is used to run the `update_records()` function at regular intervals.
+- The scheduler process (`app.scheduler`) runs `update_records()` and the other
+  periodic jobs every night.
+- `/admin/scheduler/jobs` route returns the latest run of every job and the recent runs.
+
+Database:
+- `/admin/database/replica` route returns whether this worker reads from the read replica
+  and the replica's last measured lag.
 
 Note:
 - All routes require the user to be logged in as an admin.
@@ -38,12 +48,14 @@ Note:
 """
 
 
-from flask import Blueprint, jsonify, render_template
+from flask import Blueprint, jsonify, render_template, request
 
 blueprint = Blueprint("admin", __name__)
 
-from app.models import User, Product, Message
+from app.models import JobRun
+from app.utils import counters
 from app.utils.decorators import admin_required
+from app.utils.replica import replica_status
 
 from app.routes.admin import analytics
 from app.routes.admin import scrape
@@ -57,6 +69,9 @@ blueprint.register_blueprint(user.blueprint)
 blueprint.register_blueprint(product.blueprint)
 blueprint.register_blueprint(message.blueprint)
 
+# Maximum number of job runs served at once.
+JOB_RUNS_MAX_LIMIT = 200
+
 @blueprint.get("/admin")
 @admin_required
 def admin_get():
@@ -65,9 +80,10 @@ def admin_get():
 
     Returns:
         A rendered template of the admin page with the count of products and users.
+        The counts are cached, see `app.utils.counters`.
     """
-    count_of_users = User.query.count()
-    count_of_products = Product.query.count()
+    count_of_users = counters.users()
+    count_of_products = counters.products()
     return render_template(
         "Admin/admin.html",
         count_of_products=count_of_products,
@@ -79,9 +95,43 @@ def admin_get():
 @admin_required
 def get_count_of_messages():
     """
-    Retrieves the count of messages in the database.
+    Retrieves the count of unread messages in the database.
+
+    Returns:
+        int: The cached count of unread messages in the database.
+    """
+    return jsonify({'unread': counters.unread_messages()})
+
+
+@blueprint.get("/admin/scheduler/jobs")
+@admin_required
+def get_job_runs():
+    """
+    Returns the history of the scheduled jobs.
+
+    Query Parameters:
+        name (str): Only the runs of this job.
+        limit (int): The number of recent runs. Defaults to 50.
+
+    Returns:
+        JSON response with the latest run of every job
+        and the recent runs, the most recent first.
+    """
+    limit = min(max(request.args.get("limit", 50, type=int), 1), JOB_RUNS_MAX_LIMIT)
+    return jsonify({
+        "latest": [run.to_dict() for run in JobRun.latest()],
+        "runs": [run.to_dict() for run in JobRun.recent(request.args.get("name"), limit)],
+    })
+
+
+@blueprint.get("/admin/database/replica")
+@admin_required
+def get_replica_status():
+    """
+    Returns the status of the read replica in this worker.
 
     Returns:
-        int: The count of messages in the database.
+        JSON response with whether a replica is configured, whether it is read
+        and its last measured lag in seconds.
     """
-    return jsonify({'unread': Message.query.filter_by(read=False).count()})
+    return jsonify(replica_status())
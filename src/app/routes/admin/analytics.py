@@ -1,27 +1,24 @@
 """
-This file contains functions and routes related to analytics
+This file contains routes related to analytics
 for the admin section of the application.
 ~~~~~~~~~~~~~~~~~~~~~
 
-The functions in this file utilize the Google Analytics API to generate reports on various metrics
+The routes serve reports of the Google Analytics API on various metrics
 such as user countries, page views, user devices, and active users.
-The reports are then used to provide data for the admin analytics page.
+The reports are fetched in one batched request and cached by `app.utils.analytics`,
+so a request to these routes doesn't wait for the API unless the cache is cold.
 
-To use the functions in this file, you need to download the credentials
-from the Google Cloud Console and set the environment variable 
-GOOGLE_APPLICATION_CREDENTIALS to the path of the credentials file.
+The statistics of the product search come from the first-party search log,
+rolled up every night by `app.utils.querylog`, and read from the read replica
+if one is configured, see `app.utils.replica`.
 
 Functions:
 ----------------
-- run_report(dimensions, metrics, date_ranges): Runs a report using the Google Analytics API.
-- report_on_user_countries(): Generates a report on user countries.
-- report_on_page_views(): Generates a report on page views.
-- report_on_user_devices(): Generates a report on user devices.
-- report_on_active_users(): Generates a report on active users.
 - admin_analytics_country_sessions(): Retrieves data for admin analytics on country sessions.
 - admin_analytics_page_views(): Retrieves data for admin analytics on page views.
 - admin_analytics_user_devices(): Retrieves data for admin analytics on user devices.
 - admin_analytics_active_users(): Retrieves data for admin analytics on active users.
+- admin_analytics_searches(): Retrieves the statistics of the product search.
 - admin_analytics_get(): Renders the admin analytics page.
 
 Routes:
@@ -30,111 +27,22 @@ Routes:
 - GET '/admin/analytics/page_views': Retrieves data for admin analytics on page views.
 - GET '/admin/analytics/user_devices': Retrieves data for admin analytics on user devices.
 - GET '/admin/analytics/active_users': Retrieves data for admin analytics on active users.
+- GET '/admin/analytics/searches': Retrieves the statistics of the product search.
 - GET '/admin/analysis': Renders the admin analytics page.
 """
 
-import os
-
-from flask import Blueprint, jsonify, render_template
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import (
-    DateRange,
-    Dimension,
-    Metric,
-    RunReportRequest,
-)
+from flask import Blueprint, jsonify, render_template, request
 
+from app.models import SearchQueryRollup
+from app.utils.analytics import get_report
 from app.utils.decorators import admin_required
+from app.utils.replica import read_replica
 
 blueprint = Blueprint("admin_analytics", __name__)
 
-def run_report(
-        dimensions,
-        metrics,
-        date_ranges=DateRange(start_date="2020-03-31", end_date="today")):
-    """
-    Runs a report using the Google Analytics API.
-
-    Args:
-        dimensions (list): A list of dimensions to include in the report.
-        metrics (list): A list of metrics to include in the report.
-        date_ranges (DateRange, optional): The date range for the report.
-        Defaults to [DateRange(start_date="2020-03-31", end_date="today")].
-
-    Yields:
-        tuple: A tuple containing the dimension value and metric value for each row in the report.
-
-    Raises:
-        Exception: If an error occurs while running the report.
-
-    Note: 
-        You need to download the credentials from the Google Cloud Console and
-        set the environment variable GOOGLE_APPLICATION_CREDENTIALS
-        to the path of the credentials file.
-    """
-    try:
-        client = BetaAnalyticsDataClient()
-        request = RunReportRequest(
-            property=f"properties/{os.environ.get('GA4_PROPERTY_ID')}",
-            dimensions=dimensions,
-            metrics=metrics,
-            date_ranges=[date_ranges],
-        )
-        response = client.run_report(request)
-
-        for row in response.rows:
-            yield (row.dimension_values[0].value, row.metric_values[0].value)
-
-    except IndexError as e:
-        blueprint.logger.error("No data available: %s", e)
-    except Exception as e:
-        blueprint.logger.error("An error occurred: %s", e)
-
-def report_on_user_countries():
-    """
-    Generates a report on user countries.
-
-    Returns:
-        tuple: A tuple containing the country name and the number of sessions.
-    """
-    yield from run_report([Dimension(name="country")], [Metric(name="sessions")])
-
-def report_on_page_views():
-    """
-    Generates a report on page views.
-
-    Returns:
-        tuple: A tuple containing the page path and the number of screen page views.
-    """
-    yield from run_report([Dimension(name="pageTitle")], [Metric(name="screenPageViews")])
-
-def report_on_user_devices():
-    """
-    Generates a report on user devices.
-
-    This function runs a report on user devices using the specified dimensions and metrics.
-
-    Parameters:
-        None
-
-    Returns:
-        None
-    """
-    yield from run_report([Dimension(name="deviceCategory")], [Metric(name="sessions")])
-
-def report_on_active_users():
-    """
-    Generates a report on active users.
-
-    This function runs a report on active users using the specified dimensions and metrics.
-
-    Parameters:
-        None
-
-    Returns:
-        None
-    """
-    yield from run_report([Dimension(name="date")], [Metric(name="activeUsers")])
+# Maximum number of past days and of search strings of the search statistics.
+SEARCH_STATISTICS_MAX_DAYS = 90
+SEARCH_STATISTICS_MAX_LIMIT = 100
 
 
 @blueprint.get("/admin/analytics/country_sessions")
@@ -146,7 +54,7 @@ def admin_analytics_country_sessions():
     Returns:
         JSON response containing the data for country sessions.
     """
-    return jsonify(list(report_on_user_countries()))
+    return jsonify(get_report("country_sessions"))
 
 
 @blueprint.get("/admin/analytics/page_views")
@@ -158,11 +66,7 @@ def admin_analytics_page_views():
     Returns:
         JSON response containing the data for page views.
     """
-    report = list(report_on_page_views())
-    try:
-        return jsonify(report[:15])
-    except IndexError:
-        return jsonify(report)
+    return jsonify(get_report("page_views"))
 
 
 @blueprint.get("/admin/analytics/user_devices")
@@ -174,7 +78,7 @@ def admin_analytics_user_devices():
     Returns:
         JSON response containing the data for user devices.
     """
-    return jsonify(list(report_on_user_devices()))
+    return jsonify(get_report("user_devices"))
 
 
 @blueprint.get("/admin/analytics/active_users")
@@ -186,11 +90,39 @@ def admin_analytics_active_users():
     Returns:
         JSON response containing the data for active users.
     """
-    active_users = list(report_on_active_users())
-    try:
-        return jsonify(active_users[:10])
-    except IndexError:
-        return jsonify(active_users)
+    return jsonify(get_report("active_users"))
+
+@blueprint.get("/admin/analytics/searches")
+@admin_required
+@read_replica
+def admin_analytics_searches():
+    """
+    Retrieves the statistics of the product search from the nightly rollups.
+
+    Query Parameters:
+    - days (int): The number of past days to include. Defaults to 7.
+    - limit (int): The number of top and zero result search strings. Defaults to 20.
+
+    Returns:
+        JSON response containing the most frequent search strings, the search strings
+        without results and the daily number of searches with their latency percentiles.
+    """
+    days = min(max(request.args.get("days", 7, type=int), 1), SEARCH_STATISTICS_MAX_DAYS)
+    limit = min(max(request.args.get("limit", 20, type=int), 1), SEARCH_STATISTICS_MAX_LIMIT)
+
+    def queries(rows):
+        return [
+            {"search": search, "searches": searches, "zero_results": zero_results}
+            for search, searches, zero_results in rows
+        ]
+
+    return jsonify(
+        {
+            "top_queries": queries(SearchQueryRollup.top_queries(days, limit)),
+            "zero_result_queries": queries(SearchQueryRollup.zero_result_queries(days, limit)),
+            "latency": [row.to_dict() for row in SearchQueryRollup.latency(days)],
+        }
+    )
 
 @blueprint.get("/admin/analysis")
 @admin_required
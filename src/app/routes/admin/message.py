@@ -1,28 +1,105 @@
 """
 This file contains routes for admin inbox
+~~~~~~~~~~~~~~~~~~~~~
+
+Routes:
+----------------
+- GET '/admin/messages': Renders the admin message page.
+- GET '/admin/api/messages': Returns a page of the inbox with the senders as JSON.
+- GET '/admin/message/<int:message_id>': Renders the message details page.
+- GET '/admin/message/delete': Deletes a message.
+- POST '/admin/message/mark_as_read': Marks a message as read.
+- POST '/admin/messages/mark_as_read': Marks several messages as read.
+- POST '/admin/messages/delete': Deletes several messages.
 """
 
-from flask import Blueprint, request, render_template, redirect, url_for, flash
+from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify, abort
 
-from app.config import db
+from app.models import Message
+from app.models.message import INBOX_PER_PAGE
 from app.utils.decorators import admin_required
-from app.models import Message, User
 
 blueprint = Blueprint("admin_messages", __name__)
 
+# Maximum number of messages that can be changed with a single bulk request.
+BULK_MESSAGES_LIMIT = 1000
+
+def message_ids_from_request() -> list | None:
+    """
+    Reads the list of message IDs from the JSON payload of a bulk request.
+
+    Returns:
+        list: The message IDs, None if the payload is invalid.
+    """
+    data = request.get_json(silent=True) or {}
+    message_ids = data.get("ids")
+    if (not isinstance(message_ids, list) or not message_ids
+        or len(message_ids) > BULK_MESSAGES_LIMIT):
+        return None
+    try:
+        return list({int(message_id) for message_id in message_ids})
+    except (TypeError, ValueError):
+        return None
+
 @blueprint.get("/admin/messages")
 @admin_required
 def admin_messages_get():
     """
     This route handles the admin message page of the application.
 
+    Query Parameters:
+    - page (int): The page number to paginate the results.
+
     Returns:
         A rendered template of the admin message page with the list of messages.
     """
-    items = Message.query.order_by(Message.read).paginate(page=1, per_page=9)
+    page = request.args.get("page", 1, type=int)
+    items = Message.query.order_by(Message.id.desc()).paginate(
+        page=page, per_page=9, error_out=False)
     function = 'admin_messages_get'
 
-    return render_template("Admin/search.html", items=items, variables={}, function=function)
+    return render_template("Admin/search.html", items=items, variables={},
+                           function=function, route="admin/messages")
+
+@blueprint.get("/admin/api/messages")
+@admin_required
+def admin_messages_api():
+    """
+    Returns a page of the inbox, newest messages first, with the sender of every message.
+
+    The inbox is paginated with a keyset on the message ID,
+    so deep pages are as fast as the first one.
+
+    Query Parameters:
+    - before (int): The ID of the last message of the previous page.
+    - unread (bool): Return only unread messages.
+    - limit (int): The number of messages, at most `INBOX_PER_PAGE`.
+
+    Returns:
+    - JSON response with the messages, their senders and the `before` value of the next page,
+    which is null on the last page.
+    """
+    before_id = request.args.get("before", type=int)
+    unread_only = request.args.get("unread", "").lower() in ("1", "true", "yes")
+    limit = min(max(request.args.get("limit", INBOX_PER_PAGE, type=int), 1), INBOX_PER_PAGE)
+
+    rows = Message.inbox(before_id=before_id, unread_only=unread_only, limit=limit)
+    return jsonify(
+        {
+            "messages": [
+                {
+                    **message.to_dict(),
+                    "sender": {
+                        "id": sender.id,
+                        "username": sender.username,
+                        "email_address": sender.email_address,
+                    },
+                }
+                for message, sender in rows
+            ],
+            "next_before": rows[-1][0].id if len(rows) == limit else None,
+        }
+    )
 
 @blueprint.get("/admin/message/<int:message_id>")
 @admin_required
@@ -36,8 +113,10 @@ def admin_message_info_get(message_id):
     Returns:
         A rendered template of the message details page.
     """
-    message = Message.query.get(message_id)
-    user = User.query.get(message.sender_id)
+    row = Message.with_sender(message_id)
+    if row is None:
+        abort(404)
+    message, user = row
     return render_template("Admin/Item/info.html", item=message, user=user)
 
 @blueprint.get("/admin/message/delete")
@@ -52,14 +131,12 @@ def admin_message_delete():
     Returns:
         A redirect to the admin message page after deleting the message.
     """
-    message_id = request.args.get("id")
+    message_id = request.args.get("id", type=int)
     if message_id is None:
         flash("Message ID is required", "error")
-        return redirect(url_for("admin_messages_get"))
-    message = Message.query.get(message_id)
-    db.session.delete(message)
-    db.session.commit()
-    return redirect(url_for("admin_messages_get"))
+        return redirect(url_for(".admin_messages_get"))
+    Message.bulk_delete([message_id])
+    return redirect(url_for(".admin_messages_get"))
 
 @blueprint.post("/admin/message/mark_as_read")
 @admin_required
@@ -77,13 +154,44 @@ def admin_message_mark_as_read():
 
     try:
         message_id = int(data.get("message_id"))
-    except ValueError:
+    except (TypeError, ValueError):
         flash("Invalid message ID", "error")
-        return redirect(url_for("admin_messages_get"))
-    if message_id is None:
-        flash("Message ID is required", "error")
-        return redirect(url_for("admin_messages_get"))
-    message = Message.query.get(message_id)
-    message.mark_as_read()
-    db.session.commit()
-    return redirect(url_for("admin_messages_get"))
+        return redirect(url_for(".admin_messages_get"))
+    Message.bulk_mark_as_read([message_id])
+    return redirect(url_for(".admin_messages_get"))
+
+@blueprint.post("/admin/messages/mark_as_read")
+@admin_required
+def admin_messages_mark_as_read():
+    """
+    Marks several messages as read with a single statement.
+
+    It expects a JSON payload with the key 'ids', the list of message IDs.
+
+    Returns:
+    - JSON response with status 'success' and the number of messages that were unread.
+    - If the payload is invalid,
+    it returns a JSON response with status 'error' and HTTP status code 400.
+    """
+    message_ids = message_ids_from_request()
+    if message_ids is None:
+        return jsonify({'status': 'error'}), 400
+    return jsonify({'status': 'success', 'changed': Message.bulk_mark_as_read(message_ids)}), 200
+
+@blueprint.post("/admin/messages/delete")
+@admin_required
+def admin_messages_delete():
+    """
+    Deletes several messages with a single statement.
+
+    It expects a JSON payload with the key 'ids', the list of message IDs.
+
+    Returns:
+    - JSON response with status 'success' and the number of messages that were deleted.
+    - If the payload is invalid,
+    it returns a JSON response with status 'error' and HTTP status code 400.
+    """
+    message_ids = message_ids_from_request()
+    if message_ids is None:
+        return jsonify({'status': 'error'}), 400
+    return jsonify({'status': 'success', 'changed': Message.bulk_delete(message_ids)}), 200
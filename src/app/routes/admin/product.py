@@ -15,6 +15,11 @@ Routes:
   specific product in the admin panel and allows deletion of the product.
 - POST '/admin/product/delete/<int:product_id>': Deletes a product and
   its associated price history from the database.
+- POST '/admin/products/bulk': Deletes, deactivates, re-scrapes or edits
+  all products matching the search filters.
+- GET '/admin/products/bulk/<job_id>': Returns the progress of a bulk operation.
+  Large bulk operations are queued as jobs and run by the scheduler process,
+  see `app.utils.jobs`.
 
 Functions:
 ----------
@@ -30,6 +35,8 @@ Functions:
   and allows deletion of the product.
 - admin_product_delete_post(product_id): Deletes a product and its associated
   price history from the database.
+- admin_products_bulk_post(): Runs a bulk operation on the products matching the filters.
+- admin_products_bulk_job_get(job_id): Returns the progress of a bulk operation.
 
 Note:
 ---------
@@ -48,15 +55,30 @@ Note:
   successful editing or deletion of a product.
 """
 from datetime import datetime
+from urllib.parse import urlencode
+from multiprocessing import Process
 
-from flask import Blueprint, request, render_template, redirect, flash
+from flask import Blueprint, request, render_template, redirect, flash, jsonify
+from werkzeug.datastructures import MultiDict
 
 from app.config import db
 from app.utils.decorators import admin_required
+from app.utils.jobs import register_handler, start_job, get_job
+from app.utils.search import keyset_page
 from app.models import Product, PriceHistory
+from app.models.product import BULK_EDIT_FIELDS
+from app.routes.admin.scrape import run_spider
 
 blueprint = Blueprint("admin_product", __name__)
 
+# Number of products changed by a single statement of a bulk operation.
+# Selections up to this size are handled within the request, larger ones in a background job.
+BULK_CHUNK_SIZE = 1000
+
+# Number of products re-scraped by a single spider run.
+RESCRAPE_CHUNK_SIZE = 200
+
+
 @blueprint.get("/admin/products/search")
 @admin_required
 def admin_products_search_get():
@@ -70,49 +92,43 @@ def admin_products_search_get():
     - brand (str, optional): The brand name to filter products by.
     - min_rating (float, optional): The minimum rating to filter products by.
     - max_rating (float, optional): The maximum rating to filter products by.
+    - after (str, optional): The cursor of the last product of the previous page.
+    - exact (bool, optional): Count the results exactly instead of estimating large totals.
 
     Returns:
     - render_template: A Flask function that renders a template with the following arguments:
-        - items: The paginated products matching the search filters.
-        - total_pages: The total number of pages for the paginated products.
-        - variables: A dictionary containing the search filters and their corresponding values.
+        - items: The page of products matching the search filters, see `KeysetPage`.
+        - variables: The query string of the applied search filters.
         - function: A string indicating the name of the current function
           ('admin_products_search_get').
-        - page: The current page number for the paginated products.
 
     Example Usage:
     - When a user visits the '/admin/products/search' route, this function is called to
       handle the search functionality for admin users.
     - The function retrieves the search filters from the request arguments
       and applies them to the Product query.
-    - The filtered products are then paginated and rendered in the 'Admin/search.html'
-      template along with other necessary data.
+    - The filtered products are ranked like the public search, paginated with a keyset
+      and rendered in the 'Admin/search.html' template along with other necessary data.
+    - Large totals are the planner's estimate, see `app.utils.search.count_results`.
 
     Note:
     - This function requires the user to be an admin,
       as indicated by the @admin_required decorator.
     """
-    page = request.args.get("page", 1, type=int)
-
-    filters = Product.get_filters(request.args)
+    after = request.args.get("after")
+    exact = request.args.get("exact", "").lower() in ("1", "true", "yes")
 
-    products = Product.query
-    variables = {}
-    for key, value in filters.items():
-        if value[0]:
-            products = value[1](value[0], products)
-            variables[key] = value[0]
-
-    products = products.paginate(page=page, per_page=9)
-    total_pages = products.pages
+    products, variables = Product.apply_filters(request.args)
+    products = keyset_page(products, variables.get("search"), after=after, exact=exact)
+    if exact:
+        variables["exact"] = 1
 
     return render_template(
         "Admin/search.html",
         items=products,
-        total_pages=total_pages,
-        variables=variables,
+        variables=urlencode(variables),
         function="admin_products_search_get",
-        page=page,
+        route="admin/products/search",
     )
 
 
@@ -254,11 +270,161 @@ def admin_product_delete_post(item_id):
         redirect: A redirect response to the admin search page.
 
     """
-    product = Product.query.get(item_id)
-    price_history = PriceHistory.query.filter_by(product_id=item_id)
-    for price in price_history:
-        db.session.delete(price)
-    db.session.delete(product)
-    db.session.commit()
+    Product.bulk_delete([item_id])
     flash("Product deleted successfully", category="success")
     return redirect("/admin/products/search")
+
+
+@register_handler("products-delete", BULK_CHUNK_SIZE)
+def bulk_delete(product_ids, params) -> int:
+    """
+    Deletes the products.
+
+    Args:
+        product_ids (list): The IDs of the products.
+        params (dict): Unused.
+
+    Returns:
+        int: The number of deleted products.
+    """
+    return Product.bulk_delete(product_ids)
+
+
+@register_handler("products-deactivate", BULK_CHUNK_SIZE)
+def bulk_deactivate(product_ids, params) -> int:
+    """
+    Marks the products as out of stock.
+
+    Args:
+        product_ids (list): The IDs of the products.
+        params (dict): Unused.
+
+    Returns:
+        int: The number of products that were in stock.
+    """
+    return Product.bulk_deactivate(product_ids)
+
+
+@register_handler("products-edit", BULK_CHUNK_SIZE)
+def bulk_edit(product_ids, params) -> int:
+    """
+    Sets a field of the products.
+
+    Args:
+        product_ids (list): The IDs of the products.
+        params (dict): The 'field' to set, one of `BULK_EDIT_FIELDS`, and its 'value'.
+
+    Returns:
+        int: The number of products whose field changed.
+    """
+    return Product.bulk_edit(product_ids, params["field"], params["value"])
+
+
+@register_handler("products-rescrape", RESCRAPE_CHUNK_SIZE)
+def rescrape(product_ids, params) -> int:
+    """
+    Scrapes the products again and updates their records.
+
+    The spider runs in its own process, like the manual scraping.
+
+    Args:
+        product_ids (list): The IDs of the products.
+        params (dict): Unused.
+
+    Returns:
+        int: The number of products handed to the spider.
+    """
+    urls = [url for (url,) in db.session.query(Product.url).filter(Product.id.in_(product_ids))]
+    if urls:
+        p = Process(target=run_spider, args=(urls, "list"))
+        p.start()
+        p.join()
+    return len(urls)
+
+
+BULK_ACTIONS = {
+    "delete": bulk_delete,
+    "deactivate": bulk_deactivate,
+    "rescrape": rescrape,
+    "edit": bulk_edit,
+}
+
+
+@blueprint.post("/admin/products/bulk")
+@admin_required
+def admin_products_bulk_post():
+    """
+    Runs a bulk operation on all products matching the search filters.
+
+    It expects a JSON payload with the following keys:
+    - 'action': One of 'delete', 'deactivate', 'rescrape' or 'edit'.
+    - 'filters': The filters of the admin product search, see `Product.get_filters`.
+    - 'all': Must be true to run the operation without any filter.
+    - 'field', 'value': The field to set and its new value for 'edit',
+    one of `BULK_EDIT_FIELDS`.
+
+    Every chunk of the selection is changed with set-based statements. Deleted products
+    take their price history, cart items and quarantined prices with them through
+    `ON DELETE CASCADE`. Selections larger than `BULK_CHUNK_SIZE` and re-scraping
+    are queued as a job of the scheduler process, whose progress is available
+    at '/admin/products/bulk/<job_id>'.
+
+    Returns:
+    - JSON response with status 'success' and the number of changed products,
+    or status 'accepted' and the job with HTTP status code 202.
+    - If the payload is invalid,
+    it returns a JSON response with status 'error' and HTTP status code 400.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    filters = data.get("filters") or {}
+    if action not in BULK_ACTIONS or not isinstance(filters, dict):
+        return jsonify({"status": "error", "message": "Invalid action or filters"}), 400
+
+    filters = MultiDict(filters)
+    if not Product.apply_filters(filters)[1] and data.get("all") is not True:
+        return jsonify({"status": "error", "message": "No filters given"}), 400
+
+    params = {}
+    if action == "edit":
+        field = data.get("field")
+        value = data.get("value")
+        if field not in BULK_EDIT_FIELDS:
+            return jsonify({"status": "error", "message": "Invalid field"}), 400
+        if field == "price":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return jsonify({"status": "error", "message": "Invalid price"}), 400
+        elif value is not None:
+            value = str(value)
+        params = {"field": field, "value": value}
+
+    product_ids = Product.selected_ids(filters)
+
+    if action != "rescrape" and len(product_ids) <= BULK_CHUNK_SIZE:
+        changed = BULK_ACTIONS[action](product_ids, params) if product_ids else 0
+        return jsonify({"status": "success", "action": action, "changed": changed}), 200
+
+    job = start_job(f"products-{action}", product_ids, params)
+    return jsonify({"status": "accepted", "action": action, "job": job.to_dict()}), 202
+
+
+@blueprint.get("/admin/products/bulk/<job_id>")
+@admin_required
+def admin_products_bulk_job_get(job_id):
+    """
+    Returns the progress of a bulk operation.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+    - JSON response with the status, the number of handled products and the progress.
+    - If the job doesn't exist,
+    it returns a JSON response with status 'error' and HTTP status code 404.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error"}), 404
+    return jsonify(job.to_dict()), 200
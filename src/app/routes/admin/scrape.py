@@ -25,32 +25,56 @@ the user is redirected to the product listing page.
 Automated Scraping:
 -------------------
 The automated scraping functionality runs the spider automatically
-at regular intervals to update the records in the database. 
-This is achieved using the apscheduler library.
+every night to update the records in the database.
+`update_records` is a job of the dedicated scheduler process (see `app.scheduler`),
+so a single crawl runs however many web workers and hosts serve the application.
 The spider retrieves all the products from the database and
 updates their information by scraping the web.
-If an exception occurs during the scraping process, the function continues to the next product.
-The spider is scheduled to run every 24 hours.
+The crawl runs in a child process, as the reactor of Scrapy can't be restarted
+in the long running scheduler process.
+
+Search warming:
+---------------
+After the records were updated, the most popular recent searches are replayed
+by `app.utils.warming`, so the first users searching them don't pay for cold caches.
+The report of the last warming run is stored with the run of the job and
+served at '/admin/product/scrape/warming'.
+
+Crawl telemetry:
+----------------
+Every run of the spider stores its telemetry in the `crawl_run` table: the fetched,
+parsed, changed, unchanged and deactivated products and the time spent downloading,
+parsing and writing them, in total and for every domain.
+The most recent runs are shown on the scrape page and served at '/admin/product/scrape/runs'.
+
+Scrapy and Twisted are imported with the spider only when a crawl starts,
+so the web workers that never crawl don't load them.
 
 Note: The code in this file assumes the presence of other modules and packages
 such as 'models', 'web', 'spiders', etc., which are not included in this code snippet.
 
 """
 
-import atexit
 from urllib.parse import urlparse
 from multiprocessing import Process
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Blueprint, request, jsonify, render_template
 from flask_login import current_user
 
+from sqlalchemy import select
+
+from app.config import application, db
 from app.utils.decorators import admin_required
-from app.models import Product
-from spiders import MySpider
+from app.models import CrawlRun, JobRun, Product
 
 blueprint = Blueprint("admin_scrape", __name__)
 
+# Number of crawl runs shown on the scrape page.
+RECENT_RUNS = 10
+
+# Maximum number of crawl runs served at once.
+RUNS_MAX_LIMIT = 100
+
 # Manual scraping
 
 def run_spider(url, method=None, pages=None):
@@ -65,6 +89,8 @@ def run_spider(url, method=None, pages=None):
     Returns:
         None
     """
+    from spiders import MySpider
+
     spider = MySpider(url, method, pages)
     spider.run()
 
@@ -73,10 +99,40 @@ def run_spider(url, method=None, pages=None):
 @admin_required
 def admin_scrape_get():
     """
-    Renders the 'Admin/scrape.html' template.
+    Renders the 'Admin/scrape.html' template with the telemetry of the most recent crawl runs.
+    """
+
+    return render_template("Admin/scrape.html", runs=CrawlRun.recent(RECENT_RUNS))
+
+
+@blueprint.get("/admin/product/scrape/runs")
+@admin_required
+def admin_scrape_runs_get():
+    """
+    Returns the telemetry of the most recent crawl runs.
+
+    Query Parameters:
+        limit (int): The number of runs. Defaults to 20.
+
+    Returns:
+        JSON response with the runs, the most recent first.
+    """
+    limit = min(max(request.args.get("limit", 20, type=int), 1), RUNS_MAX_LIMIT)
+    return jsonify([run.to_dict() for run in CrawlRun.recent(limit)])
+
+
+@blueprint.get("/admin/product/scrape/warming")
+@admin_required
+def admin_scrape_warming_get():
     """
+    Returns the report of the last search warming run.
 
-    return render_template("Admin/scrape.html")
+    Returns:
+        JSON response with the duration and the warmed and failed searches,
+        null if no warming run finished yet.
+    """
+    runs = JobRun.recent("warm_searches", limit=1)
+    return jsonify(runs[0].result if runs else None)
 
 
 @blueprint.post("/admin/product/scrape")
@@ -219,28 +275,29 @@ def scrape_google_query(query: list, pages: int) -> dict:
             "message": "Products added to database successfully",
         }
 
-def update_records():
+def update_records() -> dict:
     """
     Updates the records in the database by scraping products from the web.
 
     This function retrieves all the products from the database and updates their information
-    by scraping the web using a spider. If an exception occurs during the scraping process,
-    the function continues to the next product.
+    by scraping the web using a spider in a child process. Products whose page can't be
+    scraped are skipped, see `parsing.py`.
 
     Returns:
-        None
-    """
-    try:
-        with blueprint.app_context():
-            product_links = list(Product.query.values("url"))
-            spider = MySpider(product_links, "list")
-            spider.run()
-        print("Records updated successfully")
-    except ValueError:
-        return
+        dict: The number of crawled products.
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=update_records, trigger="interval", hours=24)
-scheduler.start()
+    Raises:
+        RuntimeError: If the crawl process failed.
+    """
+    with application.app_context():
+        product_links = db.session.scalars(select(Product.url)).all()
 
-atexit.register(scheduler.shutdown)
+    p = Process(
+        target=run_spider,
+        args=(product_links, "list")
+    )
+    p.start()
+    p.join()
+    if p.exitcode:
+        raise RuntimeError(f"The crawl process exited with status {p.exitcode}")
+    return {"products": len(product_links)}
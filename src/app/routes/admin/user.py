@@ -25,6 +25,7 @@ Functions:
 
 """
 from datetime import datetime
+from urllib.parse import urlencode
 
 from flask import Blueprint, request, render_template, redirect, flash
 from flask_login import current_user
@@ -32,6 +33,7 @@ from flask_login import current_user
 from app.config import db
 from app.models import User, Cart
 from app.utils.decorators import admin_required
+from app.utils.search import paginate_keyset
 
 
 blueprint = Blueprint("admin_user", __name__)
@@ -44,46 +46,39 @@ def admin_user_search_get():
     Renders the admin user search page.
 
     This route handles the GET request to '/admin/users' and is accessible only to admin users.
-    It retrieves the page number and search query from the request arguments.
-    It then performs a search query on the User model using the provided search query,
-    filtering by username, name, and email address.
-    The search results are paginated with a default of 9 items per page.
-    The total number of search results and total number of pages are calculated.
-    Finally, the search results, total pages, search query, page number,
-    data type, and function name
+    It retrieves the cursor of the page and search query from the request arguments.
+    It then performs a ranked search on the User model using the provided search query,
+    see `User.search`, filtering by username, name, and email address.
+    The search results are paginated with a keyset, 9 items per page,
+    and large totals are estimated by the query planner unless `exact` is set.
+    Finally, the search results, search query and function name
     are passed to the 'Admin/search.html' template for rendering.
 
     Returns:
         A rendered template for the admin user search page.
     """
 
-    # Retrieve page number and search query from request arguments
-    page = request.args.get("page", 1, type=int)
+    # Retrieve page cursor and search query from request arguments
+    after = request.args.get("after")
     search = request.args.get("search", "")
+    exact = request.args.get("exact", "").lower() in ("1", "true", "yes")
 
-    # Perform search query on User model
-    users = User.query.filter(
-        User.username.ilike(f"%{search}%")
-        | User.email_address.ilike(f"%{search}%")
-        | User.name.ilike(f"%{search}%")
-    )
-
-    # Paginate search results
-    users = users.paginate(page=page, per_page=9)
-
-    # Calculate total number of pages
-    total_pages = users.pages
+    # Perform ranked search query on User model and paginate search results
+    users, rank = User.search(search)
+    users = paginate_keyset(users, User.id, rank, after=after, exact=exact)
 
     # Prepare variables for rendering template
     variables = {"search": search}
+    if exact:
+        variables["exact"] = 1
 
     return render_template(
         "Admin/search.html",
         items=users,
-        total_pages=total_pages,
-        variables=variables,
-        page=page,
+        variables=urlencode(variables),
+        search=search,
         function="admin_user_search_get",
+        route="admin/users",
     )
 
 
@@ -109,8 +104,7 @@ def admin_user_info_get(user_id):
     - The user ID is passed as a parameter in the URL.
     """
     user = User.query.get(user_id)
-    cart = Cart.query.filter_by(user_id=user_id).all()
-    cart = [item.product for item in cart]
+    cart = Cart.items(user_id)
     return render_template("Admin/Item/info.html", item=user, cart=cart)
 
 
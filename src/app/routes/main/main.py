@@ -6,6 +6,8 @@ Routes:
 - GET `/`: Renders the home page.
 - GET `/search`: Renders the search page with filtered products based on the query parameters.
 - POST `/cart/add`: Add a product to the user's cart.
+- POST `/cart/bulk`: Add or remove several products in the user's cart.
+- POST `/cart/alert`: Set the alert rule of a product in the user's cart.
 - GET `/donate`: Renders the donation page.
 - GET `/contact`: Renders the contact page.
 - POST `/contact`: Process the contact form submission and send an email to the admin users.
@@ -14,25 +16,41 @@ Routes:
 Functions:
 - `home_get()`: Renders the home page.
 - `convert()`: Convert the query parameter to the correct type.
+- `filter_products()`: Filters the products by the query parameters of the search API.
 - `search_get()`: Renders the search page with filtered products based on the query parameters.
 - `search_api()`: Get the search results based on the query parameters.
 - `add_to_cart()`: Add a product to the user's cart.
+- `bulk_cart()`: Add or remove several products in the user's cart.
+- `set_cart_alert()`: Set the alert rule of a product in the user's cart.
 - `donation_get()`: Renders the donation page.
 - `contact_get()`: Renders the contact page.
 - `contact_post()`: Process the contact form submission and send an email to the admin users.
 """
 
+import math
+import time
+
 from flask import Blueprint, request, jsonify, flash, redirect, url_for, render_template
 from flask_login import current_user
 from app.models import Product, Cart, User, Message
+from app.models.cart import ALERT_TYPES, ALERT_TARGET_PRICE, ALERT_PERCENT_DROP
 from app.config import db
 from app import DONATION_LINK
 from app.utils.email import send_email
 from app.utils.decorators import login_required
+from app.utils.querylog import log_search
+from app.utils.replica import primary, read_replica
+from app.utils.search import keyset_page
 from spiders.myproject.myproject.spiders.utils.converter import SignsConverter
 
 blueprint = Blueprint("main", __name__)
 
+# Number of products per page of the search results.
+SEARCH_PER_PAGE = 18
+
+# Maximum number of products that can be changed with a single `/cart/bulk` request.
+BULK_CART_LIMIT = 500
+
 @blueprint.get("/")
 def home_get():
     """
@@ -86,7 +104,29 @@ def convert(key, val):
         return float(val)
     return val
 
+
+def filter_products(args):
+    """
+    Filters the products by the query parameters of the search API.
+
+    Args:
+    - args (MultiDict): The query parameters, e.g. the request arguments.
+
+    Returns:
+    - The filtered product query and a dictionary of the applied, converted filter values.
+    """
+    products = Product.query
+    variables = {}
+    for key, value in Product.get_filters(args).items():
+        val = args.get(key)
+        if val not in [None, "null", ""]:
+            val = convert(key, val)
+            products = value[1](val, products)
+            variables[key] = val
+    return products, variables
+
 @blueprint.get("/api/search")
+@read_replica
 def search_api() -> jsonify:
     """
     Get the search results based on the query parameters.
@@ -104,29 +144,45 @@ def search_api() -> jsonify:
     - min_rating (float): The minimum rating to filter products by.
     - max_rating (float): The maximum rating to filter products by.
     - page (int): The page number to paginate the results.
+    - after (str): The cursor of the last product of the previous page. If given,
+    the results are paginated with a keyset instead of the page number, the response
+    contains the cursor of the next page in `next_after` and large totals are estimated.
+
+    Every search is recorded in the search log with its latency and number of results.
+    The products are read from the read replica, if one is configured and up to date,
+    whether they are tracked by the user from the primary, so a cart change shows at once.
 
     Returns:
     - JSON response with the filtered products and pagination information.
     """
+    started = time.perf_counter()
     page = request.args.get("page", 1, type=int)
+    after = request.args.get("after")
 
-    products = Product.query
-
-    filters = Product.get_filters(request.args)
-
-    variables = {}
-    for key, value in filters.items():
-        val = request.args.get(key)
-        if val not in [None, "null", ""]:
-            val = convert(key, val)
-            products = value[1](val, products)
-            variables[key] = val
-
-    products = products.paginate(page=page, per_page=18)
+    products, variables = filter_products(request.args)
 
-    total_pages = products.pages
-    return jsonify(
+    pagination = {}
+    if after is not None:
+        products = keyset_page(products, variables.get("search"), after=after,
+                               per_page=SEARCH_PER_PAGE)
+        pagination = {
+            "next_after": products.next_after,
+            "total_is_estimate": products.total_is_estimate,
+        }
+        total_pages = math.ceil(products.total / SEARCH_PER_PAGE)
+    else:
+        products = products.paginate(page=page, per_page=SEARCH_PER_PAGE)
+        total_pages = products.pages
+
+    tracked = set()
+    if current_user.is_authenticated:
+        with primary():
+            tracked = Cart.in_cart_ids(current_user.id,
+                                       [product.id for product in products.items])
+
+    response = jsonify(
         {
+            **pagination,
             "products": [
                 {
                     "id": product.id,
@@ -140,9 +196,8 @@ def search_api() -> jsonify:
                     "item_class": product.item_class,
                     "producer": product.producer,
                     "image": product.get_image(),
-                    "tracked": 
-                    Cart.in_cart(current_user.id, product.id) if current_user.is_authenticated
-                    else "Logged out",
+                    "tracked":
+                    product.id in tracked if current_user.is_authenticated else "Logged out",
                 }
                 for product in products.items
             ],
@@ -151,6 +206,14 @@ def search_api() -> jsonify:
             "total_results": products.total,
         }
     )
+    log_search(
+        variables.get("search"),
+        {key: value for key, value in variables.items() if key != "search"},
+        (time.perf_counter() - started) * 1000,
+        products.total,
+        current_user.is_authenticated,
+    )
+    return response
 
 @blueprint.post('/cart/add')
 @login_required
@@ -163,10 +226,11 @@ def add_to_cart() -> jsonify:
     - 'product_id': The ID of the product to be added.
     - 'action': The action to be performed, either 'track' or 'remove'.
 
-    If the 'product_id' or 'action' is missing in the payload, it redirects to the homepage ("/").
-    If the product exists, it performs the specified action on the user's cart.
+    If the 'product_id' or 'action' is missing in the payload, it returns an error.
     If the action is 'track', it adds the product to the cart.
     If the action is 'remove', it removes the product from the cart.
+    Both actions are idempotent single statements,
+    IDs of products that don't exist are ignored.
 
     Returns:
     - If the action is 'track',
@@ -179,17 +243,103 @@ def add_to_cart() -> jsonify:
 
     data = request.get_json()
 
-    if not data['product_id'] or not data['action']:
+    if not data.get('product_id') or not data.get('action'):
+        return jsonify({'status': 'error'}), 400
+    try:
+        product_id = int(data['product_id'])
+    except (TypeError, ValueError):
         return jsonify({'status': 'error'}), 400
-    product = Product.query.get(data['product_id'])
 
-    if product:
-        if data['action'] == 'track':
-            Cart.append(current_user.id, product.id)
-            return jsonify({'status': 'success', 'action': 'track'}), 200
-        Cart.remove(current_user.id, product.id)
-        return jsonify({'status': 'success', 'action': 'remove'}), 200
-    return jsonify({'status': 'error'}), 400
+    if data['action'] == 'track':
+        Cart.append(current_user.id, product_id)
+        return jsonify({'status': 'success', 'action': 'track'}), 200
+    Cart.remove(current_user.id, product_id)
+    return jsonify({'status': 'success', 'action': 'remove'}), 200
+
+
+@blueprint.post('/cart/bulk')
+@login_required
+def bulk_cart() -> jsonify:
+    """
+    Add or remove several products in the user's cart.
+
+    This function handles the POST request to track or untrack many products at once.
+    It expects a JSON payload with the following keys:
+    - 'product_ids': The list of IDs of the products.
+    - 'action': The action to be performed, either 'track' or 'remove'.
+
+    Each action is a single statement, products that are already tracked
+    or not tracked are skipped and IDs of products that don't exist are ignored.
+
+    Returns:
+    - JSON response with status 'success', the action
+    and the number of products that were changed.
+    - If the payload is invalid,
+    it returns a JSON response with status 'error' and HTTP status code 400.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error'}), 400
+
+    product_ids = data.get('product_ids')
+    action = data.get('action')
+    if (not isinstance(product_ids, list) or not product_ids
+            or len(product_ids) > BULK_CART_LIMIT or action not in ('track', 'remove')):
+        return jsonify({'status': 'error'}), 400
+    try:
+        product_ids = list({int(product_id) for product_id in product_ids})
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error'}), 400
+
+    if action == 'track':
+        changed = Cart.bulk_append(current_user.id, product_ids)
+    else:
+        changed = Cart.bulk_remove(current_user.id, product_ids)
+    return jsonify({'status': 'success', 'action': action, 'changed': changed}), 200
+
+
+@blueprint.post('/cart/alert')
+@login_required
+def set_cart_alert() -> jsonify:
+    """
+    Set the alert rule of a product in the user's cart.
+
+    This function handles the POST request to choose when the user gets notified
+    about a tracked product. It expects a JSON payload with the following keys:
+    - 'product_id': The ID of the product in the cart.
+    - 'alert_type': One of 'any_drop', 'target_price', 'percent_drop' or 'back_in_stock'.
+    - 'target_price': The price to notify at, required for 'target_price'.
+    - 'percent_drop': The percentage to notify at, required for 'percent_drop'.
+
+    Returns:
+    - JSON response with status 'success' and the alert type.
+    - If the payload is invalid,
+    it returns a JSON response with status 'error' and HTTP status code 400.
+    - If the product is not in the cart,
+    it returns a JSON response with status 'error' and HTTP status code 404.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error'}), 400
+
+    alert_type = data.get('alert_type')
+    if not data.get('product_id') or alert_type not in ALERT_TYPES:
+        return jsonify({'status': 'error'}), 400
+    try:
+        product_id = int(data['product_id'])
+        target_price = (float(data['target_price'])
+                        if alert_type == ALERT_TARGET_PRICE else None)
+        percent_drop = (float(data['percent_drop'])
+                        if alert_type == ALERT_PERCENT_DROP else None)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'status': 'error'}), 400
+    if ((target_price is not None and target_price <= 0)
+            or (percent_drop is not None and not 0 < percent_drop < 100)):
+        return jsonify({'status': 'error'}), 400
+
+    if not Cart.set_alert(current_user.id, product_id, alert_type, target_price, percent_drop):
+        return jsonify({'status': 'error'}), 404
+    return jsonify({'status': 'success', 'alert_type': alert_type}), 200
 
 
 # @app.get("/donate")
@@ -220,7 +370,9 @@ def contact_post():
 
     If the user is not logged in, they will be redirected to the login page.
     The form data is retrieved from the request and validated.
-    If the name and message fields are not empty, an email is sent to all admin users.
+    If the name and message fields are not empty, the message is stored for all admin users
+    with a single insert and an email to each of them is queued for the background sender,
+    so the response doesn't wait for the SMTP server.
     The email includes the sender's name, email address, phone number (if provided), and message.
     A success flash message is displayed if the message is sent successfully.
     Otherwise, an error flash message is displayed.
@@ -230,33 +382,28 @@ def contact_post():
     """
     if current_user.is_anonymous:
         flash("You need to be logged in to send a message", "danger")
-        return redirect(url_for("login"))
+        return redirect(url_for("routes.account.authentication.login_get"))
     name = request.form["name"]
     number = request.form["number"]
     subject = request.form["subject"]
     message = request.form["message"]
     if name and message:
-        users = User.query.filter(User.role in ('admin', 'owner')).all()
-        for user in users:
+        text = f"""{name} ({current_user.email_address} | {number if number else 'No number'})
+                has sent you message: \n\n {message}"""
+        admins = db.session.query(User.id, User.email_address).filter(
+            User.role.in_(('admin', 'owner'))).all()
+
+        # One insert and one commit for all admins, the emails are sent in the background
+        Message.bulk_send(text, current_user.id, [admin.id for admin in admins])
+        for admin in admins:
             send_email(
-                user.email_address,
-                f"""{name} ({current_user.email_address} | {number if number else 'No number'})
-                has sent you message: \n\n {message}""",
+                admin.email_address,
+                text,
                 subject=subject,
                 title="Abyssara user sent you a message",
             )
 
-            db.session.add(
-                Message(
-                    text=f"""{name}
-                    ({current_user.email_address} | {number if number else 'No number'})
-                    has sent you message: \n\n {message}""",
-                    sender_id=current_user.id,
-                    recipient_id=user.id)
-                )
-            db.session.commit()
-
         flash("Your message has been sent. Thank you!", "success")
-        return redirect(url_for("home_get"))
+        return redirect(url_for(".home_get"))
     flash("Please fill out all the fields", "danger")
-    return redirect(url_for("contact_get"))
+    return redirect(url_for(".contact_get"))
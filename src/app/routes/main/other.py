@@ -5,11 +5,15 @@ This module contains routes for serving static files and handling other miscella
 Routes:
 - `robots.txt` : Serves the robots.txt file for web crawlers
 - `favicon.ico` : Serves the favicon.ico file for the website
+- `metrics` : Serves the request measurements in the Prometheus text format
 """
 
 import os
 
-from flask import Blueprint, send_from_directory
+from flask import Blueprint, Response, abort, request, send_from_directory
+from flask_login import current_user
+
+from app.utils.metrics import metrics_authorized, render_metrics
 
 blueprint = Blueprint("other", __name__)
 
@@ -40,3 +44,20 @@ def robots():
         str: The content of the 'robots.txt' file.
     """
     return send_from_directory(os.path.join(blueprint.root_path, "static"), "robots.txt")
+
+
+@blueprint.get("/metrics")
+def metrics():
+    """
+    Returns the request measurements of the server in the Prometheus text format.
+
+    Scrapes authenticate with METRICS_TOKEN as a bearer token. Without the token,
+    the measurements are only served to admins.
+
+    Returns:
+        The measurements as a text response.
+    """
+    if not (metrics_authorized(request.headers.get("Authorization"))
+            or (current_user.is_authenticated and current_user.role in ["admin", "owner"])):
+        abort(401)
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,164 @@
+"""
+This file is the entry point of the scheduler process, which owns all periodic jobs.
+~~~~~~~~~~~~~~~~~~~~~
+
+The web workers only serve requests, the periodic jobs run in this process:
+- update_records: Crawls every product to update the records, every night at `CRAWL_HOUR`,
+  followed by warm_searches, which replays the popular searches to warm the caches.
+- roll_up_searches: Rolls up the search log into the daily search statistics.
+- cleanup: Deletes the job runs, crawl runs and finished bulk jobs older than `HISTORY_DAYS`.
+
+The leader also runs the bulk jobs queued by the admin panel, see `app.utils.jobs`.
+A thread of its own drains their queue and looks for new ones every few seconds,
+and on election the leader queues again the jobs a previous leader didn't finish.
+
+The jobs are scheduled at fixed times of the day, so a failover doesn't shift them.
+Any number of scheduler processes can run, across hosts: they elect a leader with
+a PostgreSQL advisory lock and only the leader runs the jobs, see `app.utils.scheduler`.
+The other processes wait and take over when the leader's database session ends.
+If the leader loses its session, it exits, to be restarted by its supervisor.
+
+The process draws its connections from the scheduler pool, see `app.utils.database`.
+
+Every run of a job is recorded in the `job_run` table with its status and duration,
+and served at '/admin/scheduler/jobs'.
+
+Usage, from the `src` directory:
+    python -m app.scheduler
+"""
+
+import logging
+import signal
+import sys
+import threading
+import time
+
+from sqlalchemy.exc import DBAPIError
+
+from app.config import application
+from app.models import BulkJob, CrawlRun, JobRun
+from app.routes.admin import product  # noqa: F401, registers the bulk job handlers
+from app.routes.admin.scrape import update_records
+from app.utils.database import use_component
+from app.utils.jobs import run_jobs_forever
+from app.utils.querylog import roll_up_searches
+from app.utils.scheduler import LEADER_LOCK, AdvisoryLock, run_job, scheduler
+from app.utils.warming import warm_searches
+
+logger = logging.getLogger(__name__)
+
+# Hour of the day the records are updated.
+CRAWL_HOUR = 1
+
+# Number of days the job runs, crawl runs and finished bulk jobs are kept.
+HISTORY_DAYS = 90
+
+# Seconds between two attempts of a waiting process to become the leader.
+LEADER_RETRY = 15
+
+# Seconds between two checks of the leader that it still holds the lock.
+LEADER_CHECK = 10
+
+
+def recrawl() -> None:
+    """
+    Updates the records and warms the caches afterwards, if the update succeeded.
+
+    Returns:
+        None
+    """
+    if run_job("update_records", update_records):
+        run_job("warm_searches", warm_searches)
+
+
+def cleanup() -> dict:
+    """
+    Deletes the job runs, crawl runs and finished bulk jobs older than `HISTORY_DAYS`.
+
+    Returns:
+        dict: The number of deleted job runs, crawl runs and bulk jobs.
+    """
+    with application.app_context():
+        return {
+            "job_runs": JobRun.prune(HISTORY_DAYS),
+            "crawl_runs": CrawlRun.prune(HISTORY_DAYS),
+            "bulk_jobs": BulkJob.prune(HISTORY_DAYS),
+        }
+
+
+def register_jobs() -> None:
+    """
+    Registers the periodic jobs on the scheduler.
+
+    Returns:
+        None
+    """
+    scheduler.add_job(recrawl, trigger="cron", hour=CRAWL_HOUR,
+                      id="recrawl", name="recrawl")
+    scheduler.add_job(run_job, args=("roll_up_searches", roll_up_searches), trigger="cron",
+                      hour=2, minute=30, id="roll_up_searches", name="roll_up_searches")
+    scheduler.add_job(run_job, args=("cleanup", cleanup), trigger="cron", hour=4,
+                      id="cleanup", name="cleanup")
+
+
+def wait_for_leadership() -> AdvisoryLock:
+    """
+    Blocks until this process holds the leader lock.
+
+    Returns:
+        AdvisoryLock: The held leader lock.
+    """
+    leader = AdvisoryLock(LEADER_LOCK)
+    waiting = False
+    while True:
+        try:
+            if leader.acquire():
+                return leader
+            if not waiting:
+                logger.info("Another scheduler is the leader, waiting")
+                waiting = True
+        except DBAPIError as e:
+            logger.error("Could not reach the database: %s", e)
+        time.sleep(LEADER_RETRY)
+
+
+def _terminate(signum, frame) -> None:
+    """
+    Stops the process on SIGTERM, so the leader lock is released.
+    """
+    sys.exit(0)
+
+
+def main() -> None:
+    """
+    Waits to become the leader and runs the periodic jobs until the leadership is lost
+    or the process is stopped.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    signal.signal(signal.SIGTERM, _terminate)
+    use_component("scheduler")
+
+    register_jobs()
+    leader = wait_for_leadership()
+    logger.info("Elected leader, starting the scheduler")
+    with application.app_context():
+        requeued = BulkJob.requeue_running()
+    if requeued:
+        logger.info("Queued %d unfinished bulk jobs again", requeued)
+    scheduler.start()
+    threading.Thread(target=run_jobs_forever, name="bulk-jobs", daemon=True).start()
+    try:
+        while leader.held():
+            time.sleep(LEADER_CHECK)
+        sys.exit("Lost the leader lock, stopping the scheduler")
+    finally:
+        scheduler.shutdown(wait=False)
+        leader.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,9 +25,30 @@ function track(product_id) {
 
     xhr.setRequestHeader('Content-Type', 'application/json');
 
+    xhr.onload = function() {
+        if (xhr.status === 200) {
+            updateCount();
+        }
+    };
+
     xhr.send(JSON.stringify({
         product_id: product_id,
         action: 'remove'
     }));
 }
 
+
+function updateCount() {
+    var xmr = new XMLHttpRequest();
+
+    xmr.open('GET', '/api/profile/cart?page=' + currentPage, true);
+
+    xmr.onload = function() {
+        if (xmr.status === 200) {
+            var response = JSON.parse(xmr.responseText);
+            document.getElementById('cart-count').textContent = '(' + response.total_results + ' items)';
+        }
+    };
+
+    xmr.send();
+}
@@ -0,0 +1,236 @@
+"""
+This module fetches and caches the Google Analytics reports of the admin dashboard.
+~~~~~~~~~~~~~~~~~~~~~
+
+All reports of the dashboard are fetched together with one `batch_run_reports` call,
+using a single Analytics client shared by the process. The row limit of every report
+is part of its request, so only the rows that are shown are transferred.
+
+The reports are kept in the cache of every web worker:
+- A background thread of the worker, started by its first request, refreshes the reports
+  every `REPORT_TTL` seconds, so the admin requests rarely wait for the API, even in
+  a worker that was just started after the previous one was recycled.
+- Reports older than `REPORT_TTL` seconds are still served, while a refresh is started
+  in the background (stale-while-revalidate). Only a cold cache waits for the API.
+- If a refresh fails, the previous reports are kept, and the API isn't called again
+  for `FAILURE_BACKOFF` seconds, so a failing API doesn't slow down every request.
+
+To use the Analytics API, you need to download the credentials
+from the Google Cloud Console and set the environment variable
+GOOGLE_APPLICATION_CREDENTIALS to the path of the credentials file,
+and set GA4_PROPERTY_ID to the ID of the property.
+
+Offline, e.g. in development or tests, set ANALYTICS_RECORDING to the path of a JSON file
+created by `record_reports`. The recorded reports are then served instead of calling the API.
+
+The Analytics client pulls in gRPC and protobuf, so it is imported on the first fetch
+instead of with this module, and the web workers that never fetch don't load it.
+
+Functions:
+- init_analytics(app): Starts the background refresh on the first request of the worker.
+- get_report(name): Returns the rows of a report from the cache.
+- refresh_reports(): Fetches all reports and stores them in the cache.
+- fetch_reports(): Fetches all reports with one batched request.
+- record_reports(path): Fetches all reports and saves them as a recording.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which the cached reports are refreshed in the background.
+REPORT_TTL = 15 * 60
+
+# Seconds after a failed fetch during which the API isn't called again.
+FAILURE_BACKOFF = 60
+
+# Start and end date of the reports.
+DATE_RANGE = ("2020-03-31", "today")
+
+# Name of every report: (dimension, metric, row limit), a limit of 0 returns all rows.
+REPORTS = {
+    "country_sessions": ("country", "sessions", 0),
+    "page_views": ("pageTitle", "screenPageViews", 15),
+    "user_devices": ("deviceCategory", "sessions", 0),
+    "active_users": ("date", "activeUsers", 10),
+}
+
+_reports = {}
+_fetched_at = None
+_failed_at = None
+_refresh_lock = threading.Lock()
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _client():
+    """
+    Returns the Analytics client shared by the process.
+
+    Returns:
+        BetaAnalyticsDataClient: The client.
+    """
+    from google.analytics.data_v1beta import BetaAnalyticsDataClient
+
+    return BetaAnalyticsDataClient()
+
+
+def fetch_reports() -> dict:
+    """
+    Fetches all reports with one batched request.
+
+    If ANALYTICS_RECORDING is set, the recorded reports are returned instead.
+
+    Returns:
+        dict: The rows of every report, (dimension value, metric value) tuples.
+    """
+    recording = os.environ.get("ANALYTICS_RECORDING")
+    if recording:
+        with open(recording, encoding="utf-8") as file:
+            return {name: [tuple(row) for row in rows] for name, rows in json.load(file).items()}
+
+    from google.analytics.data_v1beta.types import (
+        BatchRunReportsRequest,
+        DateRange,
+        Dimension,
+        Metric,
+        RunReportRequest,
+    )
+
+    start_date, end_date = DATE_RANGE
+    property_name = f"properties/{os.environ.get('GA4_PROPERTY_ID')}"
+    request = BatchRunReportsRequest(
+        property=property_name,
+        requests=[
+            RunReportRequest(
+                property=property_name,
+                dimensions=[Dimension(name=dimension)],
+                metrics=[Metric(name=metric)],
+                date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+                limit=limit,
+            )
+            for dimension, metric, limit in REPORTS.values()
+        ],
+    )
+    response = _client().batch_run_reports(request)
+
+    return {
+        name: [(row.dimension_values[0].value, row.metric_values[0].value) for row in report.rows]
+        for name, report in zip(REPORTS, response.reports)
+    }
+
+
+def refresh_reports() -> bool:
+    """
+    Fetches all reports and stores them in the cache.
+
+    Concurrent refreshes are skipped, and the previous reports are kept if the fetch fails.
+
+    Returns:
+        bool: Whether the reports were refreshed.
+    """
+    global _reports, _fetched_at, _failed_at
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        _reports = fetch_reports()
+        _fetched_at = time.monotonic()
+        _failed_at = None
+        return True
+    except Exception as e:
+        _failed_at = time.monotonic()
+        logger.error("Refreshing the analytics reports failed: %s", e)
+        return False
+    finally:
+        _refresh_lock.release()
+
+
+def _backing_off() -> bool:
+    """
+    Checks if the last fetch failed less than `FAILURE_BACKOFF` seconds ago.
+    """
+    return _failed_at is not None and time.monotonic() - _failed_at < FAILURE_BACKOFF
+
+
+def _refresh_periodically() -> None:
+    """
+    Refreshes the reports every `REPORT_TTL` seconds, after a failure every `FAILURE_BACKOFF`.
+    """
+    while True:
+        time.sleep(REPORT_TTL if refresh_reports() else FAILURE_BACKOFF)
+
+
+def _start_refresher() -> None:
+    """
+    Starts the thread refreshing the reports of this process, once.
+    """
+    global _refresher
+    if _refresher is not None:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_periodically,
+                                          name="analytics-refresher", daemon=True)
+            _refresher.start()
+
+
+def init_analytics(app) -> None:
+    """
+    Starts the background refresh of the reports on the first request of every worker,
+    if a property or a recording is configured.
+
+    The thread isn't started at import, the master process of the WSGI server forks
+    the workers after loading the application and threads don't survive a fork.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    if os.environ.get("GA4_PROPERTY_ID") or os.environ.get("ANALYTICS_RECORDING"):
+        app.before_request(_start_refresher)
+
+
+def get_report(name) -> list:
+    """
+    Returns the rows of a report from the cache.
+
+    A cold cache is filled before returning, a stale one is refreshed in the background.
+    Neither calls the API within `FAILURE_BACKOFF` seconds of a failed fetch.
+
+    Args:
+        name (str): The name of the report, a key of `REPORTS`.
+
+    Returns:
+        list: (dimension value, metric value) tuples, empty if no report could be fetched.
+    """
+    if _fetched_at is None:
+        # Wait for a refresh that is already running instead of starting another
+        with _refresh_lock:
+            pass
+        if _fetched_at is None and not _backing_off():
+            refresh_reports()
+    elif time.monotonic() - _fetched_at > REPORT_TTL and not _backing_off():
+        threading.Thread(target=refresh_reports, name="analytics-refresh", daemon=True).start()
+    return _reports.get(name, [])
+
+
+def record_reports(path) -> None:
+    """
+    Fetches all reports from the API and saves them as a recording for ANALYTICS_RECORDING.
+
+    Args:
+        path (str): The path of the JSON file.
+
+    Returns:
+        None
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(fetch_reports(), file, indent=2)
@@ -0,0 +1,147 @@
+"""
+This module contains the cached counters shown in the admin panel.
+~~~~~~~~~~~~~~~~~~~~~
+
+Counting rows is a full scan of the table (or of the partial index of unread messages)
+and the counters are requested by every admin page. The counts are therefore kept
+in a short-lived in-process cache, so most requests are answered without touching
+the database.
+
+The cache is invalidated when a transaction that changed one of the counted tables
+is committed through the application's session, whether the change was made with the
+unit of work or with a bulk `insert`/`update`/`delete` statement. Writes from other
+processes, like the spiders, are picked up when the cached value expires.
+
+Functions:
+- unread_messages(): Returns the number of unread messages.
+- users(): Returns the number of users.
+- products(): Returns the number of products.
+- invalidate(*tables): Drops the cached counters of the given tables.
+"""
+
+import threading
+
+from cachetools import TTLCache
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.config import db
+from app.models import Message, Product, User
+
+# Number of seconds a counter is cached for.
+COUNTER_TTL = 10
+
+_cache = TTLCache(maxsize=16, ttl=COUNTER_TTL)
+_lock = threading.Lock()
+
+_TOUCHED = "counters_touched"
+
+
+def _count(table, query) -> int:
+    """
+    Returns the cached counter of the table, running the query on a cache miss.
+
+    Args:
+        table (str): The name of the counted table.
+        query (callable): Returns the fresh count.
+
+    Returns:
+        int: The count.
+    """
+    with _lock:
+        value = _cache.get(table)
+    if value is None:
+        value = query()
+        with _lock:
+            _cache[table] = value
+    return value
+
+
+def unread_messages() -> int:
+    """
+    Returns the number of unread messages.
+
+    The count is answered from the partial index of unread messages.
+
+    Returns:
+        int: The number of unread messages.
+    """
+    return _count(
+        Message.__tablename__,
+        lambda: db.session.query(func.count(Message.id)).filter(Message.read.is_(False)).scalar(),
+    )
+
+
+def users() -> int:
+    """
+    Returns the number of users.
+
+    Returns:
+        int: The number of users.
+    """
+    return _count(User.__tablename__, lambda: db.session.query(func.count(User.id)).scalar())
+
+
+def products() -> int:
+    """
+    Returns the number of products.
+
+    Returns:
+        int: The number of products.
+    """
+    return _count(Product.__tablename__, lambda: db.session.query(func.count(Product.id)).scalar())
+
+
+def invalidate(*tables) -> None:
+    """
+    Drops the cached counters of the given tables.
+
+    Args:
+        tables (str): The names of the changed tables.
+    """
+    with _lock:
+        for table in tables:
+            _cache.pop(table, None)
+
+
+_COUNTED = {Message.__tablename__, User.__tablename__, Product.__tablename__}
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context) -> None:
+    """
+    Remembers the counted tables changed by a flush until the transaction ends.
+    """
+    touched = session.info.setdefault(_TOUCHED, set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        touched.add(getattr(instance, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state) -> None:
+    """
+    Remembers the counted tables changed by bulk statements until the transaction ends.
+    """
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            orm_execute_state.session.info.setdefault(_TOUCHED, set()).add(
+                mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    """
+    Drops the counters of the tables changed by the committed transaction.
+    """
+    touched = session.info.pop(_TOUCHED, set()) & _COUNTED
+    if touched:
+        invalidate(*touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session) -> None:
+    """
+    Forgets the changes of a rolled back transaction.
+    """
+    session.info.pop(_TOUCHED, None)
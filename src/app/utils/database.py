@@ -0,0 +1,128 @@
+"""
+This module is the connection layer shared by the web application, the scheduler and the spider.
+~~~~~~~~~~~~~~~~~~~~~
+
+Every component connects with the same connection string, DATABASE_URL, and every process
+draws its connections from the SQLAlchemy pool of its component, limited by the component's
+connection budget (see `engine_options` in `app.config`):
+- web: the gunicorn workers, DB_POOL_BUDGET connections across all workers.
+- scheduler: the scheduler process, DB_SCHEDULER_CONNECTIONS connections.
+- spider: every crawl process, DB_SPIDER_CONNECTIONS connections.
+
+The component of a process is set with DB_COMPONENT, 'web' by default. A process switches
+to the pool of another component with `use_component`, e.g. a crawl started by a web worker
+or by the scheduler. The spider runs its statements on pooled connections of `connection()`
+instead of opening a connection for every batch, so a crawl never holds more connections
+than its budget, however fast it scrapes.
+
+Transaction pooling:
+With DB_TRANSACTION_POOLING, DATABASE_URL may point to a PgBouncer in transaction pooling
+mode, which runs consecutive transactions of a client on different server connections.
+The components work unchanged: they keep no session state between transactions, and
+psycopg2 doesn't use server-side prepared statements. The only session level state,
+the advisory locks of the scheduler, is held on connections of `session_engine()`,
+which connects to DB_DIRECT_URL, PostgreSQL itself, in this mode.
+
+Functions:
+- use_component(component): Switches the process to the pool of a component.
+- connection(): Context manager, lends a pooled DBAPI connection for one transaction.
+- session_engine(): Returns the engine for session level state, e.g. advisory locks.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app import DB_COMPONENT, DB_DIRECT_URL, DB_TRANSACTION_POOLING
+from app.config import COMPONENTS, RoutingSession, application, db, sqlalchemy_url
+
+_session_engine = None
+_session_engine_lock = threading.Lock()
+
+
+def use_component(component) -> None:
+    """
+    Switches the process to the pool of a component.
+
+    The connections inherited from a parent process are dropped without closing them,
+    a connection must not be shared between processes.
+
+    Args:
+        component (str): The component, one of `COMPONENTS`.
+
+    Raises:
+        ValueError: If the component is unknown.
+    """
+    if component not in COMPONENTS:
+        raise ValueError(f"Unknown component {component!r}, expected one of {COMPONENTS}")
+    with application.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    RoutingSession.default_bind = None if component == DB_COMPONENT else component
+
+
+def _engine():
+    """
+    Returns the engine of the process's component.
+
+    Returns:
+        Engine: The engine.
+    """
+    with application.app_context():
+        if RoutingSession.default_bind is None:
+            return db.engine
+        return db.engines[RoutingSession.default_bind]
+
+
+@contextmanager
+def connection():
+    """
+    Lends a pooled DBAPI connection of the process's component for one transaction.
+
+    The transaction is committed if the block succeeds and rolled back otherwise,
+    the connection is returned to the pool in both cases.
+
+    Yields:
+        connection: The psycopg2 connection.
+    """
+    conn = _engine().raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def session_engine():
+    """
+    Returns the engine for session level state, e.g. advisory locks.
+
+    That is the engine of the process's component, unless DATABASE_URL points to
+    a PgBouncer in transaction pooling mode. Then it is an unpooled engine connecting
+    to DB_DIRECT_URL, whose connections are closed, not reused, when they are released.
+
+    Returns:
+        Engine: The engine.
+
+    Raises:
+        RuntimeError: In transaction pooling mode, if DB_DIRECT_URL isn't set.
+    """
+    global _session_engine
+    if not DB_TRANSACTION_POOLING:
+        return _engine()
+    with _session_engine_lock:
+        if _session_engine is None:
+            if not DB_DIRECT_URL:
+                raise RuntimeError(
+                    "DB_DIRECT_URL has to point to PostgreSQL itself with DB_TRANSACTION_POOLING"
+                )
+            _session_engine = create_engine(
+                sqlalchemy_url(DB_DIRECT_URL), poolclass=NullPool,
+                connect_args={"application_name": f"fastsearch-{DB_COMPONENT}-session"},
+            )
+        return _session_engine
@@ -2,28 +2,46 @@
 This module is responsible for sending emails to the users.
 ~~~~~~~~~~~~~~~~~~~~~
 
-It uses the smtplib library to establish a connection with the SMTP server and send the email.
-The email message is created using the EmailMessage class from the email.message module.
 The email content is generated by substituting variables
 in an HTML template using the string.Template class.
-The template file is located in the 'templates' directory relative to the current file.
+The template file is located in the 'templates' directory of the application,
+it is read and compiled once per process and reused for every message.
+
+Emails are neither rendered nor sent in the calling thread. `send_email` puts the
+message on a queue; a background worker takes the queued messages in batches,
+renders them and sends every batch over a single connection borrowed from a pool of
+authenticated SMTP connections. Idle connections are health checked with NOOP
+before they are reused, and messages that fail are retried with exponential backoff,
+unless the server rejected them for good.
+
 The SMTP server details and login credentials are retrieved
-from environment variables using the dotenv library.
+from environment variables using the dotenv library:
+- MAIL_SERVER, MAIL_PORT, MAIL_USE_TLS: The SMTP server. Defaults to smtp.gmail.com:587 with STARTTLS.
+- MAIL_USERNAME, MAIL_PASSWORD: The login credentials, the login is skipped without a username.
+- MAIL_POOL_SIZE: The number of pooled connections and worker threads. Defaults to 2.
+- MAIL_BATCH_SIZE: The maximum number of messages sent over one connection at once. Defaults to 50.
+- MAIL_MAX_RETRIES: The number of retries of a failed message. Defaults to 3.
 
-The send_email function takes the recipient's email address, message content,
-subject, and title as parameters.
-It creates an EmailMessage object and sets the sender, recipient, and subject fields.
-The HTML content is generated by substituting the title and message variables in the template.
-The email content is set to the generated HTML content.
-Finally, the email is sent using the SMTP server.
+Functions:
+- send_email(reciever, message, subject, title): Queues an email to be sent.
+- render_email(reciever, message, subject, title): Creates the email message.
+- flush_emails(): Blocks until every queued email was sent or gave up.
+- shutdown_emails(): Sends the queued emails and closes the pooled connections.
 
 Example usage:
 send_email('example@example.com', 'Hello, this is a test email.', 'Test Email', 'My App')
 """
 
+import atexit
+import logging
 import os
+import queue
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
+from functools import lru_cache
 from pathlib import Path
 from string import Template
 
@@ -31,10 +49,31 @@ import dotenv
 
 dotenv.load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-def send_email(reciever, message, subject, title) -> None:
+# Connections idle for longer than this are checked with NOOP before they are reused.
+HEALTH_CHECK_AFTER = 30
+
+# Delay before the first retry of a failed message, doubled on every further retry.
+RETRY_BACKOFF = 1.0
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "templates" / "Base" / "email.html"
+
+
+@lru_cache(maxsize=1)
+def _template() -> Template:
     """
-    Sends an email to the specified receiver with the given message, subject, and title.
+    Loads and compiles the HTML template of the emails once.
+
+    Returns:
+    Template: The compiled email template.
+    """
+    return Template(TEMPLATE_PATH.read_text(encoding="utf-8"))
+
+
+def render_email(reciever, message, subject, title) -> EmailMessage:
+    """
+    Creates the email message for the specified receiver.
 
     Parameters:
     - receiver (str): The email address of the receiver.
@@ -43,30 +82,345 @@ def send_email(reciever, message, subject, title) -> None:
     - title (str): The title to be substituted in the email template.
 
     Returns:
-    None
+    EmailMessage: The email message with the rendered HTML content.
     """
     email = EmailMessage()
     email["from"] = "Abyssara"
     email["to"] = reciever
     email["subject"] = subject
+    email.set_content(_template().substitute({"title": title, "message": message}), "html")
+    return email
+
+
+class SMTPPool:
+    """
+    A pool of authenticated SMTP connections.
 
-    gmail_username = os.environ.get("MAIL_USERNAME")
-    gmail_password = os.environ.get("MAIL_PASSWORD")
+    Connections are created lazily, at most `size` of them are open at once.
 
-    # Load the HTML template
-    html_template = Template(
-        Path(
-            os.path.join(os.path.dirname('src/app/'), "templates", "Base/email.html"),
-        ).read_text(encoding="utf-8")
-    )
+    Methods:
+        connection(): Borrows a healthy connection from the pool.
+        close(): Closes all idle connections.
+    """
 
-    # Substitute the title in the template
-    html_content = html_template.substitute({"title": title, "message": message})
+    def __init__(self, host, port, use_tls=True, username=None, password=None, size=2) -> None:
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
 
-    email.set_content(html_content, "html")
+    def _connect(self) -> smtplib.SMTP:
+        """
+        Opens and authenticates a new connection.
 
-    with smtplib.SMTP(host="smtp.gmail.com", port=587) as smtp:
+        Returns:
+        smtplib.SMTP: The connection.
+        """
+        smtp = smtplib.SMTP(host=self.host, port=self.port, timeout=30)
         smtp.ehlo()
-        smtp.starttls()
-        smtp.login(gmail_username, gmail_password)
-        smtp.send_message(email)
+        if self.use_tls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    @staticmethod
+    def _is_healthy(smtp) -> bool:
+        """
+        Checks if the server still answers on the connection.
+
+        Returns:
+        bool: True if the connection can be reused, False otherwise.
+        """
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(smtp) -> None:
+        """
+        Closes a connection, ignoring the errors of a broken one.
+        """
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a healthy connection from the pool.
+
+        If the body raises, the connection is closed instead of being returned to the pool.
+
+        Yields:
+        smtplib.SMTP: The connection.
+        """
+        self._slots.acquire()
+        try:
+            smtp = None
+            while smtp is None:
+                try:
+                    smtp, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    smtp = self._connect()
+                    break
+                if (time.monotonic() - idle_since > HEALTH_CHECK_AFTER
+                        and not self._is_healthy(smtp)):
+                    self._close(smtp)
+                    smtp = None
+            try:
+                yield smtp
+            except Exception:
+                self._close(smtp)
+                raise
+            self._idle.put((smtp, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """
+        Closes all idle connections.
+        """
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+
+class EmailWorker:
+    """
+    Sends the queued emails in batches from background threads.
+
+    Methods:
+        submit(*email): Queues an email.
+        flush(): Blocks until every queued email was handled.
+        shutdown(): Handles the queued emails and stops the threads.
+    """
+
+    def __init__(self, pool, threads=2, batch_size=50, max_retries=3) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"email-worker-{number}", daemon=True)
+            for number in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, *email) -> None:
+        """
+        Queues an email, it is rendered by the worker.
+
+        Args:
+            email (tuple): The arguments of `render_email`.
+        """
+        self._queue.put(email)
+
+    def flush(self) -> None:
+        """
+        Blocks until every queued email was sent or gave up.
+        """
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        """
+        Handles the queued emails, stops the threads and closes the pooled connections.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.pool.close()
+
+    def _next_batch(self) -> list:
+        """
+        Waits for the next email and takes the emails queued behind it, up to `batch_size`.
+
+        Returns:
+        list: The batch, None marks the end of the work.
+        """
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """
+        Sends the batches until the worker is shut down.
+        """
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            try:
+                emails = self._render([email for email in batch if email is not None])
+                if emails:
+                    self._send(emails)
+            except Exception:
+                # The thread must live on, or the queued emails are never marked as done
+                logger.exception("Sending a batch of %s emails failed", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _render(self, batch) -> list:
+        """
+        Renders the queued emails, an email that can't be rendered is given up on.
+
+        Args:
+            batch (list): The arguments of `render_email` of every email.
+
+        Returns:
+        list: The rendered emails.
+        """
+        emails = []
+        for email in batch:
+            try:
+                emails.append(render_email(*email))
+            except Exception:
+                logger.exception("Rendering the email to %s failed", email[0])
+                self._count(failed=1)
+        return emails
+
+    def _send(self, emails) -> None:
+        """
+        Sends a batch over one pooled connection, retrying the failed emails with backoff.
+
+        An email refused by the server for good, with a 5xx reply, is given up on alone
+        and the rest of the batch is sent over the same connection.
+
+        Args:
+            emails (list): The emails to send.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.pool.connection() as smtp:
+                    while emails:
+                        try:
+                            smtp.send_message(emails[0])
+                        except smtplib.SMTPRecipientsRefused as e:
+                            # Retrying won't help a refused address, go on with the batch
+                            logger.warning("Email to %s refused: %s", emails[0]["to"], e)
+                            self._count(failed=1)
+                        except smtplib.SMTPResponseException as e:
+                            if e.smtp_code < 500:
+                                raise
+                            # A permanent error of this email, e.g. a rejected message
+                            logger.warning("Email to %s rejected: %s", emails[0]["to"], e)
+                            self._count(failed=1)
+                        else:
+                            self._count(sent=1)
+                        emails.pop(0)
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error("Giving up on %s emails: %s", len(emails), e)
+                    self._count(failed=len(emails))
+                    return
+                logger.warning("Sending emails failed (attempt %s): %s", attempt, e)
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    def _count(self, sent=0, failed=0) -> None:
+        """
+        Updates the delivery counters.
+        """
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _get_worker() -> EmailWorker:
+    """
+    Returns the process wide worker, starting it on first use.
+
+    Returns:
+    EmailWorker: The worker.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            size = int(os.environ.get("MAIL_POOL_SIZE", 2))
+            pool = SMTPPool(
+                host=os.environ.get("MAIL_SERVER", "smtp.gmail.com"),
+                port=int(os.environ.get("MAIL_PORT", 587)),
+                use_tls=os.environ.get("MAIL_USE_TLS", "true").lower() in ("1", "true", "yes"),
+                username=os.environ.get("MAIL_USERNAME"),
+                password=os.environ.get("MAIL_PASSWORD"),
+                size=size,
+            )
+            _worker = EmailWorker(
+                pool,
+                threads=size,
+                batch_size=int(os.environ.get("MAIL_BATCH_SIZE", 50)),
+                max_retries=int(os.environ.get("MAIL_MAX_RETRIES", 3)),
+            )
+        return _worker
+
+
+def send_email(reciever, message, subject, title) -> None:
+    """
+    Queues an email to the specified receiver with the given message, subject, and title.
+
+    The email is sent by a background worker, the call doesn't wait for the SMTP server.
+
+    Parameters:
+    - receiver (str): The email address of the receiver.
+    - message (str): The content of the email message.
+    - subject (str): The subject of the email.
+    - title (str): The title to be substituted in the email template.
+
+    Returns:
+    None
+    """
+    _get_worker().submit(reciever, message, subject, title)
+
+
+def flush_emails() -> None:
+    """
+    Blocks until every queued email was sent or gave up.
+
+    Returns:
+    None
+    """
+    if _worker is not None:
+        _worker.flush()
+
+
+@atexit.register
+def shutdown_emails() -> None:
+    """
+    Sends the queued emails and closes the pooled connections.
+
+    Called automatically when the process exits.
+
+    Returns:
+    None
+    """
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.shutdown()
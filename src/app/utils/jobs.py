@@ -0,0 +1,159 @@
+"""
+This module runs long admin operations in the scheduler process and tracks their progress.
+~~~~~~~~~~~~~~~~~~~~~
+
+A job works through a list of items in chunks. Every chunk is handled by the handler
+registered for the name of the job, in its own application context, and the number of
+handled items is recorded in the `bulk_job` table after each chunk, so the admin panel
+can poll the progress of the job from any web worker.
+The SQL statements of every chunk are checked by the query detector, if it is installed.
+
+The web workers only queue the jobs. A thread of the leader of the scheduler processes
+(see `app.scheduler`) runs the queued jobs one after another and looks for new ones
+every `POLL_INTERVAL` seconds once the queue is empty, so a job isn't lost when the web
+worker that queued it is recycled.
+A job runs under an advisory lock of its own. A job interrupted by a restart of
+the scheduler is queued again and resumed after its last handled chunk,
+so the handlers must be safe to repeat on a chunk.
+
+Functions:
+- register_handler(name, chunk_size): Registers the handler of the jobs with the given name.
+- start_job(name, items, params): Queues a job.
+- get_job(job_id): Returns the job with the given ID.
+- run_pending_jobs(): Runs the queued jobs, until none is left.
+- run_jobs_forever(): Runs the queued jobs and waits for new ones, in the scheduler process.
+"""
+
+import logging
+import time
+
+from app.config import application, db
+from app.models import BulkJob
+from app.utils.querydetector import track_queries
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks of the scheduler process for queued jobs, when none is left.
+POLL_INTERVAL = 5
+
+_handlers = {}
+
+
+def register_handler(name, chunk_size):
+    """
+    Registers the decorated function as the handler of the jobs with the given name.
+
+    The handler is called with a chunk of the items and the parameters of the job,
+    and may return the number of affected rows.
+
+    Args:
+        name (str): The name of the operation.
+        chunk_size (int): The number of items handled at once.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(handle_chunk):
+        _handlers[name] = (handle_chunk, chunk_size)
+        return handle_chunk
+    return decorator
+
+
+def start_job(name, items, params=None) -> BulkJob:
+    """
+    Queues a job for the scheduler process.
+
+    Args:
+        name (str): The name of the operation, its handler must be registered.
+        items (list): The items to handle, e.g. product IDs.
+        params (dict, optional): The parameters passed to the handler. Defaults to None.
+
+    Returns:
+        BulkJob: The queued job.
+
+    Raises:
+        KeyError: If no handler is registered for the name.
+    """
+    if name not in _handlers:
+        raise KeyError(f"No handler is registered for the job {name}")
+    return BulkJob.create(name, items, params)
+
+
+def get_job(job_id) -> BulkJob | None:
+    """
+    Returns the job with the given ID.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        BulkJob: The job, None if it doesn't exist.
+    """
+    return db.session.get(BulkJob, job_id)
+
+
+def _run(job_id, name, items, params, done) -> None:
+    """
+    Handles the remaining items of the job chunk by chunk.
+    """
+    try:
+        handle_chunk, chunk_size = _handlers[name]
+        for start in range(done, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            with application.app_context(), track_queries(f"job {name}"):
+                result = handle_chunk(chunk, params) or 0
+                BulkJob.progress(job_id, start + len(chunk), result)
+        status, error = "done", None
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job_id, name)
+        status, error = "failed", str(e)
+    with application.app_context():
+        BulkJob.finish(job_id, status, error)
+
+
+def run_pending_jobs() -> int:
+    """
+    Runs the queued jobs one after another, until none is left.
+
+    Returns:
+        int: The number of jobs that ran.
+    """
+    # Only the scheduler process runs jobs, the web workers don't import the scheduler
+    from app.utils.scheduler import AdvisoryLock
+
+    ran = 0
+    while True:
+        with application.app_context():
+            job = BulkJob.claim()
+            if job is None:
+                return ran
+            job_id, name, items, params, done = job.id, job.name, job.items, job.params, job.done
+
+        lock = AdvisoryLock(f"bulk_job:{job_id}")
+        if not lock.acquire():
+            # A stopping process still runs the job, it's resumed by a later look
+            with application.app_context():
+                BulkJob.requeue(job_id)
+            return ran
+        try:
+            logger.info("Job %s (%s) started at item %d of %d", job_id, name, done, len(items))
+            _run(job_id, name, items, params, done)
+            ran += 1
+        finally:
+            lock.release()
+
+
+def run_jobs_forever() -> None:
+    """
+    Runs the queued jobs and looks for new ones every `POLL_INTERVAL` seconds.
+
+    Runs on a thread of its own in the scheduler process, so a job running
+    for minutes doesn't hold up the periodic jobs.
+    Errors, e.g. of an unreachable database, are logged and the next look retries.
+    """
+    while True:
+        try:
+            run_pending_jobs()
+        except Exception:
+            logger.exception("Running the queued jobs failed")
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,579 @@
+"""
+This module measures the requests of the application and exports the measurements.
+~~~~~~~~~~~~~~~~~~~~~
+
+For every request the latency, the number of SQL statements, the time spent in them
+and the size of the response are recorded in histograms per endpoint and method.
+The SQL statements are timed with the `before_cursor_execute` and `after_cursor_execute`
+events of the SQLAlchemy engine. Requests slower than `SLOW_REQUEST_MS` are logged
+together with their slowest SQL statements.
+
+The histograms are kept in the memory of the process and served in the Prometheus text
+format by the '/metrics' route. Recording a request only updates a few counters under
+a lock, so the measurements can stay enabled in production.
+
+Every worker process of the WSGI server measures its own requests, while a scrape reaches
+a single worker. With METRICS_DIR set, the workers share their measurements through that
+directory: a background thread of every worker writes its changed series to a file
+of its own every `WRITE_INTERVAL` seconds, the worker writes it again when it exits,
+and a scrape sums the files of all workers. The thread starts with the first request. When a worker
+exits, the master process merges its file into `RETIRED_FILE`, so the sums never go
+backwards when the workers are recycled. The gunicorn profile sets up the directory,
+see `gunicorn.conf.py`.
+
+The following environment variables configure the measurements:
+- SLOW_REQUEST_MS: Requests slower than this are logged. Defaults to 500.
+- METRICS_DIR: The directory the worker processes share their measurements through.
+  If not set, '/metrics' serves the measurements of the scraped process only.
+- METRICS_TOKEN: Scrapes authenticate with the header `Authorization: Bearer <token>`.
+  If not set, '/metrics' is served to admins only.
+
+Functions:
+- init_metrics(app): Registers the request hooks and the SQL events.
+- render_metrics(): Returns the measurements in the Prometheus text format.
+- write_metrics(): Writes the measurements of this process to METRICS_DIR.
+- reset_metrics_dir(): Removes the measurements of a previous server from METRICS_DIR.
+- retire_worker(pid): Merges the measurements of an exited worker into the retired ones.
+- metrics_authorized(authorization): Checks the authorization header of a scrape.
+"""
+
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app.config import db
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this number of milliseconds are logged.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 500))
+
+# Number of SQL statements logged with a slow request.
+SLOW_REQUEST_STATEMENTS = 5
+
+# Maximum length of a logged SQL statement.
+STATEMENT_LOG_LENGTH = 300
+
+# Directory the worker processes share their measurements through, None to keep them apart.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+
+# Seconds between two writes of the measurements of a worker to METRICS_DIR.
+WRITE_INTERVAL = 1.0
+
+# File of METRICS_DIR holding the summed measurements of the exited workers.
+RETIRED_FILE = "retired.json"
+
+# Number of merged worker files remembered in RETIRED_FILE, see `render_metrics`.
+RETIRED_NAMES = 100
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with a series for every combination of label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        description (str): The help text of the metric.
+        buckets (tuple): The upper bounds of the buckets, in ascending order.
+        series (dict): The bucket counts, sum and count of every combination of label values.
+    """
+
+    def __init__(self, name, description, buckets) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value) -> None:
+        """
+        Records a value, the caller holds the registry lock.
+
+        Args:
+            labels (tuple): The (name, value) pairs of the labels.
+            value (float): The observed value.
+        """
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def empty(self) -> "Histogram":
+        """
+        Returns a histogram of the same metric without any series.
+
+        Returns:
+            Histogram: The empty histogram.
+        """
+        return Histogram(self.name, self.description, self.buckets)
+
+    def dump(self) -> list:
+        """
+        Returns the series in a JSON serializable form, the caller holds the registry lock.
+
+        Returns:
+            list: [labels, bucket counts, sum, count] of every series.
+        """
+        return [[labels, list(counts), total, count]
+                for labels, (counts, total, count) in self.series.items()]
+
+    def merge(self, dumped) -> None:
+        """
+        Adds dumped series to the series of the histogram.
+
+        Args:
+            dumped (list): The series, see `dump`.
+        """
+        for labels, counts, total, count in dumped:
+            labels = tuple(tuple(pair) for pair in labels)
+            series = self.series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+            series[0] = [own + other for own, other in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self) -> list:
+        """
+        Returns the lines of the metric in the Prometheus text format.
+
+        Returns:
+            list: The lines.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """
+    A Prometheus counter with a series for every combination of label values.
+
+    Attributes:
+        name (str): The name of the metric.
+        description (str): The help text of the metric.
+        series (dict): The value of every combination of label values.
+    """
+
+    def __init__(self, name, description) -> None:
+        self.name = name
+        self.description = description
+        self.series = {}
+
+    def inc(self, labels) -> None:
+        """
+        Increments the counter, the caller holds the registry lock.
+
+        Args:
+            labels (tuple): The (name, value) pairs of the labels.
+        """
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def empty(self) -> "Counter":
+        """
+        Returns a counter of the same metric without any series.
+
+        Returns:
+            Counter: The empty counter.
+        """
+        return Counter(self.name, self.description)
+
+    def dump(self) -> list:
+        """
+        Returns the series in a JSON serializable form, the caller holds the registry lock.
+
+        Returns:
+            list: [labels, value] of every series.
+        """
+        return [[labels, value] for labels, value in self.series.items()]
+
+    def merge(self, dumped) -> None:
+        """
+        Adds dumped series to the series of the counter.
+
+        Args:
+            dumped (list): The series, see `dump`.
+        """
+        for labels, value in dumped:
+            labels = tuple(tuple(pair) for pair in labels)
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self) -> list:
+        """
+        Returns the lines of the metric in the Prometheus text format.
+
+        Returns:
+            list: The lines.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}_total{_labels(labels)} {value}")
+        return lines
+
+
+def _labels(labels) -> str:
+    """
+    Formats label pairs for the Prometheus text format.
+
+    Args:
+        labels (tuple): The (name, value) pairs of the labels.
+
+    Returns:
+        str: The formatted labels.
+    """
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_changed = False
+_writer = None
+_worker_file = None
+
+REQUESTS = Counter("http_requests", "Number of handled requests.")
+SLOW_REQUESTS = Counter("http_slow_requests", "Number of requests slower than SLOW_REQUEST_MS.")
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", DURATION_BUCKETS)
+SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "Number of SQL statements executed by a request.",
+    STATEMENT_BUCKETS)
+SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds", "Time a request spent in SQL statements.",
+    DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of the response body.", SIZE_BUCKETS)
+
+METRICS = (REQUESTS, SLOW_REQUESTS, REQUEST_DURATION, SQL_STATEMENTS, SQL_DURATION, RESPONSE_SIZE)
+
+
+class RequestMetrics:
+    """
+    The measurements of the current request.
+
+    Attributes:
+        started (float): The `perf_counter` value at the start of the request.
+        statements (int): The number of executed SQL statements.
+        sql_seconds (float): The time spent in SQL statements.
+        timings (list): (seconds, statement) pairs of the executed SQL statements.
+    """
+
+    __slots__ = ("started", "statements", "sql_seconds", "timings")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.timings = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Stores the start time of a SQL statement on its execution context.
+
+    Not on the connection, a failed statement would leave its start time on the pooled
+    connection. Internal statements without a context aren't measured.
+    """
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Adds the duration of a SQL statement to the measurements of the current request.
+    """
+    started = getattr(context, "metrics_started", None)
+    if started is None or not has_request_context():
+        return
+    metrics = g.get("metrics")
+    if metrics is None:
+        return
+    seconds = time.perf_counter() - started
+    metrics.statements += 1
+    metrics.sql_seconds += seconds
+    metrics.timings.append((seconds, statement))
+
+
+def _before_request() -> None:
+    """
+    Starts the measurements of the request.
+    """
+    g.metrics = RequestMetrics()
+
+
+def _after_request(response):
+    """
+    Records the measurements of the request and logs it if it was slow.
+    """
+    metrics = g.pop("metrics", None)
+    if metrics is None:
+        return response
+    seconds = time.perf_counter() - metrics.started
+    endpoint = request.endpoint or "unmatched"
+    labels = (("endpoint", endpoint), ("method", request.method))
+    size = response.calculate_content_length()
+    slow = seconds * 1000 >= SLOW_REQUEST_MS
+
+    global _changed
+    with _lock:
+        _changed = True
+        REQUESTS.inc(labels + (("status", response.status_code),))
+        REQUEST_DURATION.observe(labels, seconds)
+        SQL_STATEMENTS.observe(labels, metrics.statements)
+        SQL_DURATION.observe(labels, metrics.sql_seconds)
+        if size is not None:
+            RESPONSE_SIZE.observe(labels, size)
+        if slow:
+            SLOW_REQUESTS.inc((("endpoint", endpoint),))
+
+    if METRICS_DIR and _writer is None:
+        _start_writer()
+
+    if slow:
+        slowest = sorted(metrics.timings, key=lambda timing: timing[0], reverse=True)
+        logger.warning(
+            "Slow request %s %s (%s): %.1f ms, %d SQL statements in %.1f ms%s",
+            request.method, request.path, endpoint, seconds * 1000,
+            metrics.statements, metrics.sql_seconds * 1000,
+            "".join(
+                f"\n  {statement_seconds * 1000:.1f} ms: "
+                f"{' '.join(statement.split())[:STATEMENT_LOG_LENGTH]}"
+                for statement_seconds, statement in slowest[:SLOW_REQUEST_STATEMENTS]
+            ),
+        )
+    return response
+
+
+def init_metrics(app) -> None:
+    """
+    Registers the request hooks of the application and the SQL events of its engines,
+    the primary and the read replica.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        None
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _read_file(name) -> dict | None:
+    """
+    Reads a file of METRICS_DIR.
+
+    Args:
+        name (str): The name of the file.
+
+    Returns:
+        dict: The content of the file, None if it doesn't exist (anymore).
+    """
+    try:
+        with open(os.path.join(METRICS_DIR, name)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_file(name, content) -> None:
+    """
+    Replaces a file of METRICS_DIR, readers see either the old or the new content.
+
+    Args:
+        name (str): The name of the file.
+        content (dict): The new content.
+    """
+    path = os.path.join(METRICS_DIR, name)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(content, file)
+    os.replace(temporary, path)
+
+
+def _merge(contents) -> list:
+    """
+    Sums dumped measurements.
+
+    Args:
+        contents (iterable): The dumped series of every metric by metric name.
+
+    Returns:
+        list: The metrics with the summed series, in the order of METRICS.
+    """
+    merged = [metric.empty() for metric in METRICS]
+    for content in contents:
+        for metric in merged:
+            metric.merge(content.get(metric.name, []))
+    return merged
+
+
+def write_metrics() -> None:
+    """
+    Writes the measurements of this process to its file of METRICS_DIR.
+
+    The file is named after the process and a random token, so a later process
+    reusing the process ID doesn't overwrite it.
+
+    Returns:
+        None
+    """
+    global _changed, _worker_file
+    if not METRICS_DIR:
+        return
+    # A snapshot is written before any later one, so the file never goes backwards
+    with _write_lock:
+        if _worker_file is None or not _worker_file.startswith(f"{os.getpid()}-"):
+            _worker_file = f"{os.getpid()}-{uuid.uuid4().hex}.json"
+        with _lock:
+            content = {metric.name: metric.dump() for metric in METRICS}
+            _changed = False
+        _write_file(_worker_file, content)
+
+
+def _write_periodically() -> None:
+    """
+    Writes the measurements of this process every `WRITE_INTERVAL` seconds, if they changed.
+    """
+    while True:
+        time.sleep(WRITE_INTERVAL)
+        if _changed:
+            try:
+                write_metrics()
+            except OSError as e:
+                logger.error("Could not write the measurements to %s: %s", METRICS_DIR, e)
+
+
+def _start_writer() -> None:
+    """
+    Starts the thread writing the measurements of this process, once.
+    """
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_periodically, name="metrics-writer",
+                                       daemon=True)
+            _writer.start()
+
+
+def reset_metrics_dir() -> None:
+    """
+    Creates METRICS_DIR and removes the measurements of a previous server from it.
+
+    Called by the master process of the WSGI server before the workers start.
+
+    Returns:
+        None
+    """
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(METRICS_DIR, name))
+
+
+def retire_worker(pid) -> None:
+    """
+    Merges the measurements of an exited worker into `RETIRED_FILE` and removes its file.
+
+    Called by the master process of the WSGI server after a worker exited.
+    The merged file names are remembered, so a scrape that read the worker file
+    before it was removed doesn't count it twice.
+
+    Args:
+        pid (int): The process ID of the worker.
+
+    Returns:
+        None
+    """
+    if not METRICS_DIR:
+        return
+    names = [name for name in os.listdir(METRICS_DIR)
+             if name.startswith(f"{pid}-") and name.endswith(".json")]
+    if not names:
+        return
+    retired = _read_file(RETIRED_FILE) or {"files": [], "metrics": {}}
+    merged = _merge([retired["metrics"], *(_read_file(name) or {} for name in names)])
+    _write_file(RETIRED_FILE, {
+        "files": (retired["files"] + names)[-RETIRED_NAMES:],
+        "metrics": {metric.name: metric.dump() for metric in merged},
+    })
+    for name in names:
+        os.remove(os.path.join(METRICS_DIR, name))
+
+
+def render_metrics() -> str:
+    """
+    Returns the measurements in the Prometheus text format.
+
+    With METRICS_DIR, these are the summed measurements of all worker processes
+    of the server, the running and the exited ones. Otherwise only the measurements
+    of this process.
+
+    Returns:
+        str: The measurements.
+    """
+    if not METRICS_DIR:
+        with _lock:
+            lines = [line for metric in METRICS for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+    write_metrics()
+    workers = {}
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".json") and name != RETIRED_FILE:
+            content = _read_file(name)
+            if content is not None:
+                workers[name] = content
+    # Read last: a worker file is removed only after it was merged into the retired file
+    retired = _read_file(RETIRED_FILE) or {"files": [], "metrics": {}}
+    for name in retired["files"]:
+        workers.pop(name, None)
+    merged = _merge([retired["metrics"], *workers.values()])
+    return "\n".join(line for metric in merged for line in metric.render()) + "\n"
+
+
+def metrics_authorized(authorization) -> bool:
+    """
+    Checks the authorization header of a scrape against METRICS_TOKEN.
+
+    Args:
+        authorization (str): The value of the Authorization header, may be None.
+
+    Returns:
+        bool: True if METRICS_TOKEN is set and the header carries it.
+    """
+    token = os.environ.get("METRICS_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(authorization or "", f"Bearer {token}")
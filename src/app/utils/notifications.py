@@ -2,31 +2,122 @@
 This module contains functions for sending notifications
 to users about price changes for specific products.
 
+Every product in a cart carries an alert rule (see `Cart.alert_type`).
+The rules are evaluated set-wise: the changes of an ingest flush are joined
+against the rules of all carts in a single query, and only the alerts that fire
+are sent.
+
 Functions:
-- notify_price_change: Notifies users about a price change for a specific product.
+- resolve_alerts: Groups the fired alerts of a batch by the confirmed users watching the products.
+- notify_price_changes: Sends every user a single digest about the alerts that fired.
 """
 
+from itertools import groupby
+
+from sqlalchemy import Float, String, Integer, and_, column, or_, values
+
+from app.config import db
 from app.models import Product, Cart, User
+from app.models.cart import (ALERT_ANY_DROP, ALERT_TARGET_PRICE,
+                             ALERT_PERCENT_DROP, ALERT_BACK_IN_STOCK)
 from app.utils.email import send_email
 
-def notify_price_change(url) -> None:
+def resolve_alerts(changes) -> list[tuple[User, list[tuple[Product, str, float]]]]:
+    """
+    Finds the alerts that fire for the given product changes.
+
+    The changes are joined against the alert rules of the carts in a single query
+    over the `cart.product_id` index, no matter how many products changed in the batch.
+    Only users with a confirmed email address are returned.
+
+    Args:
+        changes (list): (product_id, old_price, new_price, old_availability, new_availability)
+        tuples of the products that changed in one ingest flush.
+
+    Returns:
+        list: (user, alerts) tuples, one per user, where alerts are
+        (product, alert_type, old_price) tuples of the batch.
     """
-    Notifies users about a price change for a specific product.
+    if not changes:
+        return []
+
+    changed = values(
+        column("product_id", Integer),
+        column("old_price", Float),
+        column("new_price", Float),
+        column("old_availability", String),
+        column("new_availability", String),
+        name="changed",
+    ).data(changes)
+
+    price_dropped = changed.c.new_price < changed.c.old_price
+    fired = or_(
+        and_(Cart.alert_type == ALERT_ANY_DROP, price_dropped),
+        and_(
+            Cart.alert_type == ALERT_TARGET_PRICE,
+            changed.c.new_price <= Cart.alert_target_price,
+            changed.c.old_price > Cart.alert_target_price,
+        ),
+        and_(
+            Cart.alert_type == ALERT_PERCENT_DROP,
+            price_dropped,
+            (changed.c.old_price - changed.c.new_price) * 100
+            >= Cart.alert_percent_drop * changed.c.old_price,
+        ),
+        and_(
+            Cart.alert_type == ALERT_BACK_IN_STOCK,
+            changed.c.new_availability == "In stock",
+            changed.c.old_availability.is_distinct_from("In stock"),
+        ),
+    )
+
+    rows = db.session.query(User, Product, Cart.alert_type, changed.c.old_price).select_from(
+        changed
+    ).join(
+        Cart, Cart.product_id == changed.c.product_id
+    ).join(
+        User, User.id == Cart.user_id
+    ).join(
+        Product, Product.id == Cart.product_id
+    ).filter(
+        User.confirmed_on.isnot(None),
+        fired,
+    ).order_by(User.id, Product.id).all()
+
+    return [
+        (user, [(product, alert_type, old_price) for _, product, alert_type, old_price in group])
+        for user, group in groupby(rows, key=lambda row: row[0])
+    ]
+
+
+def notify_price_changes(changes) -> None:
+    """
+    Notifies users about the alerts that fired for the products they watch.
+
+    Every user receives one email listing all of their alerts from the batch.
 
     Args:
-        url (str): The URL of the product.
+        changes (list): (product_id, old_price, new_price, old_availability, new_availability)
+        tuples of the products that changed in one ingest flush.
 
     Returns:
         None
     """
-    product: Product = Product.query.filter_by(url=url).first()
-
-    users: list[User] = [User.query.get(i.user_id) for i in Cart.query.filter_by(product_id=product.id).all()]
-    for user in users:
-        if user.is_confirmed():
-            send_email(
-                user.email_address,
-                f"The price of '{product.title}' has changed. The new price is {product.price}.",
-                "Price Change Notification From Abyssara",
-                "Price dropped"
-            )
+    for user, alerts in resolve_alerts(changes):
+        lines = []
+        for product, alert_type, old_price in alerts:
+            if alert_type == ALERT_BACK_IN_STOCK:
+                lines.append(
+                    f"'{product.title}' is back in stock. The price is {product.price}."
+                )
+            else:
+                lines.append(
+                    f"The price of '{product.title}' has dropped from {old_price}. "
+                    f"The new price is {product.price}."
+                )
+        send_email(
+            user.email_address,
+            "<br>".join(lines),
+            "Price Change Notification From Abyssara",
+            "Price alert"
+        )
@@ -0,0 +1,295 @@
+"""
+This module detects repeated and slow SQL statements in development and tests.
+~~~~~~~~~~~~~~~~~~~~~
+
+Every SQL statement executed while a tracker is active is reduced to a fingerprint:
+its text with the bound parameters, literals and IN lists replaced by placeholders.
+A fingerprint that is executed `N_PLUS_ONE_THRESHOLD` times or more within a single
+request or job is most likely a query issued once per row (an N+1 query), and is
+reported together with the call stack that issued it. Statements slower than
+`SLOW_QUERY_MS` are reported with their call stack as well.
+
+The detector is installed by `init_query_detector` only if the application runs in
+debug or testing mode or QUERY_DETECTOR is set, so production pays nothing for it.
+Requests are tracked automatically, background work can be tracked with `track_queries`.
+
+`assert_max_queries` turns a query count into an assertion, and the `max_queries`
+fixture of `tests/conftest.py` wraps it, so query count regressions fail the tests:
+
+    def test_search(client, max_queries):
+        with max_queries(4):
+            client.get("/api/search?search=phone")
+
+The following environment variables configure the detector:
+- QUERY_DETECTOR: Installs the detector outside of debug and testing mode.
+- N_PLUS_ONE_THRESHOLD: Repetitions of a fingerprint that are reported. Defaults to 5.
+- SLOW_QUERY_MS: Statements slower than this are reported. Defaults to 100.
+
+Functions:
+- init_query_detector(app): Installs the detector if it is enabled.
+- fingerprint(statement): Returns the fingerprint of a SQL statement.
+- track_queries(name): Tracks the statements executed inside the block.
+- assert_max_queries(limit): Fails if the block executes more statements than the limit.
+"""
+
+import logging
+import os
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from flask import g, request
+from sqlalchemy import event
+
+from app.config import db
+
+logger = logging.getLogger(__name__)
+
+# Repetitions of the same fingerprint within a request or job that are reported.
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+
+# Statements slower than this number of milliseconds are reported.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Number of application frames shown of a reported call stack.
+STACK_DEPTH = 8
+
+_PATTERNS = (
+    (re.compile(r"%\(\w+\)s|\?|\$\d+|__\[POSTCOMPILE_\w+\]"), "?"),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE), "IN (?)"),
+    (re.compile(r"\s+"), " "),
+)
+
+_trackers = ContextVar("query_trackers", default=())
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement) -> str:
+    """
+    Returns the fingerprint of a SQL statement: its shape without any values.
+
+    Args:
+        statement (str): The SQL statement.
+
+    Returns:
+        str: The fingerprint.
+    """
+    for pattern, replacement in _PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _stack() -> str:
+    """
+    Returns the application frames of the current call stack.
+
+    Returns:
+        str: The formatted frames, the innermost last.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if "site-packages" not in frame.filename and frame.filename != __file__
+    ]
+    return "".join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class QueryTracker:
+    """
+    Counts the statements of a request or job by fingerprint.
+
+    Attributes:
+        name (str): The name of the request or job.
+        statements (int): The number of executed statements.
+        counts (dict): The number of executions of every fingerprint.
+        stacks (dict): The call stack of every fingerprint that reached the threshold.
+        slow (list): (milliseconds, statement, stack) of the slow statements.
+    """
+
+    def __init__(self, name) -> None:
+        self.name = name
+        self.statements = 0
+        self.counts = {}
+        self.stacks = {}
+        self.slow = []
+
+    def record(self, statement, seconds) -> None:
+        """
+        Counts an executed statement.
+
+        Args:
+            statement (str): The SQL statement.
+            seconds (float): The time the statement took.
+        """
+        self.statements += 1
+        shape = fingerprint(statement)
+        count = self.counts[shape] = self.counts.get(shape, 0) + 1
+        if count == N_PLUS_ONE_THRESHOLD:
+            self.stacks[shape] = _stack()
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            self.slow.append((seconds * 1000, shape, _stack()))
+
+    def repeated(self) -> list:
+        """
+        Returns the fingerprints executed at least `N_PLUS_ONE_THRESHOLD` times.
+
+        Returns:
+            list: (count, fingerprint, stack) tuples, the most frequent first.
+        """
+        return sorted(
+            ((self.counts[shape], shape, stack) for shape, stack in self.stacks.items()),
+            key=lambda item: item[0], reverse=True,
+        )
+
+    def report(self) -> None:
+        """
+        Logs the repeated and the slow statements.
+        """
+        for count, shape, stack in self.repeated():
+            logger.warning("%s: %d executions of the same statement (N+1?): %s\n%s",
+                           self.name, count, shape, stack)
+        for milliseconds, shape, stack in self.slow:
+            logger.warning("%s: slow statement (%.1f ms): %s\n%s",
+                           self.name, milliseconds, shape, stack)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Stores the start time of a SQL statement on its execution context.
+
+    Not on the connection, a failed statement would leave its start time on the pooled
+    connection.
+    """
+    if context is not None:
+        context.detector_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Records a SQL statement in the active trackers.
+    """
+    started = getattr(context, "detector_started", None)
+    # Internal statements without a context are counted, but not timed
+    seconds = time.perf_counter() - started if started is not None else 0.0
+    for tracker in _trackers.get():
+        tracker.record(statement, seconds)
+
+
+@contextmanager
+def track_queries(name, report=True):
+    """
+    Tracks the statements executed inside the block, e.g. by a job.
+
+    Trackers nest: a statement is counted by every active tracker,
+    e.g. by the tracker of a request and by an `assert_max_queries` around it.
+
+    Args:
+        name (str): The name of the tracked work, used in the report.
+        report (bool, optional): Log the repeated and slow statements at the end.
+        Defaults to True.
+
+    Yields:
+        QueryTracker: The tracker.
+    """
+    tracker = QueryTracker(name)
+    token = _trackers.set(_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _trackers.reset(token)
+        if report:
+            tracker.report()
+
+
+@contextmanager
+def assert_max_queries(limit, name="block"):
+    """
+    Fails if the block executes more statements than the limit.
+
+    The detector has to be installed, see `init_query_detector`.
+
+    Args:
+        limit (int): The maximum number of statements.
+        name (str, optional): The name of the block, used in the message. Defaults to "block".
+
+    Yields:
+        QueryTracker: The tracker.
+
+    Raises:
+        AssertionError: If more statements were executed.
+    """
+    with track_queries(name, report=False) as tracker:
+        yield tracker
+    if tracker.statements > limit:
+        details = "\n".join(
+            f"  {count} x {shape}"
+            for shape, count in sorted(tracker.counts.items(), key=lambda item: -item[1])
+        )
+        raise AssertionError(
+            f"{name} executed {tracker.statements} SQL statements, at most {limit} expected:\n"
+            f"{details}"
+        )
+
+
+def _before_request() -> None:
+    """
+    Starts tracking the statements of the request.
+    """
+    tracker = QueryTracker(f"{request.method} {request.path}")
+    g.query_tracker = tracker
+    g.query_tracker_token = _trackers.set(_trackers.get() + (tracker,))
+
+
+def _teardown_request(exception=None) -> None:
+    """
+    Stops tracking the statements of the request and reports them.
+    """
+    token = g.pop("query_tracker_token", None)
+    if token is None:
+        return
+    _trackers.reset(token)
+    g.pop("query_tracker").report()
+
+
+def detector_enabled(app) -> bool:
+    """
+    Checks if the detector should be installed for the application.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        bool: True in debug or testing mode, or if QUERY_DETECTOR is set.
+    """
+    return (app.debug or app.testing
+            or os.environ.get("QUERY_DETECTOR", "").lower() in ("1", "true", "yes"))
+
+
+def init_query_detector(app, force=False) -> bool:
+    """
+    Installs the detector if it is enabled: tracks every request and times the statements.
+
+    Args:
+        app (Flask): The application.
+        force (bool, optional): Install it regardless of the mode, e.g. in tests.
+        Defaults to False.
+
+    Returns:
+        bool: Whether the detector was installed.
+    """
+    if app.extensions.get("query_detector"):
+        return True
+    if not (force or detector_enabled(app)):
+        return False
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    app.extensions["query_detector"] = True
+    return True
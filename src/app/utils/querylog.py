@@ -0,0 +1,256 @@
+"""
+This module records the searches of the public search API.
+~~~~~~~~~~~~~~~~~~~~~
+
+Every search is described by a compact event: the normalized search string, the other
+filters, the latency, the number of results and whether the user was logged in.
+Recording an event only puts it on a bounded in-memory queue, so a search doesn't wait
+for the database. A background writer inserts the queued events into the `search_query`
+table in batches. If the queue is full, e.g. because the database is unavailable,
+new events are dropped instead of slowing down the searches.
+
+Every night the scheduler process (see `app.scheduler`) rolls up the searches of the
+previous days into `search_query_rollup` rows, the source of the admin search statistics.
+
+Functions:
+- log_search(search, filters, latency_ms, result_count, authenticated): Records a search.
+- normalize_search(search): Returns the normalized form of a search string.
+- flush_search_log(): Blocks until every recorded search was written.
+- roll_up_searches(): Rolls up the searches of the finished days.
+- shutdown_search_log(): Writes the recorded searches and stops the writer.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.config import application, db
+from app.models import SearchQuery
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of searches waiting to be written, further searches are dropped.
+QUEUE_SIZE = 10000
+
+# Maximum number of searches written with a single insert.
+BATCH_SIZE = 500
+
+# Seconds the writer waits for more searches before writing a partial batch.
+FLUSH_INTERVAL = 2.0
+
+# Maximum length of a stored search string.
+MAX_SEARCH_LENGTH = 200
+
+
+def normalize_search(search) -> str:
+    """
+    Returns the normalized form of a search string: lowercase, with single spaces.
+
+    Args:
+        search (str): The search string, may be None.
+
+    Returns:
+        str: The normalized search string, empty without a search string.
+    """
+    return " ".join((search or "").lower().split())[:MAX_SEARCH_LENGTH]
+
+
+class QueryLogWriter:
+    """
+    Writes the recorded searches to the database in batches from a background thread.
+
+    Methods:
+        submit(event): Queues a search.
+        flush(): Blocks until every queued search was written.
+        shutdown(): Writes the queued searches and stops the thread.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 queue_size=QUEUE_SIZE) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="search-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event) -> None:
+        """
+        Queues a search, it is dropped if the queue is full.
+
+        Args:
+            event (dict): The column values of the SearchQuery row.
+        """
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """
+        Blocks until every queued search was written.
+        """
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        """
+        Writes the queued searches and stops the thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self) -> list:
+        """
+        Waits for the next search and takes the searches queued behind it, up to `batch_size`.
+        Searches arriving within `flush_interval` of the first one are added to the batch.
+
+        Returns:
+        list: The batch, None marks the end of the work.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """
+        Writes the batches until the writer is shut down.
+        """
+        while True:
+            batch = self._next_batch()
+            events = [event for event in batch if event is not None]
+            try:
+                if events:
+                    self._write(events)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _write(self, events) -> None:
+        """
+        Inserts a batch of searches with a single statement.
+
+        Args:
+            events (list): The column values of the SearchQuery rows.
+        """
+        with application.app_context():
+            try:
+                db.session.execute(insert(SearchQuery), events)
+                db.session.commit()
+                self.written += len(events)
+            except Exception as e:
+                db.session.rollback()
+                self.dropped += len(events)
+                logger.error("Writing %d searches failed: %s", len(events), e)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> QueryLogWriter:
+    """
+    Returns the process wide writer, starting it on first use.
+
+    Returns:
+    QueryLogWriter: The writer.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = QueryLogWriter()
+        return _writer
+
+
+def log_search(search, filters, latency_ms, result_count, authenticated) -> None:
+    """
+    Records a search of the public search API, it is written in the background.
+
+    Args:
+        search (str): The search string, may be None.
+        filters (dict): The other filters of the search.
+        latency_ms (float): The time the search took to answer, in milliseconds.
+        result_count (int): The number of results.
+        authenticated (bool): Whether the user was logged in.
+
+    Returns:
+    None
+    """
+    _get_writer().submit(
+        {
+            "search": normalize_search(search),
+            "filters": filters,
+            "latency_ms": latency_ms,
+            "result_count": result_count,
+            "authenticated": authenticated,
+            "searched_on": datetime.now(),
+        }
+    )
+
+
+def flush_search_log() -> None:
+    """
+    Blocks until every recorded search was written.
+
+    Returns:
+    None
+    """
+    if _writer is not None:
+        _writer.flush()
+
+
+def roll_up_searches() -> dict:
+    """
+    Rolls up the searches of the finished days and deletes the old searches.
+
+    Days that fail to roll up are logged and retried by the next run.
+
+    Returns:
+    dict: The number of rolled up days and the days that failed.
+
+    Raises:
+    Exception: If the roll up failed, after its transaction was rolled back.
+    """
+    with application.app_context():
+        try:
+            days, failed = SearchQuery.roll_up_pending()
+        except Exception:
+            db.session.rollback()
+            raise
+    logger.info("Rolled up the searches of %d days", len(days))
+    if failed:
+        logger.error("Could not roll up the searches of %s",
+                     ", ".join(day.isoformat() for day in failed))
+    return {"days": len(days), "failed": [day.isoformat() for day in failed]}
+
+
+@atexit.register
+def shutdown_search_log() -> None:
+    """
+    Writes the recorded searches and stops the writer.
+
+    Called automatically when the process exits.
+
+    Returns:
+    None
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.shutdown()
+            _writer = None
@@ -0,0 +1,205 @@
+"""
+This module routes the reads of the read-only endpoints to a read replica of the database.
+~~~~~~~~~~~~~~~~~~~~~
+
+If DB_REPLICA_HOST is set, `app.config` registers the replica as the `replica` bind.
+The views decorated with `read_replica`, e.g. the search API, read from it: their selects
+run on the replica (see `RoutingSession`), so the heavy searches don't contend with
+the writes of the spider on the primary. Writes always run on the primary. Views that
+write, or have to read the user's own writes, e.g. the cart, aren't decorated.
+A read of a decorated view that has to see the latest writes runs in a `primary()` block.
+
+The replication lag is measured at most every `LAG_CHECK_INTERVAL` seconds per process.
+While the replica lags behind by more than DB_REPLICA_MAX_LAG seconds, can't be
+reached, or lost a connection, the decorated views read from the primary.
+
+Functions:
+- init_replica(app): Starts monitoring the replica, if one is configured.
+- replica_status(): Returns whether the replica is read and its last measured lag.
+- read_replica(f): Decorator, routes the reads of a view to the replica.
+- primary(): Context manager, routes the reads of its block to the primary.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+from app import DB_REPLICA_MAX_LAG
+from app.config import REPLICA_BIND, db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two measurements of the replication lag.
+LAG_CHECK_INTERVAL = 5
+
+# The replication lag in seconds: zero if the replica replayed everything it received,
+# otherwise the age of the last replayed transaction.
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaMonitor:
+    """
+    Measures the replication lag of the replica and decides whether it is read.
+
+    Attributes:
+        engine (Engine): The engine of the replica.
+        max_lag (float): The lag in seconds above which the replica isn't read.
+        interval (float): The seconds between two measurements.
+        healthy (bool): Whether the replica was reachable and within `max_lag`.
+        lag (float): The last measured lag in seconds, None if it couldn't be measured.
+
+    Methods:
+        usable(): Returns whether the replica is read, measuring the lag if it's due.
+        check(): Measures the lag.
+        mark_down(): Stops reading the replica until the next measurement.
+    """
+
+    def __init__(self, engine, max_lag=DB_REPLICA_MAX_LAG, interval=LAG_CHECK_INTERVAL) -> None:
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = False
+        self.lag = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def usable(self) -> bool:
+        """
+        Returns whether the replica is read. The first request waits for the first
+        measurement, later ones use the last measurement while another one runs.
+
+        Returns:
+            bool: Whether the replica is read.
+        """
+        if self._checked_at is None or time.monotonic() - self._checked_at > self.interval:
+            if self._lock.acquire(blocking=self._checked_at is None):
+                try:
+                    if (self._checked_at is None
+                            or time.monotonic() - self._checked_at > self.interval):
+                        self.check()
+                finally:
+                    self._lock.release()
+        return self.healthy
+
+    def check(self) -> None:
+        """
+        Measures the lag, the replica is read if it is reachable and within `max_lag`.
+        """
+        try:
+            with self.engine.connect() as connection:
+                lag = float(connection.scalar(LAG_QUERY))
+        except DBAPIError as e:
+            if self.healthy or self._checked_at is None:
+                logger.warning("The replica can't be reached, reading from the primary: %s", e)
+            self._set(False, None)
+            return
+        healthy = lag <= self.max_lag
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("The replica lags by %.1f s, reading from the replica", lag)
+            else:
+                logger.warning("The replica lags by %.1f s, reading from the primary", lag)
+        self._set(healthy, lag)
+
+    def mark_down(self) -> None:
+        """
+        Stops reading the replica until the next measurement.
+        """
+        if self.healthy:
+            logger.warning("Lost a connection to the replica, reading from the primary")
+        self._set(False, self.lag)
+
+    def _set(self, healthy, lag) -> None:
+        self.healthy = healthy
+        self.lag = lag
+        self._checked_at = time.monotonic()
+
+
+_monitor = None
+
+
+def _handle_error(context) -> None:
+    """
+    Stops reading the replica when one of its connections is lost.
+    """
+    if context.is_disconnect and _monitor is not None:
+        _monitor.mark_down()
+
+
+def init_replica(app) -> bool:
+    """
+    Starts monitoring the replica of the application, if one is configured.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        bool: Whether a replica is configured.
+    """
+    global _monitor
+    with app.app_context():
+        engine = db.engines.get(REPLICA_BIND)
+        if engine is None:
+            return False
+        event.listen(engine, "handle_error", _handle_error)
+    _monitor = ReplicaMonitor(engine)
+    return True
+
+
+def replica_status() -> dict:
+    """
+    Returns whether a replica is configured and read, with its last measured lag.
+
+    Returns:
+        dict: The status of the replica.
+    """
+    if _monitor is None:
+        return {"configured": False, "healthy": False, "lag": None}
+    return {"configured": True, "healthy": _monitor.healthy, "lag": _monitor.lag}
+
+
+def read_replica(f):
+    """
+    Decorator, routes the selects of a route to the replica while it is usable.
+
+    Args:
+        f (function): The function to be decorated.
+
+    Returns:
+        function: The decorated function.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if _monitor is not None and _monitor.usable():
+            g.read_bind = REPLICA_BIND
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+@contextmanager
+def primary():
+    """
+    Context manager, routes the selects of its block to the primary,
+    e.g. the reads of a decorated view that have to see the user's own writes.
+    """
+    read_bind = g.pop("read_bind", None)
+    try:
+        yield
+    finally:
+        if read_bind is not None:
+            g.read_bind = read_bind
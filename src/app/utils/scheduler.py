@@ -0,0 +1,177 @@
+"""
+This module contains the scheduler of the periodic jobs and the locks that keep them single.
+~~~~~~~~~~~~~~~~~~~~~
+
+The periodic jobs, like the automated scraping, the roll up of the search log and the
+cleanup of old records, are run by a dedicated scheduler process (see `app.scheduler`)
+instead of by every gunicorn worker, which would each start their own crawl.
+The `scheduler` of this module is only started by that process.
+
+Several scheduler processes can run, e.g. one per host for availability. They elect
+a leader with a PostgreSQL advisory lock: only the process holding `LEADER_LOCK` starts
+its scheduler, the others wait until the lock is released, which PostgreSQL does as soon
+as the session of the leader ends, e.g. when its process or host dies.
+
+Every job runs through `run_job`, which additionally takes an advisory lock of its own,
+so a job never runs twice at the same time, even while a failed over leader is still
+finishing it. The runs, their status, their duration and the report a job returns
+are recorded in the `job_run` table.
+
+The advisory locks are session level state, they are held on connections of
+`session_engine()`, which bypasses a PgBouncer in transaction pooling mode,
+see `app.utils.database`.
+
+Functions:
+- lock_key(name): Returns the advisory lock key of a name.
+- run_job(name, func): Runs a job under its advisory lock and records the run.
+"""
+
+import hashlib
+import logging
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.config import application
+from app.models import JobRun
+from app.utils.database import session_engine
+
+logger = logging.getLogger(__name__)
+
+# Name of the advisory lock held by the leading scheduler process.
+LEADER_LOCK = "scheduler:leader"
+
+# A run that is missed, e.g. while the leader fails over, is run once instead of
+# once per missed time, if it is late by less than this number of seconds.
+MISFIRE_GRACE_TIME = 3600
+
+scheduler = BackgroundScheduler(
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": MISFIRE_GRACE_TIME}
+)
+
+
+def lock_key(name) -> int:
+    """
+    Returns the advisory lock key of a name.
+
+    Args:
+        name (str): The name of the lock.
+
+    Returns:
+        int: A signed 64 bit key derived from the name.
+    """
+    return int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big", signed=True)
+
+
+class AdvisoryLock:
+    """
+    A session level PostgreSQL advisory lock, held on a dedicated connection.
+
+    The lock is held as long as the connection is open, PostgreSQL releases it
+    when the connection is lost.
+
+    Attributes:
+        name (str): The name of the lock.
+        key (int): The advisory lock key.
+        connection (Connection): The connection holding the lock, None if it isn't held.
+    """
+
+    def __init__(self, name) -> None:
+        self.name = name
+        self.key = lock_key(name)
+        self.connection = None
+
+    def acquire(self) -> bool:
+        """
+        Tries to take the lock without waiting.
+
+        Returns:
+            bool: Whether the lock is held.
+        """
+        connection = session_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.scalar(text("SELECT pg_try_advisory_lock(:key)"),
+                                         {"key": self.key})
+        except DBAPIError:
+            connection.invalidate()
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def held(self) -> bool:
+        """
+        Checks that the connection holding the lock is still alive.
+
+        Returns:
+            bool: Whether the lock is still held.
+        """
+        if self.connection is None:
+            return False
+        try:
+            self.connection.execute(text("SELECT 1"))
+            return True
+        except DBAPIError:
+            logger.error("The connection holding the lock %s was lost", self.name)
+            self.connection.invalidate()
+            self.connection = None
+            return False
+
+    def release(self) -> None:
+        """
+        Releases the lock and returns its connection to the pool.
+        """
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except DBAPIError:
+            # The lock is gone with the session, the connection can't be reused
+            self.connection.invalidate()
+        self.connection.close()
+        self.connection = None
+
+
+def run_job(name, func) -> bool:
+    """
+    Runs a job under its advisory lock and records the run in the `job_run` table.
+
+    If the job is already running, in this or any other process, the run is skipped.
+    Exceptions of the job are logged and recorded, they don't stop the scheduler.
+
+    Args:
+        name (str): The name of the job.
+        func (callable): The job, called without arguments. A dict it returns
+        is recorded as the result of the run.
+
+    Returns:
+        bool: Whether the job ran and succeeded.
+    """
+    lock = AdvisoryLock(f"job:{name}")
+    if not lock.acquire():
+        logger.warning("Job %s is already running, skipped", name)
+        return False
+    try:
+        with application.app_context():
+            run_id = JobRun.start(name)
+        logger.info("Job %s started", name)
+        started = time.perf_counter()
+        status, error, result = "succeeded", None, None
+        try:
+            result = func()
+        except Exception as e:
+            logger.exception("Job %s failed", name)
+            status, error = "failed", str(e)
+        duration_ms = (time.perf_counter() - started) * 1000
+        with application.app_context():
+            JobRun.finish(run_id, status, duration_ms, error,
+                          result if isinstance(result, dict) else None)
+        logger.info("Job %s %s in %.1f ms", name, status, duration_ms)
+        return status == "succeeded"
+    finally:
+        lock.release()
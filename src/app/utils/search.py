@@ -0,0 +1,192 @@
+"""
+This module contains the pagination and counting helpers of the product search.
+~~~~~~~~~~~~~~~~~~~~~
+
+The public search API and the admin product and user searches share these helpers:
+- Results are ordered by their search rank (e.g. `Product.search_rank`) and their ID,
+  and paginated with a keyset on these two values, so deep pages don't pay for OFFSET.
+- Totals of large result sets are taken from the row estimate of the query planner
+  (`EXPLAIN`) instead of an exact COUNT over all matching rows.
+  Small result sets, or an explicit request, get an exact count.
+
+Functions:
+- paginate_keyset(query, key, rank, after, per_page, exact): Returns a page of ranked results.
+- keyset_page(query, search, after, per_page, exact): Returns a page of the ranked products.
+- count_results(query, exact): Returns the exact or the estimated number of results.
+- estimate_count(query): Returns the planner's estimate of the number of results.
+"""
+
+import json
+
+from flask_sqlalchemy.query import Query
+from sqlalchemy import Double, cast, literal, tuple_
+
+from app.config import db
+from app.models import Product
+
+# Number of results per page of the admin searches.
+ADMIN_PER_PAGE = 9
+
+# Estimated totals below this number are replaced by an exact count.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+class KeysetPage:
+    """
+    A page of ranked search results.
+
+    Attributes:
+        items (list): The products of the page.
+        total (int): The number of results, estimated if `total_is_estimate`.
+        total_is_estimate (bool): Whether the total comes from the planner's estimate.
+        next_after (str): The cursor of the next page, None on the last page.
+    """
+
+    def __init__(self, items, total, total_is_estimate, next_after) -> None:
+        self.items = items
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+        self.next_after = next_after
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def encode_cursor(rank, key) -> str:
+    """
+    Encodes the position of a result as a cursor.
+
+    Args:
+        rank (float): The search rank of the result, None without a search.
+        key (int): The ID of the result.
+
+    Returns:
+        str: The cursor.
+    """
+    return json.dumps([rank, key], separators=(",", ":"))
+
+
+def decode_cursor(cursor) -> tuple | None:
+    """
+    Decodes a cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The (rank, id) position, None if the cursor is invalid.
+    """
+    try:
+        rank, key = json.loads(cursor)
+        return (float(rank) if rank is not None else None), int(key)
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_count(query: Query) -> int:
+    """
+    Returns the planner's estimate of the number of results of the query.
+
+    Args:
+        query (Query): The query.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    compiled = query.order_by(None).statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_results(query: Query, exact=False) -> tuple[int, bool]:
+    """
+    Returns the number of results of the query.
+
+    The planner's estimate is used unless an exact count is requested
+    or the estimate is below `EXACT_COUNT_THRESHOLD`.
+
+    Args:
+        query (Query): The query.
+        exact (bool, optional): Always count exactly. Defaults to False.
+
+    Returns:
+        tuple: The number of results and whether it is an estimate.
+    """
+    if not exact:
+        estimate = estimate_count(query)
+        if estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate, True
+    return query.order_by(None).count(), False
+
+
+def paginate_keyset(query: Query, key, rank=None, after=None,
+                    per_page=ADMIN_PER_PAGE, exact=False) -> KeysetPage:
+    """
+    Returns a page of the results, the best ranked first.
+
+    The results are ordered by the rank and the key, and the page starts
+    after the position stored in the cursor.
+
+    Args:
+        query (Query): The filtered query of a single model.
+        key (Column): The unique column breaking ties of the rank, e.g. the primary key.
+        rank (ColumnElement, optional): The rank of a result, higher is better.
+        Without a rank the results are ordered by the key only.
+        after (str, optional): The cursor of the last result of the previous page.
+        per_page (int, optional): The number of results per page. Defaults to ADMIN_PER_PAGE.
+        exact (bool, optional): Count the results exactly. Defaults to False.
+
+    Returns:
+        KeysetPage: The page.
+    """
+    total, total_is_estimate = count_results(query, exact)
+
+    # The rank is compared with the cursor, so it has to survive the round trip exactly
+    rank = cast(rank, Double) if rank is not None else None
+    ranked = query.order_by(None).add_columns(
+        (rank if rank is not None else literal(None)).label("rank"), key.label("key"))
+    position = decode_cursor(after) if after else None
+    if position is not None:
+        if rank is not None and position[0] is not None:
+            ranked = ranked.filter(tuple_(rank, key) < tuple_(*position))
+        elif rank is None:
+            ranked = ranked.filter(key < position[1])
+    if rank is not None:
+        ranked = ranked.order_by(rank.desc(), key.desc())
+    else:
+        ranked = ranked.order_by(key.desc())
+
+    rows = ranked.limit(per_page + 1).all()
+    next_after = None
+    if len(rows) > per_page:
+        _, last_rank, last_key = rows[per_page - 1]
+        next_after = encode_cursor(last_rank, last_key)
+    return KeysetPage([item for item, _, _ in rows[:per_page]],
+                      total, total_is_estimate, next_after)
+
+
+def keyset_page(query: Query, search=None, after=None,
+                per_page=ADMIN_PER_PAGE, exact=False) -> KeysetPage:
+    """
+    Returns a page of the product results, the best ranked first.
+
+    Args:
+        query (Query): The filtered product query.
+        search (str, optional): The search string the results are ranked by.
+        after (str, optional): The cursor of the last result of the previous page.
+        per_page (int, optional): The number of results per page. Defaults to ADMIN_PER_PAGE.
+        exact (bool, optional): Count the results exactly. Defaults to False.
+
+    Returns:
+        KeysetPage: The page.
+    """
+    return paginate_keyset(
+        query, Product.id, Product.search_rank(search) if search else None,
+        after=after, per_page=per_page, exact=exact,
+    )
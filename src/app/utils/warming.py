@@ -0,0 +1,90 @@
+"""
+This module warms the search path after the records were updated.
+~~~~~~~~~~~~~~~~~~~~~
+
+An ingest run rewrites a large part of the product table, so the first users searching
+popular terms afterwards would pay for cold PostgreSQL buffers and cold trigram and
+full text index pages. The warming stage replays the most frequent recent combinations
+of search string and filters from the search log through the same filters and pagination
+as the search API, so these pages are read before the users ask for them.
+
+The replay is rate limited to `WARM_RATE` searches per second, so it doesn't compete
+with the live traffic, and the warmed searches are not recorded in the search log.
+Warming is a job of the scheduler process, its report is stored with the run of the job.
+
+Functions:
+- warm_searches(limit, days, rate): Replays the popular searches and reports the timing.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+from app.config import application, db
+from app.models import SearchQuery
+from app.routes.main.main import SEARCH_PER_PAGE, filter_products
+
+logger = logging.getLogger(__name__)
+
+# Number of popular searches replayed by a warming run.
+WARM_QUERIES = 50
+
+# Number of past days the popular searches are taken from.
+WARM_DAYS = 7
+
+# Maximum number of searches replayed per second.
+WARM_RATE = 5.0
+
+
+def warm_searches(limit=WARM_QUERIES, days=WARM_DAYS, rate=WARM_RATE) -> dict:
+    """
+    Replays the most frequent recent searches to load their pages into the caches.
+
+    Every search runs the first page of the search API, the result count and the page
+    of products, the same queries the users will send. Failed searches are reported
+    and skipped.
+
+    Args:
+        limit (int, optional): The number of searches to replay. Defaults to WARM_QUERIES.
+        days (int, optional): The number of past days to take the searches from.
+        Defaults to WARM_DAYS.
+        rate (float, optional): The maximum number of searches per second. Defaults to WARM_RATE.
+
+    Returns:
+        dict: The report of the run: its start, duration, and the warmed and failed searches
+        with their durations.
+    """
+    report = {
+        "started_on": datetime.now().isoformat(timespec="seconds"),
+        "duration_ms": 0.0,
+        "warmed": [],
+        "failed": [],
+    }
+    started = time.perf_counter()
+    with application.app_context():
+        for search, filters, searches in SearchQuery.popular(days, limit):
+            args = MultiDict({key: str(value) for key, value in filters.items()})
+            if search:
+                args["search"] = search
+            entry = {"search": search, "filters": filters, "searches": searches}
+            query_started = time.perf_counter()
+            try:
+                filter_products(args)[0].paginate(page=1, per_page=SEARCH_PER_PAGE,
+                                                  error_out=False)
+                entry["duration_ms"] = round((time.perf_counter() - query_started) * 1000, 1)
+                report["warmed"].append(entry)
+            except Exception as e:
+                db.session.rollback()
+                entry["error"] = str(e)
+                report["failed"].append(entry)
+            # Wait for the rest of this search's share of the rate limit
+            time.sleep(max(0.0, 1 / rate - (time.perf_counter() - query_started)))
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        "Warmed %d searches in %.1f ms, %d failed",
+        len(report["warmed"]), report["duration_ms"], len(report["failed"]),
+    )
+    return report
@@ -2,14 +2,39 @@
 This file imports all the spiders.
 ~~~~~~~~~~~~~~~~~~~~~
 
+The spiders import Scrapy and Twisted, so they are imported lazily (PEP 562)
+on their first access, e.g. `from spiders import MySpider`.
+
 Usage:
     python __init__.py
 
 """
 
-from spiders.myproject.myproject.spiders import MySpider
+__all__ = ["MySpider"]
+
+
+def __getattr__(name):
+    """
+    Imports a spider on its first access.
+
+    Args:
+        name (str): The name of the spider class.
+
+    Returns:
+        type: The spider class.
+
+    Raises:
+        AttributeError: If there is no spider with the name.
+    """
+    if name == "MySpider":
+        from spiders.myproject.myproject.spiders import MySpider
+        return MySpider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    from spiders.myproject.myproject.spiders import MySpider
+
     # Create an instance of MySpider with the desired URL and name
     spider = MySpider(input("Enter the URL of the product: "), "url")
 
@@ -1,118 +1,37 @@
 """
-This module contains the spider class for web scraping.
+This package contains the spider for web scraping and its utilities.
 ~~~~~~~~~~~~~~~~~~~~~
 
-The spider class, MySpider, is responsible for receiving and processing requests
-to scrape data from web pages.
-It utilizes the Scrapy framework to perform the scraping operation.
+The spider class, MySpider, is defined in `spider.py`. It pulls in Scrapy and Twisted,
+which take a large part of the start up time and memory of a process, while the web
+workers only need light utilities of this package like `utils.converter`.
+MySpider is therefore imported lazily (PEP 562) on the first access of
+`spiders.myproject.myproject.spiders.MySpider`, so importing the utilities doesn't
+import Scrapy.
 
 Example usage:
+    from spiders.myproject.myproject.spiders import MySpider
     spider = MySpider(query='scrapy', method='url', pages=5)
     spider.run()
-
-Attributes:
-    name (str): The name of the spider.
-    start_urls (list): The list of URLs to start scraping from.
-
-Args:
-    query (str): The search query to be used for scraping.
-    method (str): The method to be used for scraping, e.g., 'url', 'api'.
-    pages (int): The number of pages to scrape.
-
-Methods:
-    start_requests(): Generates the initial requests to start scraping.
-    parse(response): Parses the response and extracts data from the web page.
-    run(): Activates the spider and starts the scraping process.
-
 """
 
-import warnings
-
-import scrapy
-from scrapy.crawler import CrawlerProcess
-
-from .utils.parsing import parsing_method
-from .utils.search import Search
+__all__ = ["MySpider"]
 
-warnings.filterwarnings("ignore", category=scrapy.exceptions.ScrapyDeprecationWarning)
 
-
-class MySpider(scrapy.Spider):
+def __getattr__(name):
     """
-    Spider class for web scraping.
-    ~~~~~~~~~~~~~~~~~~~~~
-
-    This class receives and processes requests to scrape data from web pages.
-    It inherits from the Scrapy Spider class.
-
-    Attributes:
-    ----------
-        name (str): The name of the spider.
-        start_urls (list): The list of URLs to start scraping from.
+    Imports MySpider on its first access.
 
     Args:
-    ----------
-        query (str): The search query to be used for scraping.
-        method (str): The method to be used for scraping, e.g., 'url', 'google'.
-        pages (int): The number of pages to scrape.
-
-    """
+        name (str): The name of the attribute.
 
-    name = "myspider"
-    start_urls = []
+    Returns:
+        type: The MySpider class.
 
-    def __init__(
-        self, query: str = "", method: str = "url", pages=None
-    ) -> None:
-        self.query = query
-        self.method = method
-        self.pages = pages
-        super().__init__()
-
-    def start_requests(self):
-        """
-        Generates the initial requests to start scraping.
-
-        Returns:
-            generator: A generator of scrapy.Request objects.
-
-        """
-        if self.method == "list":
-            self.start_urls = self.query
-        else:
-            try:
-                self.start_urls = list(Search.search(self.query, self.method, self.pages))
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                return
-            
-        for url in self.start_urls:
-            yield scrapy.Request(url=url, callback=self.parse, meta={"url": url})
-
-    def parse(self, response, **kwargs) -> None:
-        """
-        Parses the response and extracts data from the web page.
-
-        Args:
-            response (scrapy.http.Response): The response object containing the
-            HTML content of the page.
-
-        """
-        parsing_method(response)
-
-    def run(self) -> None:
-        """
-        Activates the spider and starts the scraping process.
-
-        This method creates a CrawlerProcess object and starts the spider.
-
-        """
-        process = CrawlerProcess(
-            settings={
-                "FEEDS": {},
-            }
-        )
-        process.crawl(
-            MySpider, self.query, self.method, self.pages
-        )
-        process.start()
+    Raises:
+        AttributeError: If the attribute is not MySpider.
+    """
+    if name == "MySpider":
+        from .spider import MySpider
+        return MySpider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
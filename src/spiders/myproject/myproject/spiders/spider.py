@@ -0,0 +1,160 @@
+"""
+This module contains the spider class for web scraping.
+~~~~~~~~~~~~~~~~~~~~~
+
+It imports Scrapy and Twisted, so it is only imported by the processes that crawl,
+see the package `__init__.py`.
+
+The spider class, MySpider, is responsible for receiving and processing requests
+to scrape data from web pages.
+It utilizes the Scrapy framework to perform the scraping operation.
+
+Example usage:
+    spider = MySpider(query='scrapy', method='url', pages=5)
+    spider.run()
+
+Attributes:
+    name (str): The name of the spider.
+    start_urls (list): The list of URLs to start scraping from.
+
+Args:
+    query (str): The search query to be used for scraping.
+    method (str): The method to be used for scraping, e.g., 'url', 'api'.
+    pages (int): The number of pages to scrape.
+
+Methods:
+    start_requests(): Generates the initial requests to start scraping.
+    parse(response): Parses the response and extracts data from the web page.
+    download_failed(failure): Records a page that could not be downloaded.
+    closed(reason): Saves the products still queued for the database and the crawl telemetry.
+    run(): Activates the spider and starts the scraping process.
+
+"""
+
+import logging
+import warnings
+
+import scrapy
+from scrapy.crawler import CrawlerProcess
+
+from app.utils.database import use_component
+
+from .utils.db import flush_products
+from .utils.parsing import parsing_method
+from .utils.search import Search
+from .utils import telemetry
+
+warnings.filterwarnings("ignore", category=scrapy.exceptions.ScrapyDeprecationWarning)
+
+logger = logging.getLogger(__name__)
+
+
+class MySpider(scrapy.Spider):
+    """
+    Spider class for web scraping.
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    This class receives and processes requests to scrape data from web pages.
+    It inherits from the Scrapy Spider class.
+
+    Attributes:
+    ----------
+        name (str): The name of the spider.
+        start_urls (list): The list of URLs to start scraping from.
+
+    Args:
+    ----------
+        query (str): The search query to be used for scraping.
+        method (str): The method to be used for scraping, e.g., 'url', 'google'.
+        pages (int): The number of pages to scrape.
+
+    """
+
+    name = "myspider"
+    start_urls = []
+
+    def __init__(
+        self, query: str = "", method: str = "url", pages=None
+    ) -> None:
+        self.query = query
+        self.method = method
+        self.pages = pages
+        super().__init__()
+
+    def start_requests(self):
+        """
+        Generates the initial requests to start scraping.
+        The crawl switches its process to the spider connection pool and
+        the telemetry of the crawl run starts here.
+
+        Returns:
+            generator: A generator of scrapy.Request objects.
+
+        """
+        use_component("spider")
+        telemetry.start_run(self.method)
+        if self.method == "list":
+            self.start_urls = self.query
+        else:
+            try:
+                self.start_urls = list(Search.search(self.query, self.method, self.pages))
+            except Exception as e:
+                logger.error("Could not search for %s: %s", self.query, e)
+                return
+
+        for url in self.start_urls:
+            yield scrapy.Request(url=url, callback=self.parse, errback=self.download_failed,
+                                 meta={"url": url})
+
+    def parse(self, response, **kwargs) -> None:
+        """
+        Parses the response and extracts data from the web page.
+
+        Args:
+            response (scrapy.http.Response): The response object containing the
+            HTML content of the page.
+
+        """
+        telemetry.record_download(response.meta.get("url"), response.meta.get("download_latency"))
+        parsing_method(response)
+
+    def download_failed(self, failure) -> None:
+        """
+        Records a page that could not be downloaded, e.g. after a timeout or an error status.
+
+        Args:
+            failure (twisted.python.failure.Failure): The failure of the request.
+
+        """
+        url = failure.request.meta.get("url", failure.request.url)
+        logger.warning("Could not download %s: %s", url, failure.getErrorMessage())
+        telemetry.record_download_failure(url)
+
+    def closed(self, reason) -> None:
+        """
+        Saves the products still queued for the database when the spider finishes,
+        and persists the telemetry of the crawl run.
+
+        Args:
+            reason (str): The reason why the spider was closed.
+
+        """
+        flush_products()
+        telemetry.finish_run(reason)
+
+    def run(self) -> None:
+        """
+        Activates the spider and starts the scraping process.
+
+        This method creates a CrawlerProcess object and starts the spider.
+
+        """
+        process = CrawlerProcess(
+            settings={
+                "FEEDS": {},
+            }
+        )
+        process.crawl(
+            MySpider, self.query, self.method, self.pages
+        )
+        process.start()
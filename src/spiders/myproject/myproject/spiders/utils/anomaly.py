@@ -0,0 +1,176 @@
+"""
+This module contains the price anomaly check that runs over each ingest batch.
+
+Parsing glitches (a misplaced whole/fraction split, a wrong offer index in JSON-LD)
+occasionally produce absurd prices. Before a batch of scraped prices is applied,
+every changed price is compared against the rolling median and the median absolute
+deviation (MAD) of the product's recent price history. Observations that deviate
+too far are written to the `price_quarantine` table and are not applied, so they
+neither trigger notifications nor pollute `price_history`.
+
+A real relist or repricing looks like an anomaly too, but it is observed again by every
+crawl. Once a suspicious price agrees with the last `RELEASE_AFTER - 1` quarantined
+observations of the product within `RELEASE_TOLERANCE`, it is applied instead and those
+observations are marked as released. The statistics only use the price history recorded
+since the last release of a product, so the released price becomes its new baseline.
+
+The whole check is a single statement per batch: the observations are passed as
+arrays, the statistics are computed in PostgreSQL and the suspicious rows are
+inserted into the quarantine table, or released from it, in the same round trip.
+
+Functions:
+- quarantine_price_anomalies(curr, observations):
+Quarantines the suspicious observations and returns the IDs of their products.
+"""
+
+import psycopg2
+
+# Number of most recent price history entries used for the rolling statistics.
+HISTORY_WINDOW = 30
+
+# Products with fewer history entries than this are never flagged.
+MIN_HISTORY = 3
+
+# Maximum allowed robust z-score, |price - median| / (1.4826 * MAD).
+MAX_DEVIATION = 6.0
+
+# Lower bound of the spread as a fraction of the median, so products whose price
+# never changed (MAD of zero) are not flagged for ordinary price moves.
+MIN_RELATIVE_SPREAD = 0.15
+
+# Number of consecutive suspicious observations of about the same price, the current one
+# included, after which the price is accepted. At least 2.
+RELEASE_AFTER = 3
+
+# Maximum difference between observations that agree, as a fraction of the current price.
+RELEASE_TOLERANCE = 0.05
+
+
+def quarantine_price_anomalies(
+    curr: psycopg2.extensions.cursor,
+    observations: list[tuple[int, float, str]]
+) -> set[int]:
+    """
+    Compares the scraped prices against the rolling median/MAD of the products' recent
+    price history and moves the suspicious ones to the `price_quarantine` table.
+
+    A suspicious price confirmed by the previous quarantined observations of its product
+    is released instead: it isn't quarantined and the confirming observations are marked
+    as released, see `RELEASE_AFTER`.
+
+    Args:
+        curr (psycopg2.extensions.cursor): The database cursor.
+        observations (list): (product_id, price, price_currency) tuples of the
+        prices scraped in the current batch.
+
+    Returns:
+        set: The IDs of the products whose observation was quarantined,
+        the observations of the other products are applied.
+    """
+    if not observations:
+        return set()
+
+    product_ids, prices, currencies = (list(column) for column in zip(*observations))
+
+    curr.execute(
+        """
+        WITH observation AS (
+            SELECT *
+            FROM unnest(%(product_ids)s::int[], %(prices)s::float8[], %(currencies)s::text[])
+                AS o(product_id, price, price_currency)
+        ),
+        last_release AS (
+            SELECT product_id, MAX(released_on)::date AS released_on
+            FROM price_quarantine
+            WHERE product_id = ANY(%(product_ids)s::int[])
+            GROUP BY product_id
+        ),
+        recent AS (
+            SELECT product_id, price
+            FROM (
+                SELECT h.product_id, h.price,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY h.product_id
+                           ORDER BY h.change_date DESC, h.price_history_id DESC
+                       ) AS position
+                FROM price_history h
+                LEFT JOIN last_release l ON l.product_id = h.product_id
+                WHERE h.product_id = ANY(%(product_ids)s::int[])
+                  AND (l.released_on IS NULL OR h.change_date >= l.released_on)
+            ) ranked
+            WHERE position <= %(window)s
+        ),
+        median AS (
+            SELECT product_id, COUNT(*) AS entries,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median_price
+            FROM recent
+            GROUP BY product_id
+        ),
+        statistics AS (
+            SELECT m.product_id, m.entries, m.median_price,
+                   percentile_cont(0.5) WITHIN GROUP (
+                       ORDER BY ABS(r.price - m.median_price)
+                   ) AS deviation
+            FROM median m
+            JOIN recent r ON r.product_id = m.product_id
+            GROUP BY m.product_id, m.entries, m.median_price
+        ),
+        flagged AS (
+            SELECT o.product_id, o.price, o.price_currency, s.median_price, s.deviation
+            FROM observation o
+            JOIN statistics s ON s.product_id = o.product_id
+            WHERE s.entries >= %(min_history)s
+              AND ABS(o.price - s.median_price) > %(max_deviation)s * GREATEST(
+                  1.4826 * s.deviation, %(min_spread)s * s.median_price
+              )
+        ),
+        pending AS (
+            SELECT id, product_id, price
+            FROM (
+                SELECT id, product_id, price,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY product_id
+                           ORDER BY observed_on DESC, id DESC
+                       ) AS position
+                FROM price_quarantine
+                WHERE product_id IN (SELECT product_id FROM flagged)
+                  AND released_on IS NULL
+            ) ranked
+            WHERE position < %(release_after)s
+        ),
+        confirmed AS (
+            SELECT f.product_id
+            FROM flagged f
+            JOIN pending p ON p.product_id = f.product_id
+            GROUP BY f.product_id, f.price
+            HAVING COUNT(*) = %(release_after)s - 1
+               AND bool_and(ABS(p.price - f.price) <= %(release_tolerance)s * f.price)
+        ),
+        released AS (
+            UPDATE price_quarantine q
+            SET released_on = NOW()
+            FROM pending p
+            WHERE q.id = p.id AND p.product_id IN (SELECT product_id FROM confirmed)
+            RETURNING q.id
+        )
+        INSERT INTO price_quarantine
+            (product_id, price, price_currency, median_price, deviation, observed_on)
+        SELECT product_id, price, price_currency, median_price, deviation, NOW()
+        FROM flagged
+        WHERE product_id NOT IN (SELECT product_id FROM confirmed)
+        RETURNING product_id;
+        """,
+        {
+            "product_ids": product_ids,
+            "prices": prices,
+            "currencies": currencies,
+            "window": HISTORY_WINDOW,
+            "min_history": MIN_HISTORY,
+            "max_deviation": MAX_DEVIATION,
+            "min_spread": MIN_RELATIVE_SPREAD,
+            "release_after": RELEASE_AFTER,
+            "release_tolerance": RELEASE_TOLERANCE,
+        },
+    )
+
+    return {row[0] for row in curr.fetchall()}
@@ -4,40 +4,61 @@ This module contains functions for interacting with the database.
 The functions in this module are used to save products to the database or 
 update existing products if they already exist.
 
+Scraped products are not written one by one. They are buffered and applied in batches,
+so every batch needs a single transaction, a single lookup of the existing records and
+a single anomaly check (see `anomaly.py`) before the prices are applied.
+Every product of a batch is written under its own savepoint, so a product that can't be
+written is logged and rolled back without losing the rest of the batch.
+The connections are borrowed from the spider pool (see `app.utils.database`).
+
 Functions:
 - save_product_to_database(params):
-Saves a product to the database or updates an existing product if it already exists.
+Queues a product to be saved to the database, flushing the batch when it is full.
+- flush_products():
+Saves the queued products to the database or updates the existing products.
 - create_product(curr, params): 
 Inserts a new product into the database with the provided information.
 - update_record(curr, result, params): 
 Updates an existing record in the database with the provided information.
+- record_changed(result, params):
+Checks if the scraped product differs from its record.
 - deactivate_record(url):
 Deactivates a record in the database.
+
+The time of the database writes and the outcome of every product are recorded
+in the telemetry of the crawl run (see `telemetry.py`).
 """
 
+import logging
+
 import psycopg2
 
-from app.utils.notifications import notify_price_change
+from app.config import application
+from app.utils.database import connection
+from app.utils.notifications import notify_price_changes
+
+from spiders.myproject.myproject.spiders.utils.anomaly import quarantine_price_anomalies
+from spiders.myproject.myproject.spiders.utils import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Number of scraped products applied to the database at once.
+BATCH_SIZE = 100
 
-from app import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+_pending_products: list[dict] = []
 
 
 def save_product_to_database(
     params: dict
 ) -> None:
     """
-    Saves a product to the database or updates an existing product if it already exists.
+    Queues a product to be saved to the database.
 
     Parameters:
     - params (dict): A dictionary containing the product information.
 
-    If the product already exists in the database, the function checks for changes in 
-    price, rating, and amount of ratings.
-    If the price has changed, it updates the data in the `product` table 
-    and saves the price change in the `price_history` table.
-    If the rating has changed, it updates the record in the `product` table.
-    If the product does not exist in the database, it adds a new record to the `product` table
-    and starts tracking the price in the `price_history` table.
+    The product is added to the current batch. When the batch reaches `BATCH_SIZE`
+    products it is flushed to the database with `flush_products`.
 
     Raises:
     - ValueError: If any of the required params are missing.
@@ -50,15 +71,76 @@ def save_product_to_database(
         not params.get('price') or not params.get('price_currency')):
         raise ValueError("Missing required parameters.")
 
-    conn = psycopg2.connect(
-        database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
-    )
-    curr = conn.cursor()
+    _pending_products.append(params)
+    telemetry.record_parsed(params.get('url'))
+
+    if len(_pending_products) >= BATCH_SIZE:
+        flush_products()
+
+
+def flush_products() -> None:
+    """
+    Saves the queued products to the database or updates the existing products.
+
+    If a product already exists in the database, the function checks for changes in 
+    price, rating, and amount of ratings.
+    Changed prices are first checked against the product's recent price history,
+    suspicious prices are quarantined and the product is left untouched.
+    If the price has changed, it updates the data in the `product` table 
+    and saves the price change in the `price_history` table.
+    If the rating has changed, it updates the record in the `product` table.
+    If the product does not exist in the database, it adds a new record to the `product` table
+    and starts tracking the price in the `price_history` table.
+    After the batch is committed, the alert rules of the watchers of the products
+    whose price or availability changed are evaluated and the fired alerts are sent.
+
+    Returns:
+    - None
+    """
+    if not _pending_products:
+        return
+
+    # The last observation of a URL within the batch wins
+    batch = {params.get('url'): params for params in _pending_products}
+    _pending_products.clear()
+
+    with telemetry.db_timer(list(batch)):
+        changes = _write_batch(batch)
+
+    # Alert rules of the whole batch are evaluated at once, every user gets a single digest
+    with application.app_context():
+        notify_price_changes(changes)
+
+
+def _write_batch(batch: dict) -> list:
+    """
+    Writes a batch of scraped products to the database in a single transaction.
+
+    Args:
+        batch (dict): The scraped products by URL.
+
+    Returns:
+        list: The price and availability changes of the batch, see `update_record`.
+    """
+    with connection() as conn, conn.cursor() as curr:
+        changes, outcomes = _apply_batch(curr, batch)
 
-    curr.execute(f"""SELECT * FROM product WHERE url = '{params.get('url')}';""")
+    telemetry.record_items(outcomes)
+    return changes
 
-    result = curr.fetchone()
 
+def _apply_batch(curr: psycopg2.extensions.cursor, batch: dict) -> tuple[list, dict]:
+    """
+    Applies a batch of scraped products within the transaction of the cursor.
+
+    Args:
+        curr (psycopg2.extensions.cursor): The database cursor.
+        batch (dict): The scraped products by URL.
+
+    Returns:
+        tuple: The price and availability changes of the batch, see `update_record`,
+        and the outcome of every product by URL.
+    """
     curr.execute(
         """
                     CREATE TABLE IF NOT EXISTS price_history (
@@ -72,17 +154,56 @@ def save_product_to_database(
                     );"""
     )
 
-    # Checking if this record already exists in database
-    if result:
-        # This product already exists, update the record
-        update_record(curr, result, params)
-    else:
-        # This product does not exist, insert a new record into the database
-        create_product(curr, params)
+    curr.execute(
+        """
+        SELECT id, url, title, price, price_currency, item_class,
+        amount_of_ratings, rating, availability
+        FROM product WHERE url = ANY(%s);
+        """,
+        (list(batch),),
+    )
+
+    existing = {result[1]: result for result in curr.fetchall()}
+
+    quarantined = quarantine_price_anomalies(
+        curr,
+        [
+            (existing[url][0], float(params.get('price')), params.get('price_currency'))
+            for url, params in batch.items()
+            if url in existing and existing[url][3] != params.get('price')
+        ],
+    )
+
+    changes = []
+    outcomes = {}
+    for url, params in batch.items():
+        result = existing.get(url)
+        if result and result[0] in quarantined:
+            outcomes[url] = "quarantined"
+            continue
+        # A product that can't be written is rolled back alone, the rest of the batch is kept
+        curr.execute("SAVEPOINT product;")
+        try:
+            # Checking if this record already exists in database
+            if result:
+                outcome = "changed" if record_changed(result, params) else "unchanged"
+                # This product already exists, update the record
+                change = update_record(curr, result, params)
+            else:
+                # This product does not exist, insert a new record into the database
+                create_product(curr, params)
+                outcome, change = "created", None
+        except Exception as e:
+            curr.execute("ROLLBACK TO SAVEPOINT product;")
+            logger.error("Could not save the product %s: %s", url, e)
+            continue
+        curr.execute("RELEASE SAVEPOINT product;")
+        outcomes[url] = outcome
+        if change:
+            changes.append(change)
+
+    return changes, outcomes
 
-    conn.commit()
-    curr.close()
-    conn.close()
 
 def create_product(
     curr: psycopg2.extensions.cursor,
@@ -108,30 +229,24 @@ def create_product(
         None
 
     Raises:
-        Exception: If an error occurs during the database operation.
+        psycopg2.Error: If an error occurs during the database operation.
 
     """
-    try:
-        curr.execute(
-            """
-            INSERT INTO product (url, title, price, price_currency, item_class,
-            producer, amount_of_ratings, rating, image_url, availability)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-            """,
-            (params.get('url'), params.get('title'),
-             params.get('price'), params.get('price_currency'),
-             params.get('item_class'), params.get('producer'),
-             params.get('amount_of_ratings)'), params.get('rating'),
-             params.get('image_url'), params.get('availability')),
-        )
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-    curr.execute(f"""SELECT * FROM product WHERE url = '{params.get('url')}';""")
-
-    result = curr.fetchone()
+    curr.execute(
+        """
+        INSERT INTO product (url, title, price, price_currency, item_class,
+        producer, amount_of_ratings, rating, image_url, availability)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id;
+        """,
+        (params.get('url'), params.get('title'),
+         params.get('price'), params.get('price_currency'),
+         params.get('item_class'), params.get('producer'),
+         params.get('amount_of_ratings'), params.get('rating'),
+         params.get('image_url'), params.get('availability')),
+    )
 
-    product_id = result[0]
+    product_id = curr.fetchone()[0]
 
     curr.execute(
         """
@@ -141,11 +256,12 @@ def create_product(
         (product_id, params.get('price'), params.get('price_currency')),
     )
 
+
 def update_record(
     curr: psycopg2.extensions.cursor,
     result: tuple,
     params: dict
-) -> None:
+) -> tuple | None:
     """
     Updates an existing record in the database with the provided information.
 
@@ -164,30 +280,28 @@ def update_record(
     - availability (str, optional): The availability of the product. Defaults to 'In stock'.
 
     Returns:
-    - None
+    - tuple: (product_id, old_price, new_price, old_availability, new_availability)
+    if the price or the availability of the product changed, None otherwise.
 
     Raises:
     - Exception: If an error occurs during the database operation.
 
     """
+    change = None
+    product_id = result[0]
     price_in_db = result[3]
-    amount_of_rating_in_db = result[6]
-    rating_in_db = result[7]
+    availability_in_db = result[8]
 
-    if (
-        price_in_db != params.get('price')
-        or rating_in_db != params.get('rating')
-        or amount_of_rating_in_db != params.get('amount_of_ratings')
-    ):
+    if record_changed(result, params):
+
+        if (price_in_db != params.get('price')
+                or availability_in_db != params.get('availability')):
+            change = (product_id, float(price_in_db), float(params.get('price')),
+                      availability_in_db, params.get('availability'))
 
         # Checking if price of product has changed
         if price_in_db != params.get('price'):
 
-            if price_in_db > params.get('price'):
-                notify_price_change(params.get('url'))
-
-            product_id = result[0]
-
             # Saving price change to keep track of price
             curr.execute(
                 """
@@ -218,6 +332,30 @@ def update_record(
             ),
         )
 
+    return change
+
+
+def record_changed(
+    result: tuple,
+    params: dict
+) -> bool:
+    """
+    Checks if a scraped product differs from its record in the database.
+
+    Args:
+    - result (tuple): The record of the product.
+    - params (dict): The scraped product.
+
+    Returns:
+    - bool: True if the price, rating, amount of ratings or availability changed.
+    """
+    return (
+        result[3] != params.get('price')
+        or result[7] != params.get('rating')
+        or result[6] != params.get('amount_of_ratings')
+        or result[8] != params.get('availability')
+    )
+
 
 def deactivate_product(url: str) -> None:
     """
@@ -229,15 +367,9 @@ def deactivate_product(url: str) -> None:
     This function deactivates a record in the `product` table by 
     setting the `active` column to False.
     """
-    conn = psycopg2.connect(
-        database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
-    )
-    curr = conn.cursor()
-
-    curr.execute(f"""
-                 UPDATE product SET availability = 'Out of stock' WHERE url = '{url}';
-                 """)
+    with telemetry.db_timer([url]), connection() as conn, conn.cursor() as curr:
+        curr.execute(
+            "UPDATE product SET availability = 'Out of stock' WHERE url = %s;", (url,)
+        )
 
-    conn.commit()
-    curr.close()
-    conn.close()
+    telemetry.record_deactivation(url)
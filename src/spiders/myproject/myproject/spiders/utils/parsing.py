@@ -14,9 +14,12 @@ Extracts data from the item page on gamestop.com.
 Extracts data from the item page on excaliberpc.com.
 - parsing_method(response: Response):
 Parses the response object and determines the appropriate scraping method based on the URL domain.
+
+The parse time of every page is recorded in the telemetry of the crawl run (see `telemetry.py`).
 """
 
 import json
+import logging
 import re
 from urllib.parse import urlparse
 from scrapy.http import Response
@@ -24,6 +27,9 @@ from scrapy.http import Response
 from spiders.myproject.myproject.spiders.utils.db import (save_product_to_database,
                                                           deactivate_product)
 from spiders.myproject.myproject.spiders.utils.converter import SignsConverter
+from spiders.myproject.myproject.spiders.utils import telemetry
+
+logger = logging.getLogger(__name__)
 
 
 def scrape_amazon_item(response: Response, url: None | str = None):
@@ -103,7 +109,7 @@ def scrape_amazon_item(response: Response, url: None | str = None):
             )
 
     except (AttributeError, ValueError, TypeError) as e:
-        print(f"Error: {e}")
+        logger.warning("Could not parse %s: %s", url, e)
         deactivate_product(url)
 
 
@@ -177,7 +183,7 @@ def scrape_ebay_item(response: Response, url: str):
             }
         )
     except (ValueError, AttributeError, IndexError, TypeError) as e:
-        print(f"Error: {e}")
+        logger.warning("Could not parse %s: %s", url, e)
         deactivate_product(url)
 
 
@@ -256,7 +262,7 @@ def scrape_newegg_item(response: Response, url: None | str = None):
             }
         )
     except (AttributeError, ValueError, TypeError) as e:
-        print(f"Error: {e}")
+        logger.warning("Could not parse %s: %s", url, e)
         deactivate_product(url)
 
 
@@ -321,7 +327,7 @@ def scrape_gamestop_item(response: Response, url: None | str = None):
             }
         )
     except (AttributeError, IndexError, ValueError, TypeError) as e:
-        print(f"Error: {e}")
+        logger.warning("Could not parse %s: %s", url, e)
         deactivate_product(url)
 
 
@@ -385,7 +391,7 @@ def scrape_excaliberpc_item(response: Response, url: None | str = None):
             }
         )
     except (AttributeError, ValueError, TypeError) as e:
-        print(f"Error: {e}")
+        logger.warning("Could not parse %s: %s", url, e)
         deactivate_product(url)
 
 
@@ -408,20 +414,24 @@ def parsing_method(response: Response) -> None:
     # with open(".html", "w", encoding=response.encoding) as f:
     #     f.write(html_content)
 
-    if response.meta.get('download_slot') == "www.ebay.com":
-        scrape_ebay_item(response, url)
+    with telemetry.parse_timer(url):
+        if response.meta.get('download_slot') == "www.ebay.com":
+            scrape_ebay_item(response, url)
 
-    elif response.meta.get('download_slot') == "www.amazon.com":
-        scrape_amazon_item(response, url)
+        elif response.meta.get('download_slot') == "www.amazon.com":
+            scrape_amazon_item(response, url)
 
-    elif response.meta.get('download_slot') == "www.amazon.co.uk":
-        scrape_amazon_item(response, url)
+        elif response.meta.get('download_slot') == "www.amazon.co.uk":
+            scrape_amazon_item(response, url)
 
-    elif "newegg" in url:
-        scrape_newegg_item(response, url)
+        elif "newegg" in url:
+            scrape_newegg_item(response, url)
 
-    elif "gamestop" in url:
-        scrape_gamestop_item(response, url)
+        elif "gamestop" in url:
+            scrape_gamestop_item(response, url)
 
-    elif "excaliberpc" in url:
-        scrape_excaliberpc_item(response, url)
+        elif "excaliberpc" in url:
+            scrape_excaliberpc_item(response, url)
+
+        else:
+            telemetry.record_skipped(url)
@@ -0,0 +1,350 @@
+"""
+This module collects the telemetry of a crawl run and persists it in the `crawl_run` table.
+
+For every domain of a run the following is recorded:
+- the fetched pages and the failed downloads, with the download latency reported by Scrapy,
+- the parsed items, the pages without a parser for their domain and the parse time,
+- the created, changed, unchanged and quarantined records and the deactivated products,
+- the time spent writing to the database.
+
+Products are written to the database in batches that mix domains (see `db.py`),
+so the time of a batch is split between its domains by their number of products.
+The parse time of a page doesn't include the database writes that happened while it
+was parsed, e.g. a batch flushed by its product or a deactivation.
+
+The telemetry is kept in the memory of the crawling process while the spider runs,
+and a single row is written to the `crawl_run` table when the spider closes.
+Recording outside of a run, e.g. a deactivation of a manual scrape before the spider
+opened, is ignored.
+
+Functions:
+- start_run(method):
+Starts collecting the telemetry of a new run.
+- record_download(url, latency):
+Records a fetched page.
+- record_download_failure(url):
+Records a failed download.
+- parse_timer(url):
+Times the parsing of a page, without the database writes.
+- record_parsed(url) / record_skipped(url):
+Records an item handed to the database, or a page without a parser.
+- record_items(outcomes) / record_deactivation(url):
+Records the outcome of the database writes.
+- db_timer(urls):
+Times a database write and splits the time between the domains of the URLs.
+- finish_run(status):
+Persists the run and returns its summary.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+import psycopg2
+from psycopg2.extras import Json
+from sqlalchemy.exc import DBAPIError
+
+from app.utils.database import connection
+
+logger = logging.getLogger(__name__)
+
+# Counters of a domain, in the order they are shown.
+COUNTERS = ("fetched", "download_failures", "parsed", "skipped", "created", "changed",
+            "unchanged", "quarantined", "deactivated")
+
+# Timers of a domain, in milliseconds.
+TIMERS = ("download_ms", "parse_ms", "db_ms")
+
+
+class DomainStats:
+    """
+    The telemetry of a single domain within a run.
+
+    Attributes:
+        counts (Counter): The counters of `COUNTERS`.
+        latencies (list): The download latencies of the fetched pages, in seconds.
+        parse_seconds (float): The time spent parsing the pages.
+        db_seconds (float): The share of the database write time of the domain.
+    """
+
+    def __init__(self) -> None:
+        self.counts = Counter()
+        self.latencies = []
+        self.parse_seconds = 0.0
+        self.db_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        """
+        Returns the telemetry of the domain, as stored in the `domains` column.
+
+        Returns:
+            dict: The counters, the total and percentile download latencies,
+            and the parse and database time, in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        stats = {name: self.counts[name] for name in COUNTERS}
+        stats.update(
+            download_ms=round(sum(latencies, 0.0) * 1000, 1),
+            download_p50_ms=_percentile(latencies, 0.5),
+            download_p95_ms=_percentile(latencies, 0.95),
+            download_max_ms=round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            parse_ms=round(self.parse_seconds * 1000, 1),
+            db_ms=round(self.db_seconds * 1000, 1),
+        )
+        return stats
+
+
+class CrawlTelemetry:
+    """
+    The telemetry of a crawl run.
+
+    Attributes:
+        method (str): The scraping method of the run, e.g. 'list' for the nightly update.
+        started_on (datetime): The date and time the run started.
+        started (float): The `perf_counter` value at the start of the run.
+        domains (dict): The DomainStats of every domain.
+        db_seconds (float): The total database write time, used to exclude
+        the writes from the parse time.
+    """
+
+    def __init__(self, method) -> None:
+        self.method = method
+        self.started_on = datetime.now()
+        self.started = time.perf_counter()
+        self.domains = {}
+        self.db_seconds = 0.0
+
+    def domain(self, url) -> DomainStats:
+        """
+        Returns the telemetry of the domain of a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            DomainStats: The telemetry of the domain.
+        """
+        name = urlparse(url or "").netloc.lower() or "unknown"
+        stats = self.domains.get(name)
+        if stats is None:
+            stats = self.domains[name] = DomainStats()
+        return stats
+
+    def summary(self, status) -> dict:
+        """
+        Returns the summary of the run, as stored in the `crawl_run` table.
+
+        Args:
+            status (str): The reason the spider closed, e.g. 'finished'.
+
+        Returns:
+            dict: The totals of the run and the telemetry of every domain.
+        """
+        domains = {name: stats.to_dict() for name, stats in sorted(self.domains.items())}
+        summary = {
+            "method": self.method,
+            "status": status,
+            "started_on": self.started_on,
+            "finished_on": datetime.now(),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+        }
+        for name in COUNTERS + TIMERS:
+            summary[name] = sum(stats[name] for stats in domains.values())
+        summary["download_ms"] = round(summary["download_ms"], 1)
+        summary["parse_ms"] = round(summary["parse_ms"], 1)
+        summary["db_ms"] = round(summary["db_ms"], 1)
+        summary["domains"] = domains
+        return summary
+
+
+def _percentile(values, fraction) -> float:
+    """
+    Returns a percentile of sorted values, in milliseconds.
+
+    Args:
+        values (list): The sorted values, in seconds.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The nearest-rank percentile, 0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(fraction * len(values)))] * 1000, 1)
+
+
+_run: CrawlTelemetry | None = None
+
+
+def start_run(method: str) -> None:
+    """
+    Starts collecting the telemetry of a new run.
+
+    Args:
+        method (str): The scraping method of the run.
+    """
+    global _run
+    _run = CrawlTelemetry(method)
+
+
+def record_download(url: str, latency: float | None) -> None:
+    """
+    Records a fetched page.
+
+    Args:
+        url (str): The URL of the page.
+        latency (float): The download latency reported by Scrapy, in seconds.
+    """
+    if _run is None:
+        return
+    stats = _run.domain(url)
+    stats.counts["fetched"] += 1
+    if latency is not None:
+        stats.latencies.append(latency)
+
+
+def record_download_failure(url: str) -> None:
+    """
+    Records a download that failed, e.g. with a timeout or an HTTP error status.
+
+    Args:
+        url (str): The URL of the page.
+    """
+    if _run is not None:
+        _run.domain(url).counts["download_failures"] += 1
+
+
+@contextmanager
+def parse_timer(url: str):
+    """
+    Times the parsing of a page, without the database writes made while parsing it.
+
+    Args:
+        url (str): The URL of the page.
+    """
+    if _run is None:
+        yield
+        return
+    run = _run
+    started, db_seconds = time.perf_counter(), run.db_seconds
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started - (run.db_seconds - db_seconds)
+        run.domain(url).parse_seconds += max(0.0, elapsed)
+
+
+def record_parsed(url: str) -> None:
+    """
+    Records an item that was parsed and handed to the database.
+
+    Args:
+        url (str): The URL of the item.
+    """
+    if _run is not None:
+        _run.domain(url).counts["parsed"] += 1
+
+
+def record_skipped(url: str) -> None:
+    """
+    Records a page of a domain without a parser.
+
+    Args:
+        url (str): The URL of the page.
+    """
+    if _run is not None:
+        _run.domain(url).counts["skipped"] += 1
+
+
+def record_items(outcomes: dict) -> None:
+    """
+    Records the outcome of the database writes of a batch.
+
+    Args:
+        outcomes (dict): The outcome of every URL of the batch:
+        'created', 'changed', 'unchanged' or 'quarantined'.
+    """
+    if _run is None:
+        return
+    for url, outcome in outcomes.items():
+        _run.domain(url).counts[outcome] += 1
+
+
+def record_deactivation(url: str) -> None:
+    """
+    Records a product that was deactivated because its page couldn't be parsed.
+
+    Args:
+        url (str): The URL of the product.
+    """
+    if _run is not None:
+        _run.domain(url).counts["deactivated"] += 1
+
+
+@contextmanager
+def db_timer(urls: list):
+    """
+    Times a database write and splits the time between the domains of the URLs
+    by their number of URLs.
+
+    Args:
+        urls (list): The URLs written.
+    """
+    if _run is None or not urls:
+        yield
+        return
+    run = _run
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        run.db_seconds += elapsed
+        for url in urls:
+            run.domain(url).db_seconds += elapsed / len(urls)
+
+
+def finish_run(status: str) -> dict | None:
+    """
+    Persists the telemetry of the current run in the `crawl_run` table and logs its summary.
+
+    A failure to persist the run is logged, so it doesn't fail the crawl.
+
+    Args:
+        status (str): The reason the spider closed, e.g. 'finished'.
+
+    Returns:
+        dict: The summary of the run, None if no run was started.
+    """
+    global _run
+    if _run is None:
+        return None
+    summary = _run.summary(status)
+    _run = None
+
+    logger.info(
+        "Crawl run %s (%s) %s in %.1f ms: %d pages fetched, %d download failures, "
+        "%d parsed, %d changed, %d unchanged, %d created, %d deactivated; "
+        "download %.1f ms, parse %.1f ms, database %.1f ms",
+        summary["method"], summary["status"], summary["started_on"].isoformat(timespec="seconds"),
+        summary["duration_ms"], summary["fetched"], summary["download_failures"],
+        summary["parsed"], summary["changed"], summary["unchanged"], summary["created"],
+        summary["deactivated"], summary["download_ms"], summary["parse_ms"], summary["db_ms"],
+    )
+
+    columns = ("method", "status", "started_on", "finished_on", "duration_ms") \
+        + COUNTERS + TIMERS + ("domains",)
+    try:
+        with connection() as conn, conn.cursor() as curr:
+            curr.execute(
+                f"INSERT INTO crawl_run ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))});",
+                [Json(summary[column]) if column == "domains" else summary[column]
+                 for column in columns],
+            )
+    except (psycopg2.Error, DBAPIError) as e:
+        logger.error("Could not save the crawl run: %s", e)
+    return summary
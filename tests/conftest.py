@@ -0,0 +1,132 @@
+"""
+This file contains the pytest fixtures shared by the tests.
+~~~~~~~~~~~~~~~~~~~~~
+
+The tests run against the PostgreSQL database configured by DATABASE_URL or the DB_* variables,
+migrated with `alembic upgrade head`, e.g. `DATABASE_URL=... python -m pytest tests`.
+The rows a test creates are deleted after it.
+
+Fixtures:
+- application: The web application in testing mode, with the query detector installed.
+- client: A test client of the application.
+- user: A user created for the test.
+- user_client: A test client logged in as `user`.
+- products: Products created for the test, all made by a producer unique to the test.
+- max_queries: `assert_max_queries`, with the query detector installed, see
+  `app.utils.querydetector`.
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import app.__main__  # noqa: F401, E402 registers the routes
+from app.config import application as flask_app, db  # noqa: E402
+from app.models import Cart, Product, User  # noqa: E402
+from app.utils.querydetector import assert_max_queries, init_query_detector  # noqa: E402
+
+
+@pytest.fixture
+def application():
+    """
+    Returns the web application in testing mode, with the query detector installed.
+
+    The detector is installed before the first test sends a request,
+    Flask doesn't accept request hooks afterwards.
+
+    Yields:
+        Flask: The application.
+    """
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    init_query_detector(flask_app, force=True)
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+
+
+@pytest.fixture
+def client(application):
+    """
+    Returns a test client of the application.
+
+    Returns:
+        FlaskClient: The test client.
+    """
+    return application.test_client()
+
+
+@pytest.fixture
+def user(application):
+    """
+    Creates a confirmed user for the test, their cart is deleted with them.
+
+    Yields:
+        User: The user.
+    """
+    suffix = uuid.uuid4().hex[:12]
+    user = User(f"test-{suffix}@example.com", username=f"test-{suffix}",
+                confirmed_on=datetime.now())
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+    yield user
+    db.session.rollback()
+    db.session.execute(db.delete(Cart).where(Cart.user_id == user_id))
+    db.session.execute(db.delete(User).where(User.id == user_id))
+    db.session.commit()
+
+
+@pytest.fixture
+def user_client(client, user):
+    """
+    Returns a test client logged in as the user of the test.
+
+    Returns:
+        FlaskClient: The test client.
+    """
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+        session["_fresh"] = True
+    return client
+
+
+@pytest.fixture
+def products(application):
+    """
+    Creates products for the test, all made by a producer unique to the test.
+
+    Yields:
+        list: The products.
+    """
+    producer = f"test-{uuid.uuid4().hex[:12]}"
+    products = [
+        Product(url=f"https://www.example.com/{producer}/{number}", title=f"Test product {number}",
+                price=10 + number, producer=producer)
+        for number in range(5)
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    yield products
+    db.session.rollback()
+    db.session.execute(db.delete(Product).where(Product.producer == producer))
+    db.session.commit()
+
+
+@pytest.fixture
+def max_queries(application):
+    """
+    Returns `assert_max_queries`.
+
+        def test_search(client, max_queries):
+            with max_queries(4):
+                client.get("/api/search?search=phone")
+
+    Returns:
+        callable: `assert_max_queries`.
+    """
+    return assert_max_queries
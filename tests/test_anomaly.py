@@ -0,0 +1,98 @@
+"""
+This file contains the tests of the price anomaly check of the ingest.
+
+A price far from the product's price history is quarantined, and accepted once
+`RELEASE_AFTER` consecutive crawls observed it, e.g. after a real repricing.
+"""
+
+import pytest
+
+from app.config import db
+from spiders.myproject.myproject.spiders.utils.anomaly import (
+    RELEASE_AFTER, quarantine_price_anomalies,
+)
+
+
+@pytest.fixture
+def curr(application):
+    """
+    Returns a cursor on a transaction that is rolled back after the test.
+
+    Yields:
+        psycopg2.extensions.cursor: The cursor.
+    """
+    conn = db.engine.raw_connection()
+    try:
+        with conn.cursor() as curr:
+            yield curr
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def product_id(curr):
+    """
+    Creates a product whose price was 100 for the last days.
+
+    Returns:
+        int: The ID of the product.
+    """
+    curr.execute(
+        """
+        INSERT INTO product (url, title, price, price_currency)
+        VALUES ('https://www.example.com/anomaly', 'Anomaly test', 100, 'USD')
+        RETURNING id;
+        """
+    )
+    product_id = curr.fetchone()[0]
+    curr.execute(
+        """
+        INSERT INTO price_history (product_id, price, price_currency, change_date)
+        SELECT %s, price, 'USD', CURRENT_DATE - days
+        FROM unnest(ARRAY[100, 101, 99, 100, 102]::float8[], ARRAY[9, 8, 7, 6, 5]) AS h(price, days);
+        """,
+        (product_id,),
+    )
+    return product_id
+
+
+def quarantine_rows(curr, product_id) -> list:
+    """
+    Returns the prices and whether they were released of the quarantined observations.
+    """
+    curr.execute(
+        "SELECT price, released_on IS NOT NULL FROM price_quarantine WHERE product_id = %s ORDER BY id;",
+        (product_id,),
+    )
+    return curr.fetchall()
+
+
+def test_ordinary_price_change_is_applied(curr, product_id):
+    assert quarantine_price_anomalies(curr, [(product_id, 95.0, "USD")]) == set()
+    assert quarantine_rows(curr, product_id) == []
+
+
+def test_glitch_is_quarantined(curr, product_id):
+    assert quarantine_price_anomalies(curr, [(product_id, 10000.0, "USD")]) == {product_id}
+    assert quarantine_price_anomalies(curr, [(product_id, 1.0, "USD")]) == {product_id}
+    assert quarantine_rows(curr, product_id) == [(10000.0, False), (1.0, False)]
+
+
+def test_confirmed_repricing_is_released(curr, product_id):
+    for _ in range(RELEASE_AFTER - 1):
+        assert quarantine_price_anomalies(curr, [(product_id, 1000.0, "USD")]) == {product_id}
+
+    # Confirmed by the previous crawls within the tolerance, the price is applied
+    assert quarantine_price_anomalies(curr, [(product_id, 1010.0, "USD")]) == set()
+    assert quarantine_rows(curr, product_id) == [(1000.0, True)] * (RELEASE_AFTER - 1)
+
+    # The released price is the new baseline, the price history before it isn't used
+    assert quarantine_price_anomalies(curr, [(product_id, 1200.0, "USD")]) == set()
+
+
+def test_disagreeing_observations_are_not_released(curr, product_id):
+    prices = [1000.0] * (RELEASE_AFTER - 2) + [5000.0, 1000.0]
+    for price in prices:
+        assert quarantine_price_anomalies(curr, [(product_id, price, "USD")]) == {product_id}
+    assert not any(released for _, released in quarantine_rows(curr, product_id))
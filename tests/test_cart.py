@@ -0,0 +1,40 @@
+"""
+This file contains the tests of the cart API, mainly the validation of its payloads.
+"""
+
+import pytest
+
+INVALID_BODIES = [b"[]", b'"x"', b"3", b"null", b"{", b""]
+
+
+@pytest.mark.parametrize("body", INVALID_BODIES)
+def test_bulk_rejects_invalid_payload(user_client, body):
+    response = user_client.post("/cart/bulk", data=body, content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_bulk_tracks_and_removes(user_client, products):
+    product_ids = [product.id for product in products]
+
+    response = user_client.post("/cart/bulk", json={"product_ids": product_ids, "action": "track"})
+    assert response.get_json() == {"status": "success", "action": "track", "changed": len(products)}
+
+    response = user_client.post("/cart/bulk", json={"product_ids": product_ids, "action": "remove"})
+    assert response.get_json() == {"status": "success", "action": "remove", "changed": len(products)}
+
+
+@pytest.mark.parametrize("body", INVALID_BODIES)
+def test_alert_rejects_invalid_payload(user_client, body):
+    response = user_client.post("/cart/alert", data=body, content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_alert_of_tracked_product(user_client, products):
+    product_id = products[0].id
+    payload = {"product_id": product_id, "alert_type": "target_price", "target_price": 9}
+
+    assert user_client.post("/cart/alert", json=payload).status_code == 404
+
+    user_client.post("/cart/bulk", json={"product_ids": [product_id], "action": "track"})
+    response = user_client.post("/cart/alert", json=payload)
+    assert response.get_json() == {"status": "success", "alert_type": "target_price"}
@@ -0,0 +1,59 @@
+"""
+This file contains the tests of the search API, mainly its SQL statement budget.
+
+A page of results costs a count and a select of the products, whether the products
+are tracked by a logged in user costs a single statement per page, not one per product.
+"""
+
+from app.models import Cart
+
+
+def search_url(products) -> str:
+    """
+    Returns the URL of a search for the products of the test, by their producer.
+    """
+    return f"/api/search?brand={products[0].producer}"
+
+
+def cart_statements(tracker) -> int:
+    """
+    Returns the number of statements the tracker counted on the cart table.
+    """
+    return sum(count for shape, count in tracker.counts.items() if "FROM cart" in shape)
+
+
+def test_search_logged_out(client, products, max_queries):
+    url = search_url(products)
+
+    with max_queries(2):
+        response = client.get(url)
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["total_results"] == len(products)
+    assert {product["tracked"] for product in result["products"]} == {"Logged out"}
+
+
+def test_search_tracked_costs_one_statement_per_page(user_client, user, products, max_queries):
+    url = search_url(products)
+    in_cart = {products[0].id, products[1].id}
+    Cart.bulk_append(user.id, list(in_cart))
+
+    # The logged out budget, the user loaded by the session and the tracked products
+    with max_queries(4) as tracker:
+        response = user_client.get(url)
+
+    assert response.status_code == 200
+    assert cart_statements(tracker) == 1
+    result = response.get_json()
+    assert len(result["products"]) == len(products)
+    assert {product["id"] for product in result["products"] if product["tracked"] is True} == in_cart
+
+
+def test_search_without_results_skips_tracked(user_client, user, max_queries):
+    with max_queries(3) as tracker:
+        response = user_client.get("/api/search?brand=no-such-producer-in-the-tests")
+
+    assert response.status_code == 200
+    assert response.get_json()["products"] == []
+    assert cart_statements(tracker) == 0